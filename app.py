@@ -9,6 +9,15 @@ def create_app():
 
     register_routes(app)
 
+    from master_stego.jobs import JobQueue
+    from master_stego.sessions import session_store
+
+    session_store.start_sweeper(busy=JobQueue().active_sessions)
+
+    from master_stego.utils import tools
+
+    tools.probe()
+
     return app
 
 
@@ -0,0 +1,303 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from benchmarks import corpus
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+DEFAULT_CORPUS_DIR = os.path.join(HERE, ".corpus")
+
+MIN_DELTA_SECONDS = 0.005
+
+
+def _stats(samples: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        "n": int(len(values)),
+        "p50": round(float(np.percentile(values, 50)), 6),
+        "p95": round(float(np.percentile(values, 95)), 6),
+        "mean": round(float(values.mean()), 6),
+    }
+
+
+def _session_ids(result: Dict[str, Any]) -> Iterator[str]:
+    yield result["session_id"]
+    for child in result.get("children") or []:
+        if child.get("result"):
+            yield from _session_ids(child["result"])
+
+
+def _versions() -> Dict[str, str]:
+    import PIL
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def run_benchmark(entries: List[Dict[str, Any]], repeat: int, memory: bool, profile: str = "full") -> Dict[str, Any]:
+    from master_stego import metrics
+    from master_stego.analysis import registry
+    from master_stego.analysis.pipeline import run_full_analysis
+    from master_stego.sessions import session_store
+    from master_stego.utils import tools
+
+    analyzer_wall: Dict[str, List[float]] = {}
+    analyzer_cpu: Dict[str, List[float]] = {}
+
+    def observe(name: str, wall: float, cpu: float) -> None:
+        analyzer_wall.setdefault(name, []).append(wall)
+        analyzer_cpu.setdefault(name, []).append(cpu)
+
+    def analyze(path: str) -> Dict[str, Any]:
+        session_id, session_dir = session_store.create()
+        result = run_full_analysis(path, session_id, session_dir, profile=profile)
+        for sid in _session_ids(result):
+            sid_dir = session_store.path(sid)
+            if sid_dir is not None:
+                shutil.rmtree(sid_dir, ignore_errors=True)
+        return result
+
+    files: Dict[str, Any] = {}
+    all_runs: List[float] = []
+    total_bytes = 0
+    started_all = time.perf_counter()
+
+    metrics.ANALYZER_OBSERVERS.append(observe)
+    try:
+        for entry in entries:
+            runs: List[float] = []
+            result: Dict[str, Any] = {}
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = analyze(entry["path"])
+                runs.append(time.perf_counter() - started)
+            all_runs.extend(runs)
+            total_bytes += entry["bytes"] * repeat
+
+            record: Dict[str, Any] = {**_stats(runs), "bytes": entry["bytes"]}
+            if entry["flag"]:
+                record["flag_found"] = entry["flag"] in ((result.get("flags") or {}).get("unique") or [])
+            files[entry["name"]] = record
+            print(
+                f"  {entry['name']:<28} p50 {record['p50'] * 1000:9.1f} ms"
+                + ("" if not entry["flag"] else f"   flag {'found' if record['flag_found'] else 'MISSED'}"),
+                file=sys.stderr,
+            )
+    finally:
+        metrics.ANALYZER_OBSERVERS.remove(observe)
+    elapsed = time.perf_counter() - started_all
+
+    # Separate untimed pass: tracemalloc slows allocation-heavy code several fold.
+    if memory:
+        for entry in entries:
+            tracemalloc.start()
+            try:
+                analyze(entry["path"])
+                files[entry["name"]]["peak_alloc_bytes"] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+    analyzers: Dict[str, Any] = {}
+    for name in sorted(analyzer_wall):
+        analyzers[name] = {**_stats(analyzer_wall[name]), "cpu_mean": round(float(np.mean(analyzer_cpu[name])), 6)}
+    # The pipeline skips these without running them; keep them visible so a
+    # baseline from a machine with the tools is not compared against nothing.
+    for name, analyzer in registry.ANALYZERS.items():
+        missing = tools.missing(analyzer.tools)
+        if missing:
+            analyzers[name] = {"skipped": f"{', '.join(missing)} not installed"}
+
+    by_size: Dict[str, Any] = {}
+    for entry in entries:
+        by_size.setdefault(str(entry["size"]), []).append(files[entry["name"]]["p50"])
+
+    return {
+        "full": {
+            **_stats(all_runs),
+            "files_per_second": round(len(all_runs) / elapsed, 3),
+            "mb_per_second": round(total_bytes / elapsed / (1 << 20), 3),
+            "peak_rss_bytes": metrics.peak_rss_bytes(),
+        },
+        "by_size": {size: round(float(np.median(values)), 6) for size, values in by_size.items()},
+        "analyzers": analyzers,
+        "files": files,
+    }
+
+
+def _ran(results: Dict[str, Any]) -> List[str]:
+    return sorted(name for name, stats in results.get("analyzers", {}).items() if "skipped" not in stats)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions: List[str] = []
+
+    def check(label: str, now: Optional[float], before: Optional[float]) -> None:
+        if now is None or before is None:
+            return
+        if now > before * (1 + tolerance) and now - before > MIN_DELTA_SECONDS:
+            regressions.append(f"{label}: {before * 1000:.1f} ms -> {now * 1000:.1f} ms (+{(now / before - 1) * 100:.0f}%)")
+
+    check("full p50", current["full"]["p50"], baseline["full"]["p50"])
+    check("full p95", current["full"]["p95"], baseline["full"]["p95"])
+
+    for name, stats in current["analyzers"].items():
+        before = baseline.get("analyzers", {}).get(name) or {}
+        if "skipped" not in stats and "skipped" not in before:
+            check(f"analyzer {name} p50", stats.get("p50"), before.get("p50"))
+
+    for name, stats in current["files"].items():
+        before = baseline.get("files", {}).get(name)
+        if before is None:
+            continue
+        check(f"{name} p50", stats["p50"], before["p50"])
+        if before.get("flag_found") and stats.get("flag_found") is False:
+            regressions.append(f"{name}: flag no longer found")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the analysis pipeline.")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, corpus.DEFAULT_SIZES)),
+        help=f"comma-separated edge lengths, or 'full' for {','.join(map(str, corpus.FULL_SIZES))}",
+    )
+    parser.add_argument("--formats", default=",".join(corpus.FORMATS), help="comma-separated subset of png,jpeg,bmp,gif")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--analysis-workers", type=int, default=None, help="override MASTER_STEGO_ANALYSIS_WORKERS")
+    parser.add_argument(
+        "--recursion", action="store_true", help="also analyze extracted files (their analyzer runs mix into the stats)"
+    )
+    parser.add_argument(
+        "--profile", choices=("full", "quick"), default="full", help="scan profile to run the pipeline with"
+    )
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("-o", "--output", default=None, help="write the full results JSON here")
+    args = parser.parse_args(argv)
+
+    # Configuration is read at import time, so set it before master_stego loads.
+    # The result cache would turn every repeat after the first into a lookup.
+    os.environ["MASTER_STEGO_CACHE_MAX_BYTES"] = "0"
+    if not args.recursion:
+        os.environ["MASTER_STEGO_RECURSION_MAX_DEPTH"] = "0"
+    if args.analysis_workers:
+        os.environ["MASTER_STEGO_ANALYSIS_WORKERS"] = str(args.analysis_workers)
+
+    sizes = corpus.FULL_SIZES if args.sizes == "full" else tuple(int(s) for s in args.sizes.split(",") if s)
+    formats = tuple(f for f in args.formats.split(",") if f)
+    unknown = set(formats) - set(corpus.FORMATS)
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+
+    corpus_dir = os.path.join(args.corpus_dir, f"seed-{args.seed}")
+    print(f"building corpus in {corpus_dir}", file=sys.stderr)
+    entries = corpus.build(corpus_dir, sizes, formats, seed=args.seed)
+    digest = hashlib.sha256()
+    for entry in entries:
+        with open(entry["path"], "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+
+    from master_stego.utils import tools
+
+    available = {tool: info["available"] for tool, info in sorted(tools.probe().items())}
+    missing = [tool for tool, found in available.items() if not found]
+    if missing:
+        print(f"skipping analyzers for missing tools: {', '.join(missing)}", file=sys.stderr)
+
+    print(f"running {len(entries)} files x {args.repeat}", file=sys.stderr)
+    results = run_benchmark(entries, args.repeat, memory=not args.no_memory, profile=args.profile)
+    results["meta"] = {
+        **_versions(),
+        "sizes": list(sizes),
+        "formats": list(formats),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "recursion": args.recursion,
+        "profile": args.profile,
+        "corpus_sha256": digest.hexdigest(),
+        "tools": available,
+    }
+
+    full = results["full"]
+    print(
+        f"full pipeline: p50 {full['p50'] * 1000:.1f} ms, p95 {full['p95'] * 1000:.1f} ms, "
+        f"{full['files_per_second']} files/s, {full['mb_per_second']} MiB/s",
+        file=sys.stderr,
+    )
+    for name, stats in results["analyzers"].items():
+        if "skipped" in stats:
+            print(f"  {name:<16} skipped: {stats['skipped']}", file=sys.stderr)
+        else:
+            print(f"  {name:<16} p50 {stats['p50'] * 1000:9.1f} ms  p95 {stats['p95'] * 1000:9.1f} ms", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against; run with --save-baseline", file=sys.stderr)
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("corpus_sha256") != results["meta"]["corpus_sha256"]:
+        print("note: corpus differs from the baseline's; only files present in both are compared", file=sys.stderr)
+    # The full-pipeline times are only comparable when the same analyzers ran:
+    # a different profile or a newly installed tool changes them.
+    if baseline.get("meta", {}).get("profile", "full") != args.profile:
+        print(
+            f"error: the baseline was recorded with the {baseline['meta'].get('profile', 'full')} profile, "
+            f"this run used {args.profile}",
+            file=sys.stderr,
+        )
+        return 2
+    if _ran(baseline) != _ran(results):
+        only_baseline = sorted(set(_ran(baseline)) - set(_ran(results)))
+        only_current = sorted(set(_ran(results)) - set(_ran(baseline)))
+        print(
+            "error: the baseline ran a different set of analyzers "
+            f"(only in the baseline: {', '.join(only_baseline) or '-'}; only in this run: {', '.join(only_current) or '-'}); "
+            "refresh it with --save-baseline",
+            file=sys.stderr,
+        )
+        return 2
+
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if not regressions:
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
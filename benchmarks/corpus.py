@@ -0,0 +1,115 @@
+import io
+import os
+import zipfile
+from typing import Dict, Iterator, List, Sequence
+
+import numpy as np
+from PIL import Image
+
+
+FORMATS = ("png", "jpeg", "bmp", "gif")
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "bmp": "bmp", "gif": "gif"}
+DEFAULT_SIZES = (256, 1024, 2048)
+FULL_SIZES = (256, 512, 1024, 2048, 4000, 8000)
+
+# JPEG re-quantizes and GIF re-palettes pixels, so an LSB payload would not
+# survive saving; EXIF is only written by Pillow for JPEG and PNG.
+VARIANTS = {
+    "clean": FORMATS,
+    "lsb": ("png", "bmp"),
+    "zip": FORMATS,
+    "exif": ("png", "jpeg"),
+}
+
+EXIF_IMAGE_DESCRIPTION = 0x010E
+
+
+def expected_flag(fmt: str, size: int, variant: str) -> str:
+    return f"flag{{bench_{variant}_{fmt}_{size}}}" if variant != "clean" else ""
+
+
+def cover(size: int, seed: int) -> np.ndarray:
+    # Smooth gradients plus mild noise: compresses and quantizes like a photo
+    # rather than like white noise or a flat fill.
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 1, size, dtype=np.float32)
+    y, x = ramp[:, None], ramp[None, :]
+    rgb = np.empty((size, size, 3), dtype=np.float32)
+    rgb[..., 0] = x * 200 + y * 40
+    rgb[..., 1] = y * 180 + 30
+    rgb[..., 2] = (1 - x) * 150 + y * 60
+    rgb += rng.normal(0, 6, size=rgb.shape).astype(np.float32)
+    return np.clip(rgb, 0, 255).astype(np.uint8)
+
+
+def embed_lsb(pixels: np.ndarray, payload: bytes) -> np.ndarray:
+    # Row-major, channels interleaved, MSB first: what zsteg calls b1,rgb,lsb,xy.
+    flat = pixels.reshape(-1).copy()
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+    flat[: len(bits)] = (flat[: len(bits)] & 0xFE) | bits
+    return flat.reshape(pixels.shape)
+
+
+def _zip_with(name: str, text: str) -> bytes:
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(name, (text + "\n") * 4)
+    return out.getvalue()
+
+
+def render(fmt: str, size: int, variant: str, seed: int = 0) -> bytes:
+    flag = expected_flag(fmt, size, variant)
+    pixels = cover(size, seed + size)
+    if variant == "lsb":
+        pixels = embed_lsb(pixels, flag.encode("ascii") + b"\x00")
+
+    image = Image.fromarray(pixels, "RGB")
+    if fmt == "gif":
+        image = image.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+
+    options: Dict = {}
+    if fmt == "jpeg":
+        options["quality"] = 90
+    if variant == "exif":
+        exif = Image.Exif()
+        exif[EXIF_IMAGE_DESCRIPTION] = flag
+        options["exif"] = exif.tobytes()
+
+    out = io.BytesIO()
+    image.save(out, format=fmt.upper(), **options)
+    data = out.getvalue()
+    if variant == "zip":
+        data += _zip_with("flag.txt", flag)
+    return data
+
+
+def specs(sizes: Sequence[int], formats: Sequence[str] = FORMATS) -> Iterator[Dict]:
+    for size in sizes:
+        for variant, variant_formats in VARIANTS.items():
+            for fmt in variant_formats:
+                if fmt in formats:
+                    yield {
+                        "name": f"{fmt}_{size}_{variant}.{EXTENSIONS[fmt]}",
+                        "format": fmt,
+                        "size": size,
+                        "variant": variant,
+                        "flag": expected_flag(fmt, size, variant),
+                    }
+
+
+def build(directory: str, sizes: Sequence[int], formats: Sequence[str] = FORMATS, seed: int = 0) -> List[Dict]:
+    os.makedirs(directory, exist_ok=True)
+    entries = []
+    for spec in specs(sizes, formats):
+        path = os.path.join(directory, spec["name"])
+        # Output is a pure function of (format, size, variant, seed); reuse what
+        # an earlier run wrote. The seed is part of the directory name.
+        if not os.path.exists(path):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(render(spec["format"], spec["size"], spec["variant"], seed))
+            os.replace(tmp_path, path)
+        spec["path"] = path
+        spec["bytes"] = os.path.getsize(path)
+        entries.append(spec)
+    return entries
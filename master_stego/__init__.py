@@ -2,6 +2,44 @@ import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TMP_DIR = os.path.join(BASE_DIR, "tmp")
+CACHE_DIR = os.environ.get("MASTER_STEGO_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+JOBS_DB_PATH = os.environ.get("MASTER_STEGO_JOBS_DB", os.path.join(TMP_DIR, "jobs.sqlite3"))
 
-os.makedirs(TMP_DIR, exist_ok=True)
+ANALYSIS_WORKERS = int(os.environ.get("MASTER_STEGO_ANALYSIS_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+CACHE_MAX_BYTES = int(os.environ.get("MASTER_STEGO_CACHE_MAX_BYTES", 1 << 30))
+JOB_LEASE_SECONDS = int(os.environ.get("MASTER_STEGO_JOB_LEASE_SECONDS", 600))
+JOB_MAX_ATTEMPTS = int(os.environ.get("MASTER_STEGO_JOB_MAX_ATTEMPTS", 3))
+SESSION_MAX_BYTES = int(os.environ.get("MASTER_STEGO_SESSION_MAX_BYTES", 5 << 30))
+SESSION_TTL_SECONDS = int(os.environ.get("MASTER_STEGO_SESSION_TTL_SECONDS", 6 * 3600))
+SESSION_GRACE_SECONDS = int(os.environ.get("MASTER_STEGO_SESSION_GRACE_SECONDS", 300))
+SESSION_SWEEP_INTERVAL = int(os.environ.get("MASTER_STEGO_SESSION_SWEEP_INTERVAL", 60))
+JOB_RETENTION_SECONDS = int(os.environ.get("MASTER_STEGO_JOB_RETENTION_SECONDS", SESSION_TTL_SECONDS))
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("MASTER_STEGO_RENDER_CACHE_MAX_BYTES", 128 << 20))
+RENDER_IMAGE_CACHE_MAX_BYTES = int(os.environ.get("MASTER_STEGO_RENDER_IMAGE_CACHE_MAX_BYTES", 512 << 20))
+CARVE_MAX_BYTES = int(os.environ.get("MASTER_STEGO_CARVE_MAX_BYTES", 256 << 20))
+CARVE_TIMEOUT_SECONDS = float(os.environ.get("MASTER_STEGO_CARVE_TIMEOUT_SECONDS", 60))
+FLAG_FORMATS = tuple(
+    fmt.strip() for fmt in os.environ.get("MASTER_STEGO_FLAG_FORMATS", "flag,ctf,genzipher").split(",") if fmt.strip()
+)
+RECURSION_MAX_DEPTH = int(os.environ.get("MASTER_STEGO_RECURSION_MAX_DEPTH", 3))
+RECURSION_MAX_BYTES = int(os.environ.get("MASTER_STEGO_RECURSION_MAX_BYTES", 256 << 20))
+RECURSION_MAX_CHILDREN = int(os.environ.get("MASTER_STEGO_RECURSION_MAX_CHILDREN", 32))
+RECURSION_TIMEOUT_SECONDS = float(os.environ.get("MASTER_STEGO_RECURSION_TIMEOUT_SECONDS", 300))
+BATCH_WORKERS = int(os.environ.get("MASTER_STEGO_BATCH_WORKERS", os.cpu_count() or 1))
+BATCH_MAX_FILES = int(os.environ.get("MASTER_STEGO_BATCH_MAX_FILES", 500))
+BATCH_MAX_BYTES = int(os.environ.get("MASTER_STEGO_BATCH_MAX_BYTES", 2 << 30))
+TOOL_MAX_CONCURRENCY = int(os.environ.get("MASTER_STEGO_TOOL_MAX_CONCURRENCY", os.cpu_count() or 1))
+TOOL_CPU_SECONDS = int(os.environ.get("MASTER_STEGO_TOOL_CPU_SECONDS", 300))
+TOOL_MAX_MEMORY_BYTES = int(os.environ.get("MASTER_STEGO_TOOL_MAX_MEMORY_BYTES", 4 << 30))
+TOOL_MAX_OUTPUT_BYTES = int(os.environ.get("MASTER_STEGO_TOOL_MAX_OUTPUT_BYTES", 256 << 20))
+TOOL_OUTPUT_HEAD_BYTES = int(os.environ.get("MASTER_STEGO_TOOL_OUTPUT_HEAD_BYTES", 1 << 20))
+TOOL_OUTPUT_TAIL_BYTES = int(os.environ.get("MASTER_STEGO_TOOL_OUTPUT_TAIL_BYTES", 256 << 10))
+DECODE_MAX_NODES = int(os.environ.get("MASTER_STEGO_DECODE_MAX_NODES", 20000))
+DECODE_TIMEOUT_SECONDS = float(os.environ.get("MASTER_STEGO_DECODE_TIMEOUT_SECONDS", 5))
+IMAGE_MAX_PIXELS = int(os.environ.get("MASTER_STEGO_IMAGE_MAX_PIXELS", 100_000_000))
+IMAGE_MEMORY_BYTES = int(os.environ.get("MASTER_STEGO_IMAGE_MEMORY_BYTES", 256 << 20))
+SCAN_PROFILE = os.environ.get("MASTER_STEGO_SCAN_PROFILE", "full").strip().lower()
+STEGHIDE_CRACK_WORKERS = int(os.environ.get("MASTER_STEGO_STEGHIDE_CRACK_WORKERS", max(1, TOOL_MAX_CONCURRENCY // 2)))
+STEGHIDE_CRACK_TIMEOUT_SECONDS = float(os.environ.get("MASTER_STEGO_STEGHIDE_CRACK_TIMEOUT_SECONDS", 600))
 
+os.makedirs(TMP_DIR, exist_ok=True)
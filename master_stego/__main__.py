@@ -0,0 +1,264 @@
+import argparse
+import fnmatch
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, TextIO
+
+from master_stego import BATCH_WORKERS, SCAN_PROFILE
+from master_stego.analysis import registry
+from master_stego.analysis.flag_detection import parse_formats
+from master_stego.analysis.pipeline import run_full_analysis
+from master_stego.analysis.steghide_module import BUNDLED_WORDLIST
+from master_stego.batch import summarize
+from master_stego.sessions import session_store
+from master_stego.utils import tools
+from master_stego.utils.file_buffer import FileBuffer
+
+
+# grep-style: 0 when a flag was found, 1 when none was, 2 when any input failed.
+EXIT_FLAGS = 0
+EXIT_NO_FLAGS = 1
+EXIT_ERROR = 2
+EXIT_INTERRUPTED = 130
+
+
+def iter_inputs(paths: Sequence[str], patterns: Sequence[str]) -> Iterator[str]:
+    def wanted(path: str) -> bool:
+        name = os.path.basename(path)
+        return not patterns or any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    if os.path.isfile(full) and wanted(full):
+                        yield os.path.abspath(full)
+        else:
+            # Missing paths are passed through so they show up as failed records.
+            yield os.path.abspath(path)
+
+
+def recorded_paths(output_path: str) -> Set[str]:
+    done: Set[str] = set()
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get("status") == "ok":
+                    done.add(record.get("path"))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _session_ids(result: Dict[str, Any]) -> Iterator[str]:
+    yield result["session_id"]
+    for child in result.get("children") or []:
+        if child.get("result"):
+            yield from _session_ids(child["result"])
+
+
+def analyze_path(path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.monotonic()
+    record: Dict[str, Any] = {"path": path}
+    session_id, session_dir = session_store.create()
+    result: Optional[Dict[str, Any]] = None
+    try:
+        with FileBuffer(path, algorithms=("sha256",)) as buffer:
+            record["size"] = buffer.size
+            record["sha256"] = buffer.digests()["sha256"]
+        result = run_full_analysis(
+            path,
+            session_id,
+            session_dir,
+            options["steghide_passphrase"],
+            flag_formats=options["flag_formats"],
+            steghide_wordlist=options["steghide_wordlist"],
+            profile=options["profile"],
+        )
+        record["status"] = "ok"
+        record.update(summarize(result))
+        if options["keep_sessions"]:
+            record["session_id"] = session_id
+        if options["full"]:
+            record["result"] = result
+    except Exception as exc:
+        record["status"] = "error"
+        record["error"] = str(exc)
+    finally:
+        if not options["keep_sessions"]:
+            for sid in _session_ids(result) if result else [session_id]:
+                sid_dir = session_store.path(sid)
+                if sid_dir is not None:
+                    shutil.rmtree(sid_dir, ignore_errors=True)
+    record["elapsed"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def run(
+    inputs: Iterator[str],
+    out: TextIO,
+    options: Dict[str, Any],
+    workers: int,
+    quiet: bool = False,
+) -> Dict[str, int]:
+    totals = {"ok": 0, "error": 0, "flagged": 0}
+
+    def emit(record: Dict[str, Any]) -> None:
+        out.write(json.dumps(record, default=str) + "\n")
+        out.flush()
+        totals[record["status"]] += 1
+        if record.get("flags"):
+            totals["flagged"] += 1
+        if not quiet:
+            note = record.get("error") or ", ".join(record.get("flags") or []) or "no flags"
+            print(f"[{totals['ok'] + totals['error']}] {record['path']}: {note}", file=sys.stderr)
+
+    if workers <= 1:
+        tools.probe()
+        for path in inputs:
+            emit(analyze_path(path, options))
+        return totals
+
+    # Keep a bounded number of submissions in flight so a corpus of millions of
+    # files is walked lazily instead of being turned into futures up front.
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=tools.probe)
+    pending: Dict[Any, str] = {}
+    try:
+        for path in inputs:
+            while len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pool = _collect(done, pending, emit, pool, workers, options)
+            pending[pool.submit(analyze_path, path, options)] = path
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            pool = _collect(done, pending, emit, pool, workers, options)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return totals
+
+
+def _collect(
+    done,
+    pending: Dict[Any, str],
+    emit: Callable[[Dict[str, Any]], None],
+    pool: ProcessPoolExecutor,
+    workers: int,
+    options: Dict[str, Any],
+) -> ProcessPoolExecutor:
+    broken = False
+    for future in done:
+        path = pending.pop(future)
+        try:
+            emit(future.result())
+        except BrokenProcessPool as exc:
+            broken = True
+            emit({"path": path, "status": "error", "error": f"worker process died: {exc}"})
+    if broken:
+        # Everything still pending on the dead pool fails with it; resubmit to a fresh one.
+        pool.shutdown(wait=False, cancel_futures=True)
+        retry = list(pending.values())
+        pending.clear()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=tools.probe)
+        for path in retry:
+            pending[pool.submit(analyze_path, path, options)] = path
+    return pool
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m master_stego",
+        description="Analyze files offline and write one JSON line per file.",
+    )
+    parser.add_argument("paths", nargs="+", help="files or directories (walked recursively)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=BATCH_WORKERS, help="worker processes (default: MASTER_STEGO_BATCH_WORKERS)"
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="append to --output and skip inputs it already records as ok"
+    )
+    parser.add_argument("--include", action="append", default=[], help="only files whose name matches this glob")
+    parser.add_argument("--passphrase", default="", help="steghide passphrase")
+    parser.add_argument(
+        "--wordlist",
+        nargs="?",
+        const=BUNDLED_WORDLIST,
+        default=None,
+        help="crack the steghide passphrase with this wordlist (the bundled one if no file is given)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=registry.PROFILES,
+        default=SCAN_PROFILE,
+        help="quick: run the expensive analyzers only when triage finds something (default: MASTER_STEGO_SCAN_PROFILE)",
+    )
+    parser.add_argument("--flag-format", action="append", default=[], help="extra flag prefix, e.g. picoCTF")
+    parser.add_argument("--full", action="store_true", help="include the full report in each line")
+    parser.add_argument(
+        "--keep-sessions", action="store_true", help="keep session directories (carved files, renders) on disk"
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="no per-file progress on stderr")
+    args = parser.parse_args(argv)
+
+    if args.resume and args.output == "-":
+        parser.error("--resume needs --output")
+    if args.wordlist is not None and not os.path.isfile(args.wordlist):
+        parser.error(f"wordlist not found: {args.wordlist}")
+    if args.profile not in registry.PROFILES:
+        parser.error(f"unknown profile in MASTER_STEGO_SCAN_PROFILE: {args.profile}")
+
+    options = {
+        "steghide_passphrase": args.passphrase,
+        "steghide_wordlist": os.path.abspath(args.wordlist) if args.wordlist else None,
+        "flag_formats": parse_formats(args.flag_format),
+        "profile": args.profile,
+        "full": args.full,
+        "keep_sessions": args.keep_sessions,
+    }
+
+    inputs = iter_inputs(args.paths, args.include)
+    if args.resume:
+        done = recorded_paths(args.output)
+        inputs = (path for path in inputs if path not in done)
+
+    out = sys.stdout
+    if args.output != "-":
+        out = open(args.output, "a" if args.resume else "w", encoding="utf-8")
+        if args.resume and out.tell() > 0:
+            # A run killed mid-write leaves a partial last line; start on a fresh one.
+            with open(args.output, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    out.write("\n")
+
+    try:
+        totals = run(inputs, out, options, max(1, args.jobs), quiet=args.quiet)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if not args.quiet:
+        print(
+            f"{totals['ok']} analyzed, {totals['error']} failed, {totals['flagged']} with flags",
+            file=sys.stderr,
+        )
+    if totals["error"]:
+        return EXIT_ERROR
+    return EXIT_FLAGS if totals["flagged"] else EXIT_NO_FLAGS
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,6 +2,7 @@ from . import file_info
 from . import exif_metadata
 from . import strings_analysis
 from . import header_footer
+from . import signatures
 from . import binwalk_analysis
 from . import color_channels
 from . import enhancements
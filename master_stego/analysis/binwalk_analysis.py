@@ -1,37 +1,77 @@
-import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
-from master_stego.utils.subprocess_utils import run_command
+from master_stego.analysis import carver, signatures
+from master_stego.utils.file_buffer import FileBuffer
 
 
-def analyze(file_path: str, session_dir: str) -> Dict[str, Any]:
+VERSION = "5"
+COST = "expensive"
+DEPENDS = ("signatures",)
+# The signature report stops at signatures.MAX_FINDINGS of any kind; when it
+# does, carving scans again for the carvable kinds alone, with more room.
+SCAN_MAX_FINDINGS = 16384
+SCAN_MAX_CANDIDATES = 2_000_000
+
+
+def _describe(finding: Dict[str, Any]) -> str:
+    details = ", ".join(f"{key}: {value}" for key, value in finding.get("details", {}).items())
+    return f"{finding['description']}, {details}" if details else finding["description"]
+
+
+def summarize(findings: List[Dict[str, Any]]) -> str:
+    lines = [f"{'DECIMAL':<14}{'HEXADECIMAL':<18}DESCRIPTION", "-" * 80]
+    for finding in findings:
+        offset = finding["offset"]
+        lines.append(f"{offset:<14}{hex(offset):<18}{_describe(finding)}")
+    return "\n".join(lines)
+
+
+def analyze(
+    file_path: str,
+    session_dir: str,
+    buffer: Optional[FileBuffer] = None,
+    findings: Optional[List[Dict[str, Any]]] = None,
+    findings_truncated: bool = False,
+) -> Dict[str, Any]:
+    if buffer is None:
+        with FileBuffer(file_path) as own:
+            return analyze(file_path, session_dir, buffer=own, findings=findings, findings_truncated=findings_truncated)
     result: Dict[str, Any] = {
         "summary": None,
         "stderr": None,
         "returncode": None,
         "available": True,
+        "engine": "native",
         "extracted_paths": [],
+        "carved": [],
     }
 
-    cmd_result = run_command(["binwalk", "-e", "-q", file_path], cwd=session_dir, timeout=120)
-    result["returncode"] = cmd_result["returncode"]
-    result["summary"] = cmd_result["stdout"]
-    result["stderr"] = cmd_result["stderr"]
-
-    if cmd_result["stderr"] == "command not found" or cmd_result["returncode"] is None:
-        result["available"] = False
-        result["summary"] = "binwalk not installed on server"
-        return result
-
-    extracted: List[str] = []
-    for entry in os.listdir(session_dir):
-        if entry.endswith(".extracted"):
-            extracted_dir = os.path.join(session_dir, entry)
-            for root, _, files in os.walk(extracted_dir):
-                for f in files:
-                    rel = os.path.relpath(os.path.join(root, f), session_dir)
-                    extracted.append(rel.replace(os.sep, "/"))
-
-    result["extracted_paths"] = extracted
+    data = buffer.data
+    if findings is None or findings_truncated:
+        scan = signatures.scan(
+            data, max_findings=SCAN_MAX_FINDINGS, kinds=carver.CARVABLE_KINDS, max_candidates=SCAN_MAX_CANDIDATES
+        )
+        carve_from = scan["findings"]
+        result["scan_truncated"] = scan["truncated"]
+        if findings is None:
+            findings = carve_from
+    else:
+        carve_from = findings
+        result["scan_truncated"] = False
+
+    carved = carver.carve(data, carve_from, session_dir)
+    result["summary"] = summarize(findings)
+    result["returncode"] = 0
+    result["extracted_paths"] = carved["extracted_paths"]
+    result["carved"] = carved["carved"]
+    notes = []
+    if result["scan_truncated"]:
+        notes.append("signature scan stopped early; offsets past its limit were not carved")
+    if carved["budget_exhausted"]:
+        notes.append(f"carving stopped early: {carved['budget_exhausted']} budget exhausted")
+    if carved["budget_exhausted"] == "time":
+        # A less loaded run may carve more; do not cache this one.
+        result["partial"] = True
+    result["stderr"] = "\n".join(notes) or None
 
     return result
@@ -1,37 +1,46 @@
-import os
-from typing import Dict, Any
+import io
+from typing import Dict, Any, Optional
 
 import numpy as np
 from PIL import Image
 
+from master_stego.analysis.formats import IMAGE_FORMATS
+from master_stego.analysis.image_context import CHANNEL_NAMES, ImageContext
 
-def analyze(file_path: str, session_id: str, session_dir: str) -> Dict[str, Any]:
-    result: Dict[str, Any] = {"planes": {}}
 
-    try:
-        with Image.open(file_path) as img:
-            img = img.convert("RGBA")
-            arr = np.array(img)
+VERSION = "3"
+FORMATS = IMAGE_FORMATS
+COST = "moderate"
+DECODES_PIXELS = True
 
-        channel_names = ["r", "g", "b", "a"]
 
-        for idx, name in enumerate(channel_names):
-            channel = arr[:, :, idx]
-            for bit in range(8):
-                mask = 1 << bit
-                plane = ((channel & mask) > 0).astype("uint8") * 255
-                out_img = Image.fromarray(plane, mode="L")
-                filename = f"bitplane_{name}_{bit}.png"
-                out_path = os.path.join(session_dir, filename)
-                out_img.save(out_path)
+def analyze(file_path: str, session_id: str, session_dir: str, ctx: Optional[ImageContext] = None) -> Dict[str, Any]:
+    if ctx is None:
+        with ImageContext(file_path) as own:
+            return analyze(file_path, session_id, session_dir, ctx=own)
+    result: Dict[str, Any] = {"planes": {}}
 
+    try:
+        header = ctx.header
+        result["size"] = {"width": header["width"], "height": header["height"]}
+        stride = ctx.preview_stride()
+        if stride > 1:
+            result["preview_stride"] = stride
+        for name in CHANNEL_NAMES:
+            for bit in range(8):
                 result["planes"].setdefault(name, {})
                 result["planes"][name][str(bit)] = {
-                    "filename": filename,
-                    "url": f"/api/session/{session_id}/files/{filename}",
+                    "url": f"/api/session/{session_id}/bitplane/{name}/{bit}",
                 }
     except Exception as exc:
         result["error"] = str(exc)
 
     return result
 
+
+def render_plane(ctx: ImageContext, channel: str, bit: int) -> bytes:
+    rgba, _ = ctx.preview()
+    plane = ((rgba[:, :, CHANNEL_NAMES.index(channel)] >> bit) & 1).astype(np.uint8) * 255
+    buf = io.BytesIO()
+    Image.fromarray(plane).save(buf, format="PNG")
+    return buf.getvalue()
@@ -0,0 +1,75 @@
+from typing import List, Optional
+
+import numpy as np
+
+
+PRINTABLE_LUT = np.full(256, ord("."), dtype=np.uint8)
+PRINTABLE_LUT[32:127] = np.arange(32, 127, dtype=np.uint8)
+PRINTABLE_LUT[[9, 10, 13]] = [9, 10, 13]
+
+IS_PRINTABLE = PRINTABLE_LUT != ord(".")
+IS_PRINTABLE[ord(".")] = True
+
+
+def leading_values(values: np.ndarray, count: Optional[int] = None) -> np.ndarray:
+    if count is None or values.ndim < 2:
+        flat = values.reshape(-1)
+        return flat if count is None else flat[:count]
+
+    per_row = int(np.prod(values.shape[1:]))
+    rows = -(-count // per_row) if per_row else 0
+    return values[:rows].reshape(-1)[:count]
+
+
+def bit_stream(
+    values: np.ndarray,
+    bit: int = 0,
+    max_bytes: Optional[int] = None,
+    bitorder: str = "big",
+) -> bytes:
+    count = None if max_bytes is None else max_bytes * 8
+    flat = leading_values(values, count)
+    usable = len(flat) - len(flat) % 8
+    bits = (flat[:usable] >> bit) & 1
+    return np.packbits(bits, bitorder=bitorder).tobytes()
+
+
+class StreamPacker:
+    # bit_stream over an array that arrives in row bands: the bits left over
+    # from one band are carried into the next, so the output is identical.
+    def __init__(self, bit: int = 0, bitorder: str = "big"):
+        self.bit = bit
+        self.bitorder = bitorder
+        self._carry = np.zeros(0, dtype=np.uint8)
+        self._parts: List[bytes] = []
+
+    def feed(self, values: np.ndarray) -> None:
+        bits = (values.reshape(-1) >> self.bit) & 1
+        if self._carry.size:
+            bits = np.concatenate((self._carry, bits))
+        usable = len(bits) - len(bits) % 8
+        self._parts.append(np.packbits(bits[:usable], bitorder=self.bitorder).tobytes())
+        self._carry = bits[usable:]
+
+    def getvalue(self) -> bytes:
+        return b"".join(self._parts)
+
+
+def to_printable(data: bytes) -> str:
+    if not data:
+        return ""
+    return PRINTABLE_LUT[np.frombuffer(data, dtype=np.uint8)].tobytes().decode("ascii")
+
+
+def printable_ratio(data: bytes) -> float:
+    if not data:
+        return 0.0
+    return float(IS_PRINTABLE[np.frombuffer(data, dtype=np.uint8)].mean())
+
+
+def entropy(data: bytes) -> float:
+    if not data:
+        return 0.0
+    counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    probs = counts[counts > 0] / len(data)
+    return float(-(probs * np.log2(probs)).sum())
@@ -0,0 +1,401 @@
+import bz2
+import lzma
+import os
+import re
+import struct
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from master_stego import CARVE_MAX_BYTES, CARVE_TIMEOUT_SECONDS
+
+
+CARVE_DIR = "_carved"
+MAX_ITEM_BYTES = 64 << 20
+MAX_ITEMS = 256
+MAX_ZIP_MEMBERS = 1024
+INPUT_CHUNK = 64 << 10
+OUTPUT_CHUNK = 1 << 20
+
+EXTENSIONS = {
+    "png": "png",
+    "jpeg": "jpg",
+    "gif": "gif",
+    "bmp": "bmp",
+    "pdf": "pdf",
+    "zip": "zip",
+}
+
+DECOMPRESSORS: Dict[str, Callable[[], Any]] = {
+    "zlib": lambda: zlib.decompressobj(15),
+    "gzip": lambda: zlib.decompressobj(31),
+    "bzip2": bz2.BZ2Decompressor,
+    "xz": lambda: lzma.LZMADecompressor(lzma.FORMAT_XZ),
+    "lzma": lambda: lzma.LZMADecompressor(lzma.FORMAT_ALONE),
+}
+
+UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class Budget:
+    def __init__(self, max_bytes: int = CARVE_MAX_BYTES, timeout: float = CARVE_TIMEOUT_SECONDS):
+        self.remaining = max_bytes
+        self.deadline = time.monotonic() + timeout
+        self.items = 0
+        self.exhausted: Optional[str] = None
+
+    def expired(self) -> bool:
+        if self.exhausted is None and time.monotonic() > self.deadline:
+            self.exhausted = "time"
+        return self.exhausted is not None
+
+    def take(self, size: int) -> bool:
+        if size > self.remaining:
+            self.exhausted = "bytes"
+            return False
+        self.remaining -= size
+        return True
+
+
+class _Sink:
+    # Writes one carved output, enforcing the per-item and global byte budgets.
+    def __init__(self, path: str, budget: Budget, limit: int = MAX_ITEM_BYTES):
+        self.path = path
+        self.budget = budget
+        self.limit = limit
+        self.size = 0
+        self.overflow = False
+        self._file = None
+
+    def write(self, chunk: bytes) -> bool:
+        if not chunk:
+            return True
+        if self.size + len(chunk) > self.limit or not self.budget.take(len(chunk)):
+            self.overflow = True
+            return False
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "wb")
+        self._file.write(chunk)
+        self.size += len(chunk)
+        return True
+
+    def close(self) -> bool:
+        if self._file is None:
+            return False
+        self._file.close()
+        return True
+
+
+class _Measure(_Sink):
+    # Consumes output without storing it; for when only an extent is needed.
+    def __init__(self, budget: Budget):
+        super().__init__("", budget)
+
+    def write(self, chunk: bytes) -> bool:
+        if self.size + len(chunk) > self.limit:
+            self.overflow = True
+            return False
+        self.size += len(chunk)
+        return True
+
+
+def _copy(data, start: int, end: int, sink: _Sink) -> None:
+    for pos in range(start, end, OUTPUT_CHUNK):
+        if not sink.write(bytes(data[pos : min(pos + OUTPUT_CHUNK, end)])):
+            return
+
+
+def _decompress_chunks(decompressor, buf: bytes) -> Iterable[bytes]:
+    if hasattr(decompressor, "unconsumed_tail"):
+        while buf:
+            yield decompressor.decompress(buf, OUTPUT_CHUNK)
+            if decompressor.eof:
+                return
+            buf = decompressor.unconsumed_tail
+    else:
+        yield decompressor.decompress(buf, OUTPUT_CHUNK)
+        while not decompressor.eof and not decompressor.needs_input:
+            yield decompressor.decompress(b"", OUTPUT_CHUNK)
+
+
+def _inflate(data, start: int, decompressor, sink: _Sink, budget: Budget) -> Dict[str, Any]:
+    fed = start
+    end = len(data)
+    error = None
+    try:
+        while fed < end and not decompressor.eof:
+            if budget.expired():
+                break
+            chunk = bytes(data[fed : fed + INPUT_CHUNK])
+            fed += len(chunk)
+            for out in _decompress_chunks(decompressor, chunk):
+                if not sink.write(out):
+                    break
+            if sink.overflow:
+                break
+    except (zlib.error, OSError, EOFError, lzma.LZMAError) as exc:
+        error = str(exc)
+
+    complete = bool(decompressor.eof)
+    consumed = fed - start - (len(decompressor.unused_data) if complete else 0)
+    info: Dict[str, Any] = {"length": consumed, "size": sink.size, "complete": complete}
+    if sink.overflow:
+        info["truncated"] = True
+    if error:
+        info["error"] = error
+    return info
+
+
+def _png_end(data, offset: int) -> Optional[int]:
+    pos = offset + 8
+    end = len(data)
+    while pos + 12 <= end:
+        length = struct.unpack_from(">I", data, pos)[0]
+        chunk_type = bytes(data[pos + 4 : pos + 8])
+        if length > 0x7FFFFFFF or not chunk_type.isalpha():
+            return None
+        pos += 12 + length
+        if chunk_type == b"IEND":
+            return pos if pos <= end else None
+    return None
+
+
+def _jpeg_end(data, offset: int) -> Optional[int]:
+    pos = offset + 2
+    end = len(data)
+    while pos + 2 <= end:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0xD9:
+            return pos + 2
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            pos += 2
+            continue
+        if pos + 4 > end:
+            return None
+        pos += 2 + struct.unpack_from(">H", data, pos + 2)[0]
+        if marker != 0xDA:
+            continue
+        # Entropy-coded data: 0xFF is only followed by a stuffed 0x00 or a restart
+        # marker until the next real marker.
+        while True:
+            pos = data.find(b"\xff", pos)
+            if pos == -1 or pos + 1 >= end:
+                return None
+            following = data[pos + 1]
+            if following == 0x00 or 0xD0 <= following <= 0xD7 or following == 0xFF:
+                pos += 1
+                continue
+            break
+    return None
+
+
+def _gif_sub_blocks(data, pos: int) -> Optional[int]:
+    end = len(data)
+    while pos < end:
+        size = data[pos]
+        pos += 1 + size
+        if size == 0:
+            return pos
+    return None
+
+
+def _gif_end(data, offset: int) -> Optional[int]:
+    end = len(data)
+    flags = data[offset + 10]
+    pos = offset + 13
+    if flags & 0x80:
+        pos += 3 << ((flags & 0x07) + 1)
+    while pos < end:
+        block = data[pos]
+        if block == 0x3B:
+            return pos + 1
+        if block == 0x21:
+            pos = _gif_sub_blocks(data, pos + 2)
+        elif block == 0x2C:
+            local = data[pos + 9]
+            pos += 10
+            if local & 0x80:
+                pos += 3 << ((local & 0x07) + 1)
+            pos = _gif_sub_blocks(data, pos + 1)
+        else:
+            return None
+        if pos is None:
+            return None
+    return None
+
+
+def _bmp_end(data, offset: int) -> Optional[int]:
+    size = struct.unpack_from("<I", data, offset + 2)[0]
+    return offset + size if offset + size <= len(data) else None
+
+
+def _pdf_end(data, offset: int) -> Optional[int]:
+    # Incremental updates append further %%EOF markers; stop before the next
+    # document header so concatenated PDFs are carved separately.
+    limit = data.find(b"%PDF-", offset + 5)
+    limit = len(data) if limit == -1 else limit
+    eof = data.rfind(b"%%EOF", offset, limit)
+    if eof == -1:
+        return None
+    end = eof + 5
+    while end < limit and data[end] in (0x0A, 0x0D):
+        end += 1
+    return end
+
+
+STRUCTURE_ENDS: Dict[str, Callable[[Any, int], Optional[int]]] = {
+    "png": _png_end,
+    "jpeg": _jpeg_end,
+    "gif": _gif_end,
+    "bmp": _bmp_end,
+    "pdf": _pdf_end,
+}
+CARVABLE_KINDS = frozenset(STRUCTURE_ENDS) | frozenset(DECOMPRESSORS) | {"zip"}
+
+
+def _safe_member_path(name: str, index: int) -> str:
+    parts = [UNSAFE_NAME_CHARS.sub("_", part) for part in name.replace("\\", "/").split("/")]
+    parts = [part for part in parts if part and part not in (".", "..")]
+    return "/".join(parts) or f"member_{index}"
+
+
+def _zip_members(data, offset: int, out_dir: Optional[str], session_dir: str, budget: Budget) -> Tuple[int, List[Dict[str, Any]]]:
+    members: List[Dict[str, Any]] = []
+    pos = offset
+    end = len(data)
+    while pos + 30 <= end and bytes(data[pos : pos + 4]) == b"PK\x03\x04" and len(members) < MAX_ZIP_MEMBERS:
+        if budget.expired():
+            break
+        _, flags, method = struct.unpack_from("<HHH", data, pos + 4)
+        compressed, size, name_len, extra_len = struct.unpack_from("<IIHH", data, pos + 18)
+        name = bytes(data[pos + 30 : pos + 30 + name_len]).decode("utf-8", "replace")
+        start = pos + 30 + name_len + extra_len
+        member: Dict[str, Any] = {"name": name, "offset": pos, "method": method, "compressed_size": compressed}
+
+        if flags & 1:
+            member["encrypted"] = True
+            length = compressed if compressed or not flags & 8 else None
+        elif method in (0, 8) and not name.endswith("/"):
+            if out_dir is None:
+                sink = _Measure(budget)
+            else:
+                rel = os.path.join(out_dir, _safe_member_path(name, len(members)))
+                sink = _Sink(os.path.join(session_dir, rel), budget)
+            if method == 8:
+                info = _inflate(data, start, zlib.decompressobj(-15), sink, budget)
+            elif compressed or not flags & 8:
+                stored = min(compressed, end - start)
+                _copy(data, start, start + stored, sink)
+                info = {"length": stored, "size": sink.size, "complete": stored == compressed}
+            else:
+                info = {"length": None, "size": 0, "complete": False, "error": "stored member without size"}
+            if sink.overflow:
+                info["truncated"] = True
+            if sink.close():
+                member["path"] = rel.replace(os.sep, "/")
+            member.update(info)
+            length = info["length"] if info["complete"] else None
+        else:
+            if not name.endswith("/"):
+                member["error"] = "unsupported compression method"
+            length = compressed if compressed or not flags & 8 else None
+
+        members.append(member)
+        if length is None:
+            break
+        pos = start + length
+        if flags & 8:
+            pos += 16 if bytes(data[pos : pos + 4]) == b"PK\x07\x08" else 12
+
+    eocd = data.find(b"PK\x05\x06", pos)
+    if eocd != -1 and eocd + 22 <= end:
+        comment_len = struct.unpack_from("<H", data, eocd + 20)[0]
+        pos = min(eocd + 22 + comment_len, end)
+    return pos - offset, members
+
+
+def carve(
+    data,
+    findings: Iterable[Dict[str, Any]],
+    session_dir: str,
+    budget: Optional[Budget] = None,
+) -> Dict[str, Any]:
+    budget = budget or Budget()
+    carved: List[Dict[str, Any]] = []
+    covered_until = -1
+
+    for finding in sorted(findings, key=lambda item: item["offset"]):
+        kind, offset = finding["type"], finding["offset"]
+        if offset < covered_until:
+            continue
+        if kind not in CARVABLE_KINDS:
+            continue
+        if budget.items >= MAX_ITEMS:
+            budget.exhausted = budget.exhausted or "items"
+        if budget.expired() or budget.exhausted:
+            break
+
+        name = f"{offset:08x}.{EXTENSIONS.get(kind, kind)}"
+        rel = os.path.join(CARVE_DIR, name)
+        entry: Dict[str, Any] = {"type": kind, "offset": offset}
+
+        if kind in STRUCTURE_ENDS:
+            try:
+                end = STRUCTURE_ENDS[kind](data, offset)
+            except (struct.error, IndexError):
+                end = None
+            if end is None:
+                continue
+            covered_until = end
+            entry["length"] = end - offset
+            if offset == 0:
+                # The upload itself; only its extent matters, for skipping nested hits.
+                continue
+            sink = _Sink(os.path.join(session_dir, rel), budget)
+            _copy(data, offset, end, sink)
+            entry["size"] = sink.size
+            entry["complete"] = not sink.overflow
+        elif kind == "zip":
+            # The upload itself is only measured: its members are children already.
+            out_dir = rel + ".d" if offset else None
+            try:
+                length, members = _zip_members(data, offset, out_dir, session_dir, budget)
+            except (struct.error, IndexError):
+                continue
+            if not members:
+                continue
+            covered_until = offset + length
+            if offset == 0:
+                continue
+            sink = _Sink(os.path.join(session_dir, rel), budget)
+            _copy(data, offset, offset + length, sink)
+            entry.update({"length": length, "size": sink.size, "complete": not sink.overflow, "members": members})
+        else:
+            sink = _Sink(os.path.join(session_dir, rel + ".out"), budget)
+            info = _inflate(data, offset, DECOMPRESSORS[kind](), sink, budget)
+            if not sink.size and not info["complete"]:
+                sink.close()
+                continue
+            rel += ".out"
+            covered_until = offset + info["length"]
+            entry.update(info)
+            entry["decompressed"] = True
+
+        if sink.close():
+            entry["path"] = rel.replace(os.sep, "/")
+        budget.items += 1
+        carved.append(entry)
+
+    paths: List[str] = []
+    for entry in carved:
+        if "path" in entry:
+            paths.append(entry["path"])
+        paths.extend(member["path"] for member in entry.get("members", ()) if "path" in member)
+
+    return {"carved": carved, "extracted_paths": paths, "budget_exhausted": budget.exhausted}
@@ -1,28 +1,42 @@
-import os
-from typing import Dict, Any
+import io
+from typing import Dict, Any, Optional
 
+import numpy as np
 from PIL import Image
 
+from master_stego.analysis.formats import IMAGE_FORMATS
+from master_stego.analysis.image_context import CHANNEL_NAMES, ImageContext
 
-def analyze(file_path: str, session_id: str, session_dir: str) -> Dict[str, Any]:
+
+VERSION = "3"
+FORMATS = IMAGE_FORMATS
+COST = "moderate"
+DECODES_PIXELS = True
+
+
+def analyze(file_path: str, session_id: str, session_dir: str, ctx: Optional[ImageContext] = None) -> Dict[str, Any]:
+    if ctx is None:
+        with ImageContext(file_path) as own:
+            return analyze(file_path, session_id, session_dir, ctx=own)
     output = {"channels": {}}
 
     try:
-        with Image.open(file_path) as img:
-            img = img.convert("RGBA")
-            r, g, b, a = img.split()
-
-            mapping = {"r": r, "g": g, "b": b, "a": a}
-            for name, channel in mapping.items():
-                filename = f"channel_{name.upper()}.png"
-                out_path = os.path.join(session_dir, filename)
-                channel.save(out_path)
-                output["channels"][name] = {
-                    "filename": filename,
-                    "url": f"/api/session/{session_id}/files/{filename}",
-                }
+        ctx.header
+        stride = ctx.preview_stride()
+        if stride > 1:
+            output["preview_stride"] = stride
+        for name in CHANNEL_NAMES:
+            output["channels"][name] = {
+                "url": f"/api/session/{session_id}/channel/{name}",
+            }
     except Exception as exc:
         output["error"] = str(exc)
 
     return output
 
+
+def render_channel(ctx: ImageContext, channel: str) -> bytes:
+    buf = io.BytesIO()
+    rgba, _ = ctx.preview()
+    Image.fromarray(np.ascontiguousarray(rgba[:, :, CHANNEL_NAMES.index(channel)])).save(buf, format="PNG")
+    return buf.getvalue()
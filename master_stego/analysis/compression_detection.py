@@ -1,31 +1,17 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Optional
 
+from master_stego.analysis import signatures
+from master_stego.utils.file_buffer import FileBuffer
 
-def analyze(file_path: str) -> Dict[str, Any]:
-    try:
-        with open(file_path, "rb") as f:
-            data = f.read()
-    except Exception as exc:
-        return {"error": str(exc)}
 
-    findings: List[Dict[str, Any]] = []
+VERSION = "2"
 
-    magic_signatures = [
-        ("zip", b"\x50\x4b\x03\x04"),
-        ("gzip", b"\x1f\x8b"),
-        ("zlib", b"\x78\x9c"),
-        ("zlib", b"\x78\x01"),
-        ("zlib", b"\x78\xda"),
-    ]
+CATEGORIES = ("archive", "compressed")
 
-    for name, sig in magic_signatures:
-        offset = 0
-        while True:
-            idx = data.find(sig, offset)
-            if idx == -1:
-                break
-            findings.append({"type": name, "offset": idx})
-            offset = idx + 1
 
-    return {"findings": findings}
+def analyze(file_path: str, buffer: Optional[FileBuffer] = None) -> Dict[str, Any]:
+    result = signatures.analyze(file_path, buffer=buffer)
+    if "error" in result:
+        return result
 
+    return {"findings": [finding for finding in result["findings"] if finding["category"] in CATEGORIES]}
@@ -1,120 +1,292 @@
 import base64
 import binascii
+import hashlib
+import heapq
 import re
-from typing import Dict, Any, List
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote_to_bytes
 
+import numpy as np
 
-def analyze(strings_result: Dict[str, Any]) -> Dict[str, Any]:
-    candidates: List[str] = []
-    for key in ("ascii", "utf16"):
-        section = strings_result.get(key) or {}
-        sample = section.get("sample") or []
-        candidates.extend(sample[:200])
-
-    detected: Dict[str, Any] = {
-        "base64": [],
-        "hex": [],
-        "binary": [],
-        "rot13": [],
-    }
+from master_stego import DECODE_MAX_NODES, DECODE_TIMEOUT_SECONDS
+from master_stego.analysis.bitstream import IS_PRINTABLE, to_printable
 
-    for s in candidates:
-        s_strip = s.strip()
-        if not s_strip:
-            continue
 
-        if _looks_base64(s_strip):
-            decoded = _safe_b64decode(s_strip)
-            if decoded:
-                detected["base64"].append({"source": s_strip, "decoded": decoded[:1024]})
+VERSION = "3"
+COST = "moderate"
+DEPENDS = ("strings",)
 
-        if _looks_hex(s_strip):
-            decoded = _safe_hexdecode(s_strip)
-            if decoded:
-                detected["hex"].append({"source": s_strip, "decoded": decoded[:1024]})
+MAX_DEPTH = 8
+MAX_NODE_BYTES = 64 << 10
+MAX_DECODED = 1024
+MAX_CHAINS = 500
+PRINTABLE_THRESHOLD = 0.9
+MIN_TOKEN = 8
+MIN_OUTPUT = 4
 
-        if _looks_binary(s_strip):
-            decoded = _binary_to_text(s_strip)
-            if decoded:
-                detected["binary"].append({"source": s_strip, "decoded": decoded[:1024]})
+WHITESPACE = re.compile(rb"\s+")
+TOKEN = re.compile(rb"[A-Za-z0-9+/_\-%%]{%d,}={0,2}" % MIN_TOKEN)
+BASE64 = re.compile(rb"[A-Za-z0-9+/]+={0,2}")
+BASE64_URL = re.compile(rb"[A-Za-z0-9_\-]+={0,2}")
+BASE32 = re.compile(rb"[A-Z2-7]+=*")
+BASE85 = re.compile(rb"[0-9A-Za-z!#$%&()*+\-;<=>?@^_`{|}~]+")
+ASCII85 = re.compile(rb"[!-u]+")
+HEX_SEPARATORS = re.compile(rb"0x|\\x|[\s:,]")
+HEX = re.compile(rb"[0-9a-fA-F]+")
+BINARY = re.compile(rb"[01]+")
+DECIMAL = re.compile(rb"\d{1,3}(?:[\s,]+\d{1,3}){3,}")
+PERCENT_ESCAPE = re.compile(rb"%[0-9A-Fa-f]{2}")
 
-        rot = _rot13(s_strip)
-        if rot and rot != s_strip:
-            detected["rot13"].append({"source": s_strip, "decoded": rot[:1024]})
+ROT13 = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz",
+    b"NOPQRSTUVWXYZABCDEFGHIJKLMnopqrstuvwxyzabcdefghijklm",
+)
 
-    return detected
+# Single-layer results keep their pre-chain keys so existing consumers still work.
+LEGACY_KEYS = ("base64", "hex", "binary", "rot13")
 
 
-def _looks_base64(s: str) -> bool:
-    if len(s) < 16 or len(s) % 4 != 0:
-        return False
-    return bool(re.fullmatch(r"[A-Za-z0-9+/]+=*", s))
+def _base64(data: bytes) -> Optional[bytes]:
+    compact = WHITESPACE.sub(b"", data)
+    if len(compact) < MIN_TOKEN:
+        return None
+    if BASE64.fullmatch(compact):
+        altchars = None
+    elif BASE64_URL.fullmatch(compact):
+        altchars = b"-_"
+    else:
+        return None
+    compact = compact.rstrip(b"=")
+    if len(compact) % 4 == 1:
+        return None
+    return base64.b64decode(compact + b"=" * (-len(compact) % 4), altchars=altchars, validate=True)
 
 
-def _safe_b64decode(s: str) -> str:
-    try:
-        data = base64.b64decode(s, validate=True)
-        return _bytes_to_printable(data)
-    except Exception:
-        return ""
+def _base32(data: bytes) -> Optional[bytes]:
+    compact = WHITESPACE.sub(b"", data)
+    if len(compact) < MIN_TOKEN or not BASE32.fullmatch(compact):
+        return None
+    compact = compact.rstrip(b"=")
+    if len(compact) % 8 in (1, 3, 6):
+        return None
+    return base64.b32decode(compact + b"=" * (-len(compact) % 8))
 
 
-def _looks_hex(s: str) -> bool:
-    if len(s) < 16 or len(s) % 2 != 0:
-        return False
-    return bool(re.fullmatch(r"[0-9a-fA-F]+", s))
+def _base85(data: bytes) -> Optional[bytes]:
+    compact = WHITESPACE.sub(b"", data)
+    if len(compact) < 10 or not BASE85.fullmatch(compact):
+        return None
+    return base64.b85decode(compact)
 
 
-def _safe_hexdecode(s: str) -> str:
-    try:
-        data = binascii.unhexlify(s)
-        return _bytes_to_printable(data)
-    except Exception:
-        return ""
+def _ascii85(data: bytes) -> Optional[bytes]:
+    compact = WHITESPACE.sub(b"", data)
+    if compact.startswith(b"<~") and compact.endswith(b"~>"):
+        return base64.a85decode(compact, adobe=True)
+    if len(compact) < 10 or not ASCII85.fullmatch(compact):
+        return None
+    return base64.a85decode(compact)
 
 
-def _looks_binary(s: str) -> bool:
-    if len(s) < 8:
-        return False
-    return bool(re.fullmatch(r"[01]+", s))
+def _hex(data: bytes) -> Optional[bytes]:
+    compact = HEX_SEPARATORS.sub(b"", data)
+    if len(compact) < MIN_TOKEN or len(compact) % 2 or not HEX.fullmatch(compact):
+        return None
+    return binascii.unhexlify(compact)
 
 
-def _binary_to_text(s: str) -> str:
-    bits = s.strip()
-    chars = []
-    for i in range(0, len(bits), 8):
-        chunk = bits[i : i + 8]
-        if len(chunk) < 8:
-            break
-        try:
-            val = int(chunk, 2)
-        except ValueError:
+def _binary(data: bytes) -> Optional[bytes]:
+    compact = WHITESPACE.sub(b"", data)
+    if len(compact) < 8 or len(compact) % 8 or not BINARY.fullmatch(compact):
+        return None
+    return int(compact, 2).to_bytes(len(compact) // 8, "big")
+
+
+def _decimal(data: bytes) -> Optional[bytes]:
+    if not DECIMAL.fullmatch(data.strip()):
+        return None
+    values = [int(value) for value in re.split(rb"[\s,]+", data.strip())]
+    return bytes(values) if max(values) < 256 else None
+
+
+def _url(data: bytes) -> Optional[bytes]:
+    if not PERCENT_ESCAPE.search(data):
+        return None
+    return unquote_to_bytes(data)
+
+
+def _rot13(data: bytes) -> Optional[bytes]:
+    rotated = data.translate(ROT13)
+    return rotated if rotated != data else None
+
+
+def _inflate(wbits: int, magic: Tuple[bytes, ...]) -> Callable[[bytes], Optional[bytes]]:
+    def decode(data: bytes) -> Optional[bytes]:
+        if not data.startswith(magic):
+            return None
+        return zlib.decompressobj(wbits).decompress(data, MAX_NODE_BYTES)
+
+    return decode
+
+
+# Cheapest and most selective first: each decoder rejects input outside its
+# alphabet before doing any work.
+DECODERS: List[Tuple[str, Callable[[bytes], Optional[bytes]]]] = [
+    ("gzip", _inflate(31, (b"\x1f\x8b",))),
+    ("zlib", _inflate(15, (b"\x78\x01", b"\x78\x5e", b"\x78\x9c", b"\x78\xda"))),
+    ("binary", _binary),
+    ("decimal", _decimal),
+    ("hex", _hex),
+    ("base32", _base32),
+    ("base64", _base64),
+    ("base85", _base85),
+    ("ascii85", _ascii85),
+    ("url", _url),
+    ("rot13", _rot13),
+]
+COMPRESSED_MAGIC = (b"\x1f\x8b", b"\x78\x01", b"\x78\x5e", b"\x78\x9c", b"\x78\xda")
+
+
+def _score(data: bytes) -> Tuple[float, float]:
+    values = np.frombuffer(data, dtype=np.uint8)
+    counts = np.bincount(values, minlength=256)
+    probs = counts[counts > 0] / len(values)
+    return float(IS_PRINTABLE[values].mean()), float(-(probs * np.log2(probs)).sum())
+
+
+def _roots(strings_result: Dict[str, Any]) -> Iterator[bytes]:
+    for key in ("ascii", "utf16", "utf16be"):
+        section = strings_result.get(key) or {}
+        for line in section.get("sample") or []:
+            raw = line.strip().encode("utf-8", "replace")
+            if not raw:
+                continue
+            yield raw
+            # "key=SGVsbG8..." or "data: 666c6167..." hide the encoded part in a token.
+            for token in TOKEN.findall(raw):
+                if token != raw:
+                    yield token
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def search(
+    roots: List[bytes],
+    max_nodes: int = DECODE_MAX_NODES,
+    timeout: float = DECODE_TIMEOUT_SECONDS,
+) -> Dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    # Content hash -> first chain that produced it. A layer reached twice (two
+    # strings decoding to the same bytes, rot13 undoing itself) is expanded once.
+    memo: Dict[bytes, Tuple[str, ...]] = {}
+    # Level-first so every string gets its first layer tried before the budget
+    # goes to deep chains; within a level low-entropy (more decoded-looking) first.
+    queue: List[Tuple[int, float, int, bytes, Tuple[str, ...], int]] = []
+    sources: List[str] = []
+    for root in roots:
+        digest = _digest(root)
+        if digest in memo:
+            continue
+        memo[digest] = ()
+        sources.append(to_printable(root[:MAX_DECODED]))
+        queue.append((0, 0.0, len(queue), root, (), len(sources) - 1))
+    heapq.heapify(queue)
+
+    nodes = 0
+    memo_hits = 0
+    exhausted: Optional[str] = None
+    decoded: List[Dict[str, Any]] = []
+
+    while queue:
+        depth, _, _, data, chain, source = heapq.heappop(queue)
+        if depth >= MAX_DEPTH:
+            continue
+        for name, decoder in DECODERS:
+            # rot13 is its own inverse and maps text to text; a second one in a
+            # chain only walks back and forth across other layers.
+            if name == "rot13" and name in chain:
+                continue
+            if nodes >= max_nodes:
+                exhausted = "nodes"
+                break
+            if time.monotonic() > deadline:
+                exhausted = "time"
+                break
+            # Only decoders whose alphabet check passed count against the budget.
+            try:
+                output = decoder(data)
+            except (binascii.Error, ValueError, OverflowError, zlib.error):
+                nodes += 1
+                continue
+            if output is None:
+                continue
+            nodes += 1
+            if len(output) < MIN_OUTPUT or output == data:
+                continue
+
+            digest = _digest(output)
+            if digest in memo:
+                memo_hits += 1
+                continue
+            path = chain + (name,)
+            memo[digest] = path
+
+            output = output[:MAX_NODE_BYTES]
+            printable, entropy = _score(output)
+            if printable >= PRINTABLE_THRESHOLD or output.startswith(COMPRESSED_MAGIC):
+                decoded.append({"source": source, "chain": path, "output": output, "printable": printable})
+                heapq.heappush(queue, (depth + 1, entropy, nodes, output, path, source))
+        if exhausted:
             break
-        if 32 <= val <= 126 or val in (9, 10, 13):
-            chars.append(chr(val))
-        else:
-            chars.append(".")
-    return "".join(chars)
-
-
-def _rot13(s: str) -> str:
-    result_chars = []
-    for c in s:
-        if "a" <= c <= "z":
-            result_chars.append(chr((ord(c) - ord("a") + 13) % 26 + ord("a")))
-        elif "A" <= c <= "Z":
-            result_chars.append(chr((ord(c) - ord("A") + 13) % 26 + ord("A")))
-        else:
-            result_chars.append(c)
-    return "".join(result_chars)
-
-
-def _bytes_to_printable(data: bytes) -> str:
-    text = []
-    for b in data:
-        if 32 <= b <= 126 or b in (9, 10, 13):
-            text.append(chr(b))
-        else:
-            text.append(".")
-    return "".join(text)
 
+    return {
+        "decoded": decoded,
+        "sources": sources,
+        "nodes": nodes,
+        "memo_hits": memo_hits,
+        "exhausted": exhausted,
+    }
+
+
+def analyze(
+    strings_result: Dict[str, Any],
+    max_nodes: int = DECODE_MAX_NODES,
+    timeout: float = DECODE_TIMEOUT_SECONDS,
+) -> Dict[str, Any]:
+    found = search(list(_roots(strings_result)), max_nodes=max_nodes, timeout=timeout)
+
+    detected: Dict[str, Any] = {key: [] for key in LEGACY_KEYS}
+    chains: List[Dict[str, Any]] = []
+    for node in found["decoded"]:
+        if node["printable"] < PRINTABLE_THRESHOLD:
+            continue
+        source = found["sources"][node["source"]]
+        text = to_printable(node["output"][:MAX_DECODED])
+        path = node["chain"]
+        if len(path) == 1 and path[0] in LEGACY_KEYS:
+            detected[path[0]].append({"source": source, "decoded": text})
+        # A lone rot13 of any word is printable; it is listed above, not as a chain.
+        if path != ("rot13",) and len(chains) < MAX_CHAINS:
+            chains.append({
+                "source": source,
+                "chain": list(path),
+                "decoded": text,
+                "printable": round(node["printable"], 3),
+            })
+
+    chains.sort(key=lambda entry: len(entry["chain"]), reverse=True)
+    detected["chains"] = chains
+    detected["search"] = {
+        "roots": len(found["sources"]),
+        "nodes": found["nodes"],
+        "memo_hits": found["memo_hits"],
+        "exhausted": found["exhausted"],
+    }
+    if found["exhausted"] == "time":
+        # The node limit is deterministic; the clock is not, so this is not cached.
+        detected["partial"] = True
+    return detected
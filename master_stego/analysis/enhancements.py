@@ -1,53 +1,68 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 import cv2
-from PIL import Image, ImageOps, ImageEnhance
+from PIL import Image
 import numpy as np
 
+from master_stego.analysis.formats import IMAGE_FORMATS
+from master_stego.analysis.image_context import ImageContext
 
-def analyze(file_path: str, session_id: str, session_dir: str) -> Dict[str, Any]:
+
+VERSION = "2"
+FORMATS = IMAGE_FORMATS
+COST = "expensive"
+DECODES_PIXELS = True
+
+
+def analyze(file_path: str, session_id: str, session_dir: str, ctx: Optional[ImageContext] = None) -> Dict[str, Any]:
+    if ctx is None:
+        with ImageContext(file_path) as own:
+            return analyze(file_path, session_id, session_dir, ctx=own)
     result: Dict[str, Any] = {"images": {}}
 
     try:
-        with Image.open(file_path) as img:
-            img = img.convert("RGB")
-
-            inverted = ImageOps.invert(img)
-            inverted_name = "enh_invert.png"
-            inverted_path = os.path.join(session_dir, inverted_name)
-            inverted.save(inverted_path)
-            result["images"]["invert"] = {
-                "filename": inverted_name,
-                "url": f"/api/session/{session_id}/files/{inverted_name}",
-            }
-
-            enhancer = ImageEnhance.Contrast(img)
-            contrasted = enhancer.enhance(2.0)
-            contrast_name = "enh_contrast.png"
-            contrast_path = os.path.join(session_dir, contrast_name)
-            contrasted.save(contrast_path)
-            result["images"]["contrast"] = {
-                "filename": contrast_name,
-                "url": f"/api/session/{session_id}/files/{contrast_name}",
-            }
+        if ctx.banded:
+            # Visual aids only: work on the strided preview instead of full size.
+            rgba, stride = ctx.preview()
+            rgb = rgba[:, :, :3]
+            gray = np.asarray(Image.fromarray(np.ascontiguousarray(rgb)).convert("L"))
+            result["preview_stride"] = stride
+        else:
+            rgb, gray = ctx.rgb, ctx.gray
+
+        inverted = Image.fromarray(255 - rgb)
+        inverted_name = "enh_invert.png"
+        inverted_path = os.path.join(session_dir, inverted_name)
+        inverted.save(inverted_path)
+        result["images"]["invert"] = {
+            "filename": inverted_name,
+            "url": f"/api/session/{session_id}/files/{inverted_name}",
+        }
+
+        mean = int(gray.mean() + 0.5)
+        contrasted = Image.fromarray(np.clip(2 * rgb.astype(np.int16) - mean, 0, 255).astype(np.uint8))
+        contrast_name = "enh_contrast.png"
+        contrast_path = os.path.join(session_dir, contrast_name)
+        contrasted.save(contrast_path)
+        result["images"]["contrast"] = {
+            "filename": contrast_name,
+            "url": f"/api/session/{session_id}/files/{contrast_name}",
+        }
     except Exception as exc:
         result["error"] = str(exc)
         return result
 
     try:
-        cv_img = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
-        if cv_img is not None:
-            _, thresh = cv2.threshold(cv_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            thresh_name = "enh_threshold.png"
-            thresh_path = os.path.join(session_dir, thresh_name)
-            cv2.imwrite(thresh_path, thresh)
-            result["images"]["threshold"] = {
-                "filename": thresh_name,
-                "url": f"/api/session/{session_id}/files/{thresh_name}",
-            }
+        _, thresh = cv2.threshold(np.ascontiguousarray(gray), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        thresh_name = "enh_threshold.png"
+        thresh_path = os.path.join(session_dir, thresh_name)
+        cv2.imwrite(thresh_path, thresh)
+        result["images"]["threshold"] = {
+            "filename": thresh_name,
+            "url": f"/api/session/{session_id}/files/{thresh_name}",
+        }
     except Exception as exc:
         result.setdefault("threshold_error", str(exc))
 
     return result
-
@@ -2,13 +2,33 @@ from typing import Dict, Any
 
 from PIL import Image, ExifTags
 
+from master_stego.utils import tools
 from master_stego.utils.subprocess_utils import run_command
 
 
+VERSION = "2"
+COST = "moderate"
+
+# Describe where and when the upload was stored rather than the file itself;
+# dropped so results do not depend on the session that produced them.
+FILESYSTEM_TAGS = (
+    "SourceFile",
+    "Directory",
+    "FileName",
+    "FileModifyDate",
+    "FileAccessDate",
+    "FileInodeChangeDate",
+    "FilePermissions",
+)
+
+
 def analyze(file_path: str) -> Dict[str, Any]:
     result: Dict[str, Any] = {"exiftool": None, "pillow": None}
 
-    cmd_result = run_command(["exiftool", "-json", file_path])
+    if not tools.available("exiftool"):
+        cmd_result = {"returncode": None, "stdout": "", "stderr": "command not found"}
+    else:
+        cmd_result = run_command(["exiftool", "-json", file_path])
     if cmd_result["stderr"].strip() == "command not found" or cmd_result["returncode"] is None:
         result["exiftool"] = {"available": False, "error": "exiftool not installed on server"}
     elif cmd_result["returncode"] == 0:
@@ -17,7 +37,8 @@ def analyze(file_path: str) -> Dict[str, Any]:
 
             parsed = json.loads(cmd_result["stdout"])
             if isinstance(parsed, list) and parsed:
-                result["exiftool"] = {"available": True, "data": parsed[0]}
+                data = {key: value for key, value in parsed[0].items() if key not in FILESYSTEM_TAGS}
+                result["exiftool"] = {"available": True, "data": data}
             else:
                 result["exiftool"] = {"available": True, "data": {}}
         except Exception:
@@ -1,10 +1,18 @@
 import os
-import hashlib
-from PIL import Image
+from typing import Optional
 
+from master_stego.analysis.image_context import ImageContext
 
-def analyze(file_path):
-    info = {}
+
+VERSION = "3"
+COST = "cheap"
+
+
+def analyze(file_path, ctx: Optional[ImageContext] = None, detected_format: Optional[str] = None):
+    if ctx is None:
+        with ImageContext(file_path) as own:
+            return analyze(file_path, ctx=own, detected_format=detected_format)
+    info = {"detected_format": detected_format}
     try:
         stat = os.stat(file_path)
         info["size_bytes"] = stat.st_size
@@ -12,23 +20,23 @@ def analyze(file_path):
         info["size_bytes"] = None
 
     try:
-        with open(file_path, "rb") as f:
-            data = f.read()
-        info["sha256"] = hashlib.sha256(data).hexdigest()
-        info["md5"] = hashlib.md5(data).hexdigest()
+        digests = ctx.file_buffer.digests()
+        info["sha256"] = digests.get("sha256")
+        info["md5"] = digests.get("md5")
+        info["sha1"] = digests.get("sha1")
     except Exception:
         info["sha256"] = None
         info["md5"] = None
+        info["sha1"] = None
 
     try:
-        with Image.open(file_path) as img:
-            info["format"] = img.format
-            info["mode"] = img.mode
-            info["size"] = {"width": img.width, "height": img.height}
+        header = ctx.header
+        info["format"] = header["format"]
+        info["mode"] = header["mode"]
+        info["size"] = {"width": header["width"], "height": header["height"]}
     except Exception:
         info["format"] = None
         info["mode"] = None
         info["size"] = None
 
     return info
-
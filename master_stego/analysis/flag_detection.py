@@ -1,57 +1,86 @@
 import re
-from typing import Dict, Any, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+from master_stego import FLAG_FORMATS
 
-FLAG_PATTERNS = [
-    re.compile(r"flag\{.*?\}", re.IGNORECASE),
-    re.compile(r"ctf\{.*?\}", re.IGNORECASE),
-    re.compile(r"genzipher\{.*?\}", re.IGNORECASE),
-]
 
+VERSION = "2"
+COST = "moderate"
 
-def analyze(full_result: Dict[str, Any]) -> Dict[str, Any]:
-    found: List[Dict[str, Any]] = []
+MAX_FLAG_BODY = 256
+
+# Every flag format is "<prefix>{<body>}", so candidates are anchored on the brace
+# (a literal the regex engine can skip to) and the prefix is checked afterwards.
+# The second branch is the same shape in UTF-16LE. Bodies exclude braces so a stray
+# "{" before a flag cannot swallow it.
+CANDIDATE_PATTERN = re.compile(
+    rb"\{(?:([\x20-\x7a\x7c\x7e]{0,%d})\}|\x00((?:[\x20-\x7a\x7c\x7e]\x00){0,%d})\}\x00)"
+    % (MAX_FLAG_BODY, MAX_FLAG_BODY)
+)
+FORMAT_PREFIX = re.compile(r"[A-Za-z0-9_\-]+")
+
+
+def parse_formats(formats: Iterable[str]) -> List[str]:
+    parsed: List[str] = []
+    for value in formats:
+        match = FORMAT_PREFIX.match((value or "").strip())
+        if match and match.group(0).lower() not in (p.lower() for p in parsed):
+            parsed.append(match.group(0))
+    return parsed
 
-    def scan_text(text: str, source: str):
-        if not text:
+
+class FlagMatcher:
+    def __init__(self, formats: Sequence[str]):
+        self.formats = parse_formats(formats)
+        self._prefixes = sorted({f.lower().encode("ascii") for f in self.formats}, key=len, reverse=True)
+        # "<prefix>{" alone, for views too short to hold a whole flag (zsteg probes).
+        self.prefix_pattern = (
+            re.compile(rb"(?:%s)\{" % b"|".join(re.escape(p) for p in self._prefixes), re.IGNORECASE)
+            if self._prefixes
+            else None
+        )
+
+    def scan(self, data) -> Iterator[Tuple[str, int]]:
+        if not self._prefixes:
             return
-        for pattern in FLAG_PATTERNS:
-            for match in pattern.findall(text):
-                found.append({"flag": match, "source": source})
+        for match in CANDIDATE_PATTERN.finditer(data):
+            start = match.start()
+            wide = match.group(1) is None
+            body = match.group(2)[::2] if wide else match.group(1)
+            step = 2 if wide else 1
+            for prefix in self._prefixes:
+                begin = start - len(prefix) * step
+                if begin < 0:
+                    continue
+                head = bytes(data[begin:start])
+                if wide:
+                    if head[1::2].strip(b"\x00"):
+                        continue
+                    head = head[::2]
+                if head.lower() == prefix:
+                    yield (head + b"{" + body + b"}").decode("ascii"), begin
+                    break
+
 
+def _text_fields(full_result: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
     file_info = full_result.get("file_info") or {}
     for key, value in file_info.items():
         if isinstance(value, str):
-            scan_text(value, f"file_info.{key}")
+            yield f"file_info.{key}", value
 
     exif = full_result.get("exif") or {}
     for tool_name, data in exif.items():
         if isinstance(data, dict):
             for key, value in data.items():
                 if isinstance(value, str):
-                    scan_text(value, f"exif.{tool_name}.{key}")
-
-    strings_res = full_result.get("strings") or {}
-    for key in ("ascii", "utf16"):
-        section = strings_res.get(key) or {}
-        sample = section.get("sample") or []
-        for line in sample:
-            scan_text(line, f"strings.{key}")
-
-    binwalk_res = full_result.get("binwalk") or {}
-    if isinstance(binwalk_res.get("summary"), str):
-        scan_text(binwalk_res["summary"], "binwalk.summary")
-
-    zsteg_res = full_result.get("zsteg") or {}
-    if isinstance(zsteg_res.get("stdout"), str):
-        scan_text(zsteg_res["stdout"], "zsteg.stdout")
+                    yield f"exif.{tool_name}.{key}", value
 
     steghide_res = full_result.get("steghide") or {}
     for section_name in ("info", "extract"):
         section = steghide_res.get(section_name) or {}
         for key in ("stdout", "stderr"):
             if isinstance(section.get(key), str):
-                scan_text(section[key], f"steghide.{section_name}.{key}")
+                yield f"steghide.{section_name}.{key}", section[key]
 
     encodings = full_result.get("encodings") or {}
     for enc_type, entries in encodings.items():
@@ -59,16 +88,41 @@ def analyze(full_result: Dict[str, Any]) -> Dict[str, Any]:
             for entry in entries:
                 decoded = entry.get("decoded")
                 if isinstance(decoded, str):
-                    scan_text(decoded, f"encodings.{enc_type}")
+                    chain = entry.get("chain")
+                    yield f"encodings.{'>'.join(chain) if chain else enc_type}", decoded
+
+
+def analyze(
+    full_result: Dict[str, Any],
+    buffers: Iterable[Tuple[str, Any]] = (),
+    formats: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    matcher = FlagMatcher(FLAG_FORMATS if formats is None else formats)
+    found: List[Dict[str, Any]] = []
+    seen = set()
+    scanned = 0
+
+    def record(source: str, data) -> None:
+        for flag, offset in matcher.scan(data):
+            key = (flag, source, offset)
+            if key not in seen:
+                seen.add(key)
+                found.append({"flag": flag, "source": source, "offset": offset})
 
-    lsb = full_result.get("lsb") or {}
-    for section_name, section in lsb.items():
-        if isinstance(section, dict):
-            preview = section.get("preview")
-            if isinstance(preview, str):
-                scan_text(preview, f"lsb.{section_name}")
-        elif isinstance(section, str):
-            scan_text(section, f"lsb.{section_name}")
+    # Raw bytes, extracted artifacts and full decoded streams: strings samples,
+    # LSB previews and zsteg stdout are truncated views of these and are not rescanned.
+    for source, data in buffers:
+        scanned += 1
+        record(source, data)
 
-    return {"count": len(found), "flags": found}
+    for source, text in _text_fields(full_result):
+        scanned += 1
+        record(source, text.encode("utf-8", "replace"))
 
+    return {
+        "count": len(found),
+        "flags": found,
+        "unique": sorted({entry["flag"] for entry in found}),
+        "formats": matcher.formats,
+        "sources_scanned": scanned,
+    }
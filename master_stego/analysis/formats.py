@@ -0,0 +1,52 @@
+from typing import Optional
+
+from PIL import Image
+
+
+HEAD_BYTES = 64
+
+MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b".snd", "au"),
+    (b"PK\x03\x04", "zip"),
+    (b"%PDF-", "pdf"),
+    (b"\x1f\x8b", "gzip"),
+    (b"7z\xbc\xaf\x27\x1c", "7z"),
+    (b"Rar!\x1a\x07", "rar"),
+    (b"\x7fELF", "elf"),
+)
+BMP_DIB_HEADER_SIZES = (12, 40, 52, 56, 64, 108, 124)
+
+Image.init()
+# Everything Pillow can open, so the pixel analyzers run on exactly the inputs
+# they can decode.
+IMAGE_FORMATS = frozenset(name.lower() for name in Image.OPEN) | {"png", "jpeg", "gif", "bmp", "tiff", "webp"}
+
+
+def sniff(head: bytes) -> Optional[str]:
+    for magic, name in MAGIC:
+        if head.startswith(magic):
+            return name
+    if head.startswith(b"RIFF") and len(head) >= 12:
+        return {b"WAVE": "wav", b"WEBP": "webp", b"AVI ": "avi"}.get(head[8:12])
+    # "BM" alone also starts plenty of text; require a known DIB header size.
+    if head.startswith(b"BM") and len(head) >= 18 and int.from_bytes(head[14:18], "little") in BMP_DIB_HEADER_SIZES:
+        return "bmp"
+    return None
+
+
+def detect(file_path: str, head: bytes) -> Optional[str]:
+    fmt = sniff(head)
+    if fmt is not None:
+        return fmt
+    # Formats without a fixed magic (TGA, PPM variants, ...): let Pillow read the header.
+    try:
+        with Image.open(file_path) as img:
+            return (img.format or "").lower() or None
+    except Exception:
+        return None
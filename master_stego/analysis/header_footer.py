@@ -1,34 +1,55 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from master_stego.analysis import formats
+from master_stego.utils.file_buffer import FileBuffer
 
-def analyze(file_path: str) -> Dict[str, Any]:
+
+VERSION = "2"
+COST = "cheap"
+EXTENSION_FORMATS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".bmp": "bmp"}
+
+
+def analyze(file_path: str, buffer: Optional[FileBuffer] = None, detected_format: Optional[str] = None) -> Dict[str, Any]:
+    if buffer is None:
+        with FileBuffer(file_path) as own:
+            return analyze(file_path, buffer=own, detected_format=detected_format)
     result: Dict[str, Any] = {
         "file_type": None,
+        "detected_format": detected_format,
+        "extension_mismatch": None,
         "valid_header": None,
         "valid_footer": None,
         "details": {},
     }
 
     try:
-        with open(file_path, "rb") as f:
-            data = f.read()
+        data = buffer.data
     except Exception as exc:
         result["details"]["error"] = str(exc)
         return result
 
+    if detected_format is None:
+        detected_format = result["detected_format"] = formats.sniff(bytes(data[: formats.HEAD_BYTES]))
+
+    # The extension says what the file claims to be; extracted files often have
+    # none, and then the content decides which structure is checked.
     ext = os.path.splitext(file_path.lower())[1]
-    result["file_type"] = ext
+    claimed = EXTENSION_FORMATS.get(ext)
+    result["file_type"] = ext or detected_format
+    if claimed is not None and detected_format is not None:
+        result["extension_mismatch"] = claimed != detected_format
+    fmt = claimed or detected_format
 
-    if ext in [".jpg", ".jpeg"]:
-        result["valid_header"] = data.startswith(b"\xFF\xD8")
-        result["valid_footer"] = data.endswith(b"\xFF\xD9")
-    elif ext == ".png":
+    if fmt == "jpeg":
+        result["valid_header"] = data[:2] == b"\xFF\xD8"
+        result["valid_footer"] = data[-2:] == b"\xFF\xD9"
+    elif fmt == "png":
         png_sig = b"\x89PNG\r\n\x1a\n"
-        result["valid_header"] = data.startswith(png_sig)
+        result["valid_header"] = data[: len(png_sig)] == png_sig
         result["valid_footer"] = b"IEND" in data[-1024:]
-    elif ext == ".bmp":
-        result["valid_header"] = data.startswith(b"BM")
+    elif fmt == "bmp":
+        result["valid_header"] = data[:2] == b"BM"
         result["valid_footer"] = True
     else:
         result["valid_header"] = None
@@ -0,0 +1,202 @@
+import math
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from master_stego import IMAGE_MAX_PIXELS, IMAGE_MEMORY_BYTES
+from master_stego.utils.file_buffer import FileBuffer
+
+
+CHANNEL_NAMES = ("r", "g", "b", "a")
+# A band is cropped, converted and copied into numpy: about three live copies.
+BAND_COPIES = 4
+# Renders and enhancements of a banded image are strided previews of this size.
+PREVIEW_MAX_PIXELS = 16 << 20
+
+# Pillow warns above this and refuses above twice this; images between the two
+# are refused by ImageContext instead, with a reason the report can show.
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS if IMAGE_MAX_PIXELS > 0 else None
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class ImageContext:
+    def __init__(self, file_path: str, file_buffer: Optional[FileBuffer] = None):
+        self.file_path = file_path
+        self.file_buffer = file_buffer or FileBuffer(file_path)
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+
+    def _memo(self, key: str, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key not in self._cache:
+                try:
+                    self._cache[key] = (True, factory())
+                except Exception as exc:
+                    self._cache[key] = (False, exc)
+            ok, value = self._cache[key]
+        if not ok:
+            raise value
+        return value
+
+    @property
+    def raw_bytes(self):
+        return self.file_buffer.data
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        # What Pillow knows before decoding any pixels.
+        def read():
+            try:
+                with Image.open(self.file_path) as img:
+                    return {
+                        "format": img.format,
+                        "mode": img.mode,
+                        "width": img.width,
+                        "height": img.height,
+                        "has_alpha": "A" in img.mode or "transparency" in img.info,
+                    }
+            except Image.DecompressionBombError as exc:
+                raise ImageTooLarge(f"{exc} (MASTER_STEGO_IMAGE_MAX_PIXELS)") from exc
+
+        return self._memo("header", read)
+
+    def oversize(self) -> Optional[str]:
+        try:
+            header = self.header
+        except ImageTooLarge as exc:
+            return str(exc)
+        except Exception:
+            return None
+        pixels = header["width"] * header["height"]
+        if IMAGE_MAX_PIXELS > 0 and pixels > IMAGE_MAX_PIXELS:
+            return (
+                f"{header['width']}x{header['height']} is {pixels} pixels, over the "
+                f"{IMAGE_MAX_PIXELS}-pixel limit (MASTER_STEGO_IMAGE_MAX_PIXELS)"
+            )
+        return None
+
+    @property
+    def banded(self) -> bool:
+        # Full-frame arrays when the RGBA copy fits in the memory ceiling,
+        # horizontal bands otherwise.
+        header = self.header
+        return header["width"] * header["height"] * 4 > IMAGE_MEMORY_BYTES
+
+    @property
+    def band_rows(self) -> int:
+        return max(1, IMAGE_MEMORY_BYTES // BAND_COPIES // (max(1, self.header["width"]) * 4))
+
+    @property
+    def image(self) -> Image.Image:
+        # Pillow decodes most formats as one tile, so even a banded image is
+        # decoded once in full (width x height x bands bytes) and memoized for
+        # every analyzer to crop from; MASTER_STEGO_IMAGE_MEMORY_BYTES bounds
+        # the numpy arrays built from it, not this. release() drops it.
+        def decode():
+            reason = self.oversize()
+            if reason is not None:
+                raise ImageTooLarge(reason)
+            with Image.open(self.file_path) as img:
+                img.load()
+                return img
+
+        return self._memo("image", decode)
+
+    def _full_frame(self, key: str, factory: Callable[[], np.ndarray]) -> np.ndarray:
+        if self.banded:
+            raise ImageTooLarge(
+                f"{self.header['width']}x{self.header['height']} does not fit MASTER_STEGO_IMAGE_MEMORY_BYTES "
+                "as one array; use bands()"
+            )
+        return self._memo(key, factory)
+
+    @property
+    def rgba(self) -> np.ndarray:
+        return self._full_frame("rgba", lambda: _frozen(np.array(self.image.convert("RGBA"))))
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self.rgba[:, :, :3]
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._full_frame("gray", lambda: _frozen(np.array(self.image.convert("L"))))
+
+    def region(self, left: int, top: int, right: int, bottom: int, mode: str = "RGBA") -> np.ndarray:
+        if not self.banded:
+            full = self.rgba if mode == "RGBA" else self.gray
+            return full[top:bottom, left:right]
+        return np.asarray(self.image.crop((left, top, right, bottom)).convert(mode))
+
+    def bands(self, mode: str = "RGBA") -> Iterator[Tuple[int, np.ndarray]]:
+        height, width = self.header["height"], self.header["width"]
+        rows = self.band_rows if self.banded else height
+        for top in range(0, height, rows):
+            yield top, self.region(0, top, width, min(height, top + rows), mode)
+
+    def preview_stride(self, max_pixels: int = PREVIEW_MAX_PIXELS) -> int:
+        if not self.banded:
+            return 1
+        return max(1, math.ceil(math.sqrt(self.header["height"] * self.header["width"] / max_pixels)))
+
+    def preview(self, max_pixels: int = PREVIEW_MAX_PIXELS) -> Tuple[np.ndarray, int]:
+        # Every stride-th pixel of every stride-th row: exact pixel values (so
+        # bit planes still mean something), at a size that fits in memory.
+        if not self.banded:
+            return self._memo(f"preview:{max_pixels}", lambda: (self.rgba, 1))
+
+        def build():
+            stride = self.preview_stride(max_pixels)
+            rows = []
+            for top, band in self.bands():
+                # Copy, or each strided view keeps its whole band alive.
+                rows.append(band[(-top) % stride :: stride, ::stride].copy())
+            return _frozen(np.concatenate(rows)), stride
+
+        return self._memo(f"preview:{max_pixels}", build)
+
+    def channel(self, name: str) -> np.ndarray:
+        return self.rgba[:, :, CHANNEL_NAMES.index(name)]
+
+    def nbytes(self) -> int:
+        # Pixel memory held by the memoized decode, arrays and previews.
+        with self._lock:
+            values = [value for ok, value in self._cache.values() if ok]
+        held: Dict[int, int] = {}
+        for value in values:
+            for item in value if isinstance(value, tuple) else (value,):
+                if isinstance(item, np.ndarray):
+                    held[id(item)] = item.nbytes
+                elif isinstance(item, Image.Image):
+                    held[id(item)] = item.width * item.height * len(item.getbands())
+        return sum(held.values())
+
+    def release(self) -> None:
+        # Keep what the on-demand renders read (header and previews) and drop
+        # the full decode and full-frame arrays the analyzers needed.
+        with self._lock:
+            for key in list(self._cache):
+                if key != "header" and not key.startswith("preview:"):
+                    del self._cache[key]
+        self.file_buffer.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+        self.file_buffer.close()
+
+    def __enter__(self) -> "ImageContext":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _frozen(arr: np.ndarray) -> np.ndarray:
+    arr.setflags(write=False)
+    return arr
@@ -1,68 +1,66 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional, Tuple
 
-import numpy as np
-from PIL import Image
+from master_stego.analysis.bitstream import StreamPacker, bit_stream, to_printable
+from master_stego.analysis.formats import IMAGE_FORMATS
+from master_stego.analysis.image_context import CHANNEL_NAMES, ImageContext
 
 
-def analyze(file_path: str) -> Dict[str, Any]:
+VERSION = "1"
+FORMATS = IMAGE_FORMATS
+COST = "moderate"
+DECODES_PIXELS = True
+PREVIEW_CHARS = 1024
+
+
+def analyze(file_path: str, ctx: Optional[ImageContext] = None, bit: int = 0) -> Dict[str, Any]:
+    if ctx is None:
+        with ImageContext(file_path) as own:
+            return analyze(file_path, ctx=own, bit=bit)
     result: Dict[str, Any] = {"channels": {}, "combined": {}}
 
     try:
-        with Image.open(file_path) as img:
-            img = img.convert("RGBA")
-            arr = np.array(img)
+        width, height = ctx.header["width"], ctx.header["height"]
+        # The previews only need the leading rows, whatever the image size.
+        rows = min(height, -(-PREVIEW_CHARS * 8 // max(width, 1)))
+        arr = ctx.region(0, 0, width, rows)
     except Exception as exc:
         result["error"] = str(exc)
         return result
 
-    channel_names = ["r", "g", "b", "a"]
-    for idx, name in enumerate(channel_names):
-        channel = arr[:, :, idx]
-        bits = channel & 1
-        decoded = _bits_to_text(bits)
+    pixels = width * height
+    for idx, name in enumerate(CHANNEL_NAMES):
+        preview = bit_stream(arr[:, :, idx], bit, max_bytes=PREVIEW_CHARS)
         result["channels"][name] = {
-            "preview": decoded[:1024],
-            "length": len(decoded),
+            "preview": to_printable(preview),
+            "length": pixels // 8,
         }
 
-    rgb = arr[:, :, :3]
-    r_lsb = (rgb[:, :, 0] & 1).flatten()
-    g_lsb = (rgb[:, :, 1] & 1).flatten()
-    b_lsb = (rgb[:, :, 2] & 1).flatten()
-
-    interleaved_bits = []
-    max_len = max(len(r_lsb), len(g_lsb), len(b_lsb))
-    for i in range(max_len):
-        if i < len(r_lsb):
-            interleaved_bits.append(r_lsb[i])
-        if i < len(g_lsb):
-            interleaved_bits.append(g_lsb[i])
-        if i < len(b_lsb):
-            interleaved_bits.append(b_lsb[i])
-
-    interleaved_bits = np.array(interleaved_bits, dtype=np.uint8)
-    combined_text = _bits_to_text(interleaved_bits)
+    combined = bit_stream(arr[:, :, :3], bit, max_bytes=PREVIEW_CHARS)
     result["combined"] = {
-        "preview": combined_text[:1024],
-        "length": len(combined_text),
+        "preview": to_printable(combined),
+        "length": pixels * 3 // 8,
     }
 
     return result
 
 
-def _bits_to_text(bits_array) -> str:
-    flat = bits_array.flatten()
-    chars = []
-    for i in range(0, len(flat), 8):
-        byte = 0
-        chunk = flat[i : i + 8]
-        if len(chunk) < 8:
-            break
-        for bit in chunk:
-            byte = (byte << 1) | int(bit)
-        if 32 <= byte <= 126 or byte in (9, 10, 13):
-            chars.append(chr(byte))
-        else:
-            chars.append(".")
-    return "".join(chars)
+def streams(ctx: ImageContext, bit: int = 0) -> Iterator[Tuple[str, bytes]]:
+    try:
+        if not ctx.banded:
+            arr = ctx.rgba
+            for idx, name in enumerate(CHANNEL_NAMES):
+                yield f"lsb.{name}", bit_stream(arr[:, :, idx], bit)
+            yield "lsb.combined", bit_stream(arr[:, :, :3], bit)
+            return
 
+        # One pass over the bands for all five streams; together they are
+        # 7/32 of the RGBA size.
+        packers = {name: StreamPacker(bit) for name in CHANNEL_NAMES + ("combined",)}
+        for _, band in ctx.bands():
+            for idx, name in enumerate(CHANNEL_NAMES):
+                packers[name].feed(band[:, :, idx])
+            packers["combined"].feed(band[:, :, :3])
+    except Exception:
+        return
+    for name, packer in packers.items():
+        yield f"lsb.{name}", packer.getvalue()
@@ -1,17 +1,28 @@
 from typing import Dict, Any
 
+from master_stego.analysis import formats
+from master_stego.utils import tools
 from master_stego.utils.subprocess_utils import run_command
 
 
+VERSION = "2"
+OUTGUESS_FORMATS = ("jpeg", "ppm")
+OPENSTEGO_FORMATS = ("png", "bmp")
+
+
 def analyze(file_path: str, session_dir: str) -> Dict[str, Any]:
     result: Dict[str, Any] = {
         "outguess": {},
         "openstego": {},
     }
 
-    outguess_info = run_command(["outguess", "-h"])
-    if outguess_info["stderr"] == "command not found":
+    with open(file_path, "rb") as f:
+        fmt = formats.detect(file_path, f.read(formats.HEAD_BYTES))
+
+    if not tools.available("outguess"):
         result["outguess"] = {"available": False, "error": "outguess not installed"}
+    elif fmt not in OUTGUESS_FORMATS:
+        result["outguess"] = {"skipped": True, "reason": f"outguess does not read {fmt or 'unrecognized'} files"}
     else:
         extract = run_command(["outguess", "-r", file_path, "outguess_extracted"], cwd=session_dir)
         result["outguess"] = {
@@ -21,9 +32,10 @@ def analyze(file_path: str, session_dir: str) -> Dict[str, Any]:
             "stderr": extract["stderr"],
         }
 
-    openstego_info = run_command(["openstego", "-help"])
-    if openstego_info["stderr"] == "command not found":
+    if not tools.available("openstego"):
         result["openstego"] = {"available": False, "error": "openstego not installed"}
+    elif fmt not in OPENSTEGO_FORMATS:
+        result["openstego"] = {"skipped": True, "reason": f"openstego does not read {fmt or 'unrecognized'} files"}
     else:
         extract = run_command(
             ["openstego", "extract", "-sf", file_path, "-p", ""],
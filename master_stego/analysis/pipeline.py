@@ -1,5 +1,25 @@
+import functools
 import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+from master_stego import (
+    ANALYSIS_WORKERS,
+    CACHE_DIR,
+    CACHE_MAX_BYTES,
+    CARVE_MAX_BYTES,
+    DECODE_MAX_NODES,
+    FLAG_FORMATS,
+    IMAGE_MAX_PIXELS,
+    IMAGE_MEMORY_BYTES,
+    RECURSION_MAX_BYTES,
+    RECURSION_MAX_CHILDREN,
+    RECURSION_MAX_DEPTH,
+    RECURSION_TIMEOUT_SECONDS,
+    SCAN_PROFILE,
+)
 from master_stego.analysis import (
     file_info,
     exif_metadata,
@@ -13,19 +33,116 @@ from master_stego.analysis import (
     zsteg_module,
     steghide_module,
     outguess_openstego,
-    compression_detection,
+    signatures,
+    triage,
     encoding_detection,
     flag_detection,
 )
+from master_stego import metrics
+from master_stego.analysis import formats, registry
+from master_stego.analysis.image_context import ImageContext
+from master_stego.sessions import SESSION_MARKER, session_store
+from master_stego.utils import tools
+from master_stego.utils.file_buffer import FileBuffer
+from master_stego.utils.result_cache import ResultCache, cache_key, is_cacheable
+
+
+CacheSpec = Optional[Tuple[str, str, Dict[str, Any]]]
+Step = Tuple[str, Sequence[str], Callable[[], object], CacheSpec]
+
+_result_cache = ResultCache(CACHE_DIR, CACHE_MAX_BYTES) if CACHE_MAX_BYTES > 0 else None
+
+
+def cache_spec(module, **params) -> CacheSpec:
+    # A different build of an external tool may well produce different output.
+    for tool in getattr(module, "TOOLS", ()):
+        params[f"{tool}_version"] = tools.version(tool)
+    # The limits decide between full-frame, banded and skipped pixel output.
+    if getattr(module, "DECODES_PIXELS", False):
+        params.update(image_max_pixels=IMAGE_MAX_PIXELS, image_memory_bytes=IMAGE_MEMORY_BYTES)
+    return module.__name__.rsplit(".", 1)[-1], module.VERSION, params
+
+
+def step(name: str, func: Callable[[], object], spec: CacheSpec) -> Step:
+    return name, registry.ANALYZERS[name].deps, func, spec
+
+
+class RecursionBudget:
+    # Shared by every analysis in one tree: the upload and everything extracted
+    # from it, however deep.
+    def __init__(
+        self,
+        max_depth: int = RECURSION_MAX_DEPTH,
+        max_bytes: int = RECURSION_MAX_BYTES,
+        max_children: int = RECURSION_MAX_CHILDREN,
+        timeout: float = RECURSION_TIMEOUT_SECONDS,
+    ):
+        self.max_depth = max_depth
+        self.remaining_bytes = max_bytes
+        self.remaining_children = max_children
+        self.deadline = time.monotonic() + timeout
+        self.seen: Dict[str, str] = {}
+
+    def refuse(self, depth: int, size: int) -> Optional[str]:
+        if depth > self.max_depth:
+            return "depth"
+        if self.remaining_children <= 0:
+            return "children"
+        if size > self.remaining_bytes:
+            return "bytes"
+        if time.monotonic() > self.deadline:
+            return "time"
+        return None
+
+
+def _track_uploads(func):
+    # Children re-enter run_full_analysis with depth > 0; only the upload itself
+    # counts as an analysis in flight.
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if kwargs.get("depth"):
+            return func(*args, **kwargs)
+        with metrics.track_analysis():
+            return func(*args, **kwargs)
+
+    return wrapper
+
 
+def _keeps_session_alive(func):
+    @functools.wraps(func)
+    def wrapper(file_path, session_id, *args, **kwargs):
+        with session_store.keep_alive(session_id):
+            return func(file_path, session_id, *args, **kwargs)
+
+    return wrapper
+
+
+@_track_uploads
+@_keeps_session_alive
+def run_full_analysis(
+    file_path,
+    session_id,
+    session_dir,
+    steghide_passphrase: str = "",
+    on_result: Optional[Callable[[str, Any], None]] = None,
+    ctx: Optional[ImageContext] = None,
+    recursion: Optional[RecursionBudget] = None,
+    depth: int = 0,
+    flag_formats: Sequence[str] = (),
+    steghide_wordlist: Optional[str] = None,
+    profile: str = SCAN_PROFILE,
+):
+    if profile not in registry.PROFILES:
+        raise ValueError(f"unknown scan profile {profile!r}; expected one of {', '.join(registry.PROFILES)}")
 
-def run_full_analysis(file_path, session_id, session_dir, steghide_passphrase: str = ""):
     result = {
         "session_id": session_id,
         "file_info": {},
         "exif": {},
         "strings": {},
         "header_footer": {},
+        "signatures": {},
+        "triage": {},
         "binwalk": {},
         "color_channels": {},
         "enhancements": {},
@@ -39,40 +156,190 @@ def run_full_analysis(file_path, session_id, session_dir, steghide_passphrase: s
     }
 
     def safe_run(name, func):
-        try:
-            return func()
-        except Exception as exc:
-            return {"error": str(exc), "module": name}
-
-    result["file_info"] = safe_run("file_info", lambda: file_info.analyze(file_path))
-    result["exif"] = safe_run("exif", lambda: exif_metadata.analyze(file_path))
-    result["strings"] = safe_run("strings", lambda: strings_analysis.analyze(file_path))
-    result["header_footer"] = safe_run("header_footer", lambda: header_footer.analyze(file_path))
-    result["binwalk"] = safe_run("binwalk", lambda: binwalk_analysis.analyze(file_path, session_dir))
-    result["color_channels"] = safe_run(
-        "color_channels", lambda: color_channels.analyze(file_path, session_id, session_dir)
-    )
-    result["enhancements"] = safe_run(
-        "enhancements", lambda: enhancements.analyze(file_path, session_id, session_dir)
-    )
-    result["bitplanes"] = safe_run("bitplanes", lambda: bitplanes.analyze(file_path, session_id, session_dir))
-    result["lsb"] = safe_run("lsb", lambda: lsb_analysis.analyze(file_path))
+        with metrics.track_analyzer(name):
+            try:
+                return func()
+            except Exception as exc:
+                metrics.ANALYZER_ERRORS.inc(module=name)
+                return {"error": str(exc), "module": name}
+
+    def publish_partial(name, value):
+        if on_result is not None:
+            try:
+                on_result(name, value)
+            except Exception:
+                pass
 
-    _, ext = os.path.splitext(file_path.lower())
-    if ext == ".png":
-        result["zsteg"] = safe_run("zsteg", lambda: zsteg_module.analyze(file_path))
-    else:
-        result["zsteg"] = {"skipped": True, "reason": "zsteg is PNG-only"}
+    owns_ctx = ctx is None
+    ctx = ctx or ImageContext(file_path)
+    buffer = ctx.file_buffer
 
-    result["steghide"] = safe_run(
-        "steghide", lambda: steghide_module.analyze(file_path, session_dir, steghide_passphrase)
+    try:
+        head = bytes(buffer.data[: formats.HEAD_BYTES])
+    except OSError:
+        head = b""
+    detected_format = formats.detect(file_path, head)
+    # Above the pixel limit only the byte-level analyzers run.
+    oversize = ctx.oversize() if detected_format in formats.IMAGE_FORMATS else None
+    if oversize is not None:
+        result["degraded"] = {"reason": oversize}
+
+    all_flag_formats = FLAG_FORMATS + tuple(flag_formats)
+    steps: List[Step] = [
+        step(
+            "file_info",
+            lambda: file_info.analyze(file_path, ctx=ctx, detected_format=detected_format),
+            cache_spec(file_info, image_max_pixels=IMAGE_MAX_PIXELS),
+        ),
+        step("exif", lambda: exif_metadata.analyze(file_path), cache_spec(exif_metadata)),
+        step("strings", lambda: strings_analysis.analyze(file_path, buffer=buffer), cache_spec(strings_analysis)),
+        step(
+            "header_footer",
+            lambda: header_footer.analyze(file_path, buffer=buffer, detected_format=detected_format),
+            cache_spec(header_footer, extension=os.path.splitext(file_path.lower())[1]),
+        ),
+        step("signatures", lambda: signatures.analyze(file_path, buffer=buffer), cache_spec(signatures)),
+        step(
+            "triage",
+            lambda: triage.analyze(file_path, ctx=ctx, buffer=buffer, detected_format=detected_format),
+            cache_spec(triage, image_max_pixels=IMAGE_MAX_PIXELS),
+        ),
+        step(
+            "binwalk",
+            lambda: binwalk_analysis.analyze(
+                file_path,
+                session_dir,
+                buffer=buffer,
+                findings=result["signatures"].get("findings"),
+                findings_truncated=result["signatures"].get("truncated", False),
+            ),
+            cache_spec(binwalk_analysis, max_bytes=CARVE_MAX_BYTES),
+        ),
+        step(
+            "color_channels",
+            lambda: color_channels.analyze(file_path, session_id, session_dir, ctx=ctx),
+            cache_spec(color_channels),
+        ),
+        step(
+            "enhancements",
+            lambda: enhancements.analyze(file_path, session_id, session_dir, ctx=ctx),
+            cache_spec(enhancements),
+        ),
+        step(
+            "bitplanes",
+            lambda: bitplanes.analyze(file_path, session_id, session_dir, ctx=ctx),
+            cache_spec(bitplanes),
+        ),
+        step("lsb", lambda: lsb_analysis.analyze(file_path, ctx=ctx), cache_spec(lsb_analysis)),
+        step(
+            "zsteg",
+            lambda: zsteg_module.analyze(file_path, ctx=ctx, flag_formats=all_flag_formats),
+            cache_spec(zsteg_module, flag_formats=flag_detection.parse_formats(all_flag_formats)),
+        ),
+        step(
+            "steghide",
+            lambda: steghide_module.analyze(
+                file_path,
+                session_dir,
+                steghide_passphrase,
+                wordlist=steghide_wordlist,
+                progress=lambda partial: publish_partial("steghide", partial),
+            ),
+            cache_spec(
+                steghide_module,
+                passphrase=steghide_passphrase,
+                wordlist=steghide_module.wordlist_digest(steghide_wordlist) if steghide_wordlist else None,
+            ),
+        ),
+        step(
+            "encodings",
+            lambda: encoding_detection.analyze(result["strings"]),
+            cache_spec(encoding_detection, max_nodes=DECODE_MAX_NODES),
+        ),
+    ]
+
+    # Quick scans hold the expensive analyzers back until triage has looked at
+    # the input. A passphrase or wordlist is an explicit request for steghide.
+    gated = {name for name, *_ in steps if registry.gated(name, profile)}
+    if steghide_passphrase or steghide_wordlist:
+        gated.discard("steghide")
+    steps = [(name, deps + ("triage",) if name in gated else deps, func, spec) for name, deps, func, spec in steps]
+
+    def flag_buffers():
+        yield "file", buffer.data
+        for source, rel_path in _child_artifacts(result):
+            try:
+                artifact = FileBuffer(os.path.join(session_dir, rel_path), algorithms=())
+                data = artifact.data
+            except OSError:
+                continue
+            with artifact:
+                yield f"{source}:{rel_path}", data
+        yield from lsb_analysis.streams(ctx)
+        yield from zsteg_module.streams(ctx, result["zsteg"])
+
+    steps.append(
+        (
+            "flags",
+            tuple(step[0] for step in steps),
+            lambda: flag_detection.analyze(result, flag_buffers(), formats=all_flag_formats),
+            None,
+        )
     )
-    result["encodings"] = safe_run("encodings", lambda: encoding_detection.analyze(result["strings"]))
-    result["flags"] = safe_run("flags", lambda: flag_detection.analyze(result))
+
+    try:
+        sha256 = buffer.digests()["sha256"]
+    except OSError:
+        sha256 = None
+    cache_hits: List[str] = []
+
+    def publish(name):
+        publish_partial(name, result[name])
+
+    def run_step(step):
+        name, _, func, spec = step
+        reason = registry.skip_reason(name, detected_format, oversize)
+        if reason is None and name in gated and result["triage"].get("verdict") == "clean":
+            reason = "quick scan: triage found nothing suspicious"
+        if reason is not None:
+            result[name] = {"skipped": True, "reason": reason}
+            publish(name)
+            return
+
+        if sha256 is None or spec is None or _result_cache is None:
+            result[name] = safe_run(name, func)
+            publish(name)
+            return
+
+        key = cache_key(sha256, *spec)
+        cached = _result_cache.get(key, session_id, session_dir)
+        if cached is not None:
+            result[name] = cached
+            cache_hits.append(name)
+            metrics.ANALYZER_CACHE_HITS.inc(module=name)
+            publish(name)
+            return
+
+        result[name] = safe_run(name, func)
+        publish(name)
+        if is_cacheable(result[name]):
+            _result_cache.put(key, result[name], session_id, session_dir)
+
+    try:
+        run_graph(steps, run_step, max_workers=ANALYSIS_WORKERS)
+    finally:
+        # Whoever passed the context may keep it for renders, but not the full
+        # decode: that is only needed while the analyzers run.
+        if owns_ctx:
+            ctx.close()
+        else:
+            ctx.release()
 
     extracted = []
     for root, _, files in os.walk(session_dir):
         for f in files:
+            if f == SESSION_MARKER or f == steghide_module.WORDLIST_NAME:
+                continue
             rel_path = os.path.relpath(os.path.join(root, f), session_dir)
             extracted.append(
                 {
@@ -81,5 +348,147 @@ def run_full_analysis(file_path, session_id, session_dir, steghide_passphrase: s
                 }
             )
     result["extracted_files"] = extracted
+    publish("extracted_files")
+    result["cache"] = {"sha256": sha256, "hits": sorted(cache_hits)}
+    result["profile"] = profile
+
+    recursion = recursion or RecursionBudget()
+    if sha256 is not None:
+        recursion.seen.setdefault(sha256, session_id)
+    result["children"] = _analyze_children(
+        result, session_dir, steghide_passphrase, flag_formats, recursion, depth + 1, profile
+    )
+    publish("children")
+    if _merge_child_flags(result):
+        publish("flags")
 
     return result
+
+
+def _child_artifacts(result: Dict[str, Any]) -> List[Tuple[str, str]]:
+    artifacts = [("binwalk", path) for path in (result.get("binwalk") or {}).get("extracted_paths") or []]
+    extract = (result.get("steghide") or {}).get("extract") or {}
+    if extract.get("extracted_file"):
+        artifacts.append(("steghide", extract["extracted_file"]))
+    return artifacts
+
+
+def _analyze_children(
+    result: Dict[str, Any],
+    session_dir: str,
+    steghide_passphrase: str,
+    flag_formats: Sequence[str],
+    recursion: RecursionBudget,
+    depth: int,
+    profile: str,
+) -> List[Dict[str, Any]]:
+    children: List[Dict[str, Any]] = []
+    accepted: List[Dict[str, Any]] = []
+
+    # Claim this level's hashes before descending, so an artifact shows up as
+    # close to the upload as possible and deeper copies are reported as duplicates.
+    for source, rel_path in _child_artifacts(result):
+        child: Dict[str, Any] = {"source": source, "path": rel_path, "depth": depth}
+        children.append(child)
+        try:
+            with FileBuffer(os.path.join(session_dir, rel_path), algorithms=("sha256",)) as child_buffer:
+                child["size"] = child_buffer.size
+                child["sha256"] = child_buffer.digests()["sha256"]
+        except OSError as exc:
+            child["skipped"] = str(exc)
+            continue
+
+        if child["sha256"] in recursion.seen:
+            child["skipped"] = "duplicate"
+            child["duplicate_of"] = recursion.seen[child["sha256"]]
+            continue
+        refused = recursion.refuse(depth, child["size"])
+        if refused is not None:
+            child["skipped"] = "depth limit" if refused == "depth" else f"{refused} budget exhausted"
+            continue
+
+        recursion.remaining_bytes -= child["size"]
+        recursion.remaining_children -= 1
+        # Only the id for now: a child the deadline skips gets no directory.
+        child["session_id"] = session_store.new_id()
+        recursion.seen[child["sha256"]] = child["session_id"]
+        accepted.append(child)
+
+    for child in accepted:
+        if time.monotonic() > recursion.deadline:
+            child["skipped"] = "time budget exhausted"
+            child.pop("session_id")
+            continue
+        _, child_dir = session_store.create(child["session_id"])
+        source_path = os.path.join(session_dir, child["path"])
+        child_path = os.path.join(child_dir, "input" + os.path.splitext(child["path"])[1].lower())
+        try:
+            os.link(source_path, child_path)
+        except OSError:
+            shutil.copyfile(source_path, child_path)
+        child["result"] = run_full_analysis(
+            child_path,
+            child["session_id"],
+            child_dir,
+            steghide_passphrase,
+            recursion=recursion,
+            depth=depth,
+            flag_formats=flag_formats,
+            profile=profile,
+        )
+    return children
+
+
+def _merge_child_flags(result: Dict[str, Any]) -> bool:
+    flags = result.get("flags")
+    if not isinstance(flags, dict) or not isinstance(flags.get("flags"), list):
+        return False
+    merged = False
+    for child in result.get("children") or []:
+        child_flags = ((child.get("result") or {}).get("flags") or {}).get("flags") or []
+        for entry in child_flags:
+            flags["flags"].append(
+                {
+                    "flag": entry.get("flag"),
+                    "source": f"{child['path']} > {entry.get('source')}",
+                    "offset": entry.get("offset"),
+                }
+            )
+            merged = True
+    flags["count"] = len(flags["flags"])
+    flags["unique"] = sorted({entry["flag"] for entry in flags["flags"] if entry.get("flag")})
+    return merged
+
+
+def run_graph(steps: Sequence[Step], run_step: Callable[[Step], None], max_workers: int) -> None:
+    known = {step[0] for step in steps}
+    pending: Dict[str, Step] = {}
+    for step in steps:
+        name, deps = step[0], step[1]
+        missing = [dep for dep in deps if dep not in known]
+        if missing:
+            raise ValueError(f"step {name!r} depends on unknown steps: {', '.join(missing)}")
+        pending[name] = step
+
+    done = set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="analysis") as pool:
+
+        def submit_ready():
+            for step in list(pending.values()):
+                name, deps = step[0], step[1]
+                if all(dep in done for dep in deps):
+                    del pending[name]
+                    running[pool.submit(run_step, step)] = name
+
+        submit_ready()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done.add(running.pop(future))
+                future.result()
+            submit_ready()
+
+    if pending:
+        raise ValueError(f"dependency cycle between steps: {', '.join(sorted(pending))}")
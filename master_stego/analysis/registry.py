@@ -0,0 +1,118 @@
+from types import ModuleType
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from master_stego.analysis import (
+    file_info,
+    exif_metadata,
+    strings_analysis,
+    header_footer,
+    binwalk_analysis,
+    color_channels,
+    enhancements,
+    bitplanes,
+    lsb_analysis,
+    zsteg_module,
+    steghide_module,
+    signatures,
+    triage,
+    encoding_detection,
+    flag_detection,
+)
+from master_stego.utils import tools
+
+
+COST_CLASSES = ("cheap", "moderate", "expensive")
+PROFILES = ("full", "quick")
+# The quick profile runs analyzers of these cost classes only when triage does
+# not call the input clean.
+QUICK_GATED_COSTS = ("expensive",)
+
+
+class Analyzer(NamedTuple):
+    name: str
+    module: ModuleType
+    formats: Optional[FrozenSet[str]]
+    tools: Tuple[str, ...]
+    cost: str
+    deps: Tuple[str, ...]
+    decodes_pixels: bool
+
+
+def _declare(name: str, module: ModuleType) -> Analyzer:
+    # Each module states what it needs next to its VERSION: FORMATS (detected
+    # format names; absent means any input), TOOLS, COST, DEPENDS and
+    # DECODES_PIXELS.
+    declared_formats = getattr(module, "FORMATS", None)
+    cost = module.COST
+    if cost not in COST_CLASSES:
+        raise ValueError(f"analyzer {name!r} declares unknown cost class {cost!r}")
+    return Analyzer(
+        name=name,
+        module=module,
+        formats=frozenset(declared_formats) if declared_formats is not None else None,
+        tools=tuple(getattr(module, "TOOLS", ())),
+        cost=cost,
+        deps=tuple(getattr(module, "DEPENDS", ())),
+        decodes_pixels=getattr(module, "DECODES_PIXELS", False),
+    )
+
+
+ANALYZERS: Dict[str, Analyzer] = {
+    analyzer.name: analyzer
+    for analyzer in (
+        _declare("file_info", file_info),
+        _declare("exif", exif_metadata),
+        _declare("strings", strings_analysis),
+        _declare("header_footer", header_footer),
+        _declare("signatures", signatures),
+        _declare("triage", triage),
+        _declare("binwalk", binwalk_analysis),
+        _declare("color_channels", color_channels),
+        _declare("enhancements", enhancements),
+        _declare("bitplanes", bitplanes),
+        _declare("lsb", lsb_analysis),
+        _declare("zsteg", zsteg_module),
+        _declare("steghide", steghide_module),
+        _declare("encodings", encoding_detection),
+        _declare("flags", flag_detection),
+    )
+}
+
+
+def skip_reason(name: str, fmt: Optional[str], oversize: Optional[str] = None) -> Optional[str]:
+    analyzer = ANALYZERS[name]
+    if analyzer.formats is not None and fmt not in analyzer.formats:
+        return f"does not apply to {fmt or 'unrecognized'} input"
+    if analyzer.decodes_pixels and oversize is not None:
+        return oversize
+    missing = tools.missing(analyzer.tools)
+    if missing:
+        return f"{', '.join(missing)} not installed on server"
+    return None
+
+
+def gated(name: str, profile: str) -> bool:
+    return profile == "quick" and ANALYZERS[name].cost in QUICK_GATED_COSTS
+
+
+def tool_versions(name: str) -> Dict[str, Optional[str]]:
+    return {tool: tools.version(tool) for tool in ANALYZERS[name].tools}
+
+
+def describe() -> Dict[str, Any]:
+    analyzers: List[Dict[str, Any]] = []
+    for analyzer in ANALYZERS.values():
+        analyzers.append(
+            {
+                "name": analyzer.name,
+                "version": analyzer.module.VERSION,
+                "formats": sorted(analyzer.formats) if analyzer.formats is not None else None,
+                "tools": list(analyzer.tools),
+                "cost": analyzer.cost,
+                "deps": list(analyzer.deps),
+                "decodes_pixels": analyzer.decodes_pixels,
+                "quick_gated": gated(analyzer.name, "quick"),
+                "missing_tools": tools.missing(analyzer.tools),
+            }
+        )
+    return {"analyzers": analyzers, "profiles": list(PROFILES), "tools": tools.probe()}
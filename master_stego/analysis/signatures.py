@@ -0,0 +1,866 @@
+import re
+import struct
+import zlib
+from typing import Any, Callable, Collection, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from master_stego.utils.file_buffer import FileBuffer
+
+
+VERSION = "1"
+COST = "moderate"
+
+MAX_FINDINGS = 1000
+MAX_CANDIDATES = 200_000
+ZLIB_PROBE_BYTES = 4096
+CHUNK_BYTES = 8 << 20
+
+Details = Optional[Dict[str, Any]]
+Validator = Callable[[Any, int], Details]
+
+
+def _u16(data, pos: int, order: str = "<") -> int:
+    return struct.unpack_from(order + "H", data, pos)[0]
+
+
+def _u32(data, pos: int, order: str = "<") -> int:
+    return struct.unpack_from(order + "I", data, pos)[0]
+
+
+def _text(data, start: int, end: int) -> str:
+    return bytes(data[start:end]).split(b"\x00", 1)[0].decode("latin-1").strip()
+
+
+ZIP_METHODS = {0, 1, 6, 8, 9, 12, 14, 19, 93, 95, 96, 97, 98, 99}
+
+
+def _zip_local(data, pos: int) -> Details:
+    version, flags, method = struct.unpack_from("<HHH", data, pos + 4)
+    compressed, size, name_len = struct.unpack_from("<IIH", data, pos + 18)
+    if version & 0xFF > 63 or method not in ZIP_METHODS or not 0 < name_len <= 1024:
+        return None
+    name = bytes(data[pos + 30 : pos + 30 + name_len])
+    if len(name) != name_len:
+        return None
+    return {
+        "name": name.decode("utf-8", "replace"),
+        "method": method,
+        "compressed_size": compressed,
+        "size": size,
+        "encrypted": bool(flags & 1),
+    }
+
+
+def _zip_central(data, pos: int) -> Details:
+    method = _u16(data, pos + 10)
+    name_len = _u16(data, pos + 28)
+    if method not in ZIP_METHODS or not 0 < name_len <= 1024:
+        return None
+    return {"name": bytes(data[pos + 46 : pos + 46 + name_len]).decode("utf-8", "replace")}
+
+
+def _zip_end(data, pos: int) -> Details:
+    disk_entries, total_entries, _, _, comment_len = struct.unpack_from("<HHIIH", data, pos + 8)
+    if disk_entries > total_entries or pos + 22 + comment_len > len(data):
+        return None
+    return {"entries": total_entries, "comment_length": comment_len}
+
+
+def _gzip(data, pos: int) -> Details:
+    flags, mtime, extra_flags, os_id = struct.unpack_from("<BIBB", data, pos + 3)
+    if flags & 0xE0 or extra_flags not in (0, 2, 4) or (os_id > 13 and os_id != 255):
+        return None
+    details: Dict[str, Any] = {"mtime": mtime}
+    cursor = pos + 10
+    if flags & 0x04:
+        cursor += 2 + _u16(data, cursor)
+    if flags & 0x08:
+        end = data.find(b"\x00", cursor, cursor + 256)
+        if end == -1:
+            return None
+        details["name"] = bytes(data[cursor:end]).decode("latin-1")
+    return details
+
+
+ZLIB_LEVELS = {0x01: "fastest", 0x5E: "fast", 0x9C: "default", 0xDA: "best"}
+
+
+def _zlib(data, pos: int) -> Details:
+    try:
+        zlib.decompressobj().decompress(bytes(data[pos : pos + ZLIB_PROBE_BYTES]), 256)
+    except zlib.error:
+        return None
+    return {"level": ZLIB_LEVELS.get(data[pos + 1])}
+
+
+def _bzip2(data, pos: int) -> Details:
+    level = data[pos + 3]
+    if not 0x31 <= level <= 0x39 or bytes(data[pos + 4 : pos + 10]) not in (b"1AY&SY", b"\x17rE8P\x90"):
+        return None
+    return {"block_size": (level - 0x30) * 100_000}
+
+
+def _lzma(data, pos: int) -> Details:
+    dict_size = _u32(data, pos + 1)
+    unpacked = struct.unpack_from("<Q", data, pos + 5)[0]
+    if dict_size < 1 << 12 or dict_size > 1 << 30 or dict_size & (dict_size - 1):
+        return None
+    if unpacked != 0xFFFFFFFFFFFFFFFF and unpacked > 1 << 40:
+        return None
+    return {"dictionary_size": dict_size}
+
+
+def _compress_z(data, pos: int) -> Details:
+    # compress(1) has written 16-bit block mode streams by default for decades;
+    # accepting every header byte would match one random pair in sixteen.
+    if data[pos + 2] != 0x90:
+        return None
+    return {"max_bits": 16}
+
+
+def _tar(data, pos: int) -> Details:
+    if bytes(data[pos + 262 : pos + 265]) not in (b"\x0000", b"  \x00"):
+        return None
+    header = bytes(data[pos : pos + 512])
+    field = header[148:156].split(b"\x00", 1)[0].strip()
+    if len(header) != 512 or not field or any(c not in b"01234567" for c in field):
+        return None
+    if int(field, 8) != sum(header[:148]) + 8 * 32 + sum(header[156:]):
+        return None
+    return {"name": _text(data, pos, pos + 100)}
+
+
+def _lha(data, pos: int) -> Details:
+    if data[pos + 5] not in b"01234567ds" or data[pos + 6] != 0x2D:
+        return None
+    return {"method": bytes(data[pos + 2 : pos + 7]).decode("latin-1")}
+
+
+def _arj(data, pos: int) -> Details:
+    header_size = _u16(data, pos + 2)
+    if not 30 <= header_size <= 2600 or data[pos + 7] > 10 or data[pos + 10] > 4:
+        return None
+    return {}
+
+
+def _iso9660(data, pos: int) -> Details:
+    if data[pos + 0x8000] not in (0, 1, 2, 3, 0xFF) or data[pos + 0x8006] != 1:
+        return None
+    return {"volume": _text(data, pos + 0x8028, pos + 0x8048)}
+
+
+def _png(data, pos: int) -> Details:
+    if bytes(data[pos + 12 : pos + 16]) != b"IHDR":
+        return None
+    width, height, depth, color = struct.unpack_from(">IIBB", data, pos + 16)
+    if not 0 < width < 1 << 31 or not 0 < height < 1 << 31:
+        return None
+    if depth not in (1, 2, 4, 8, 16) or color not in (0, 2, 3, 4, 6):
+        return None
+    return {"width": width, "height": height, "bit_depth": depth}
+
+
+def _jpeg(data, pos: int) -> Details:
+    marker = data[pos + 3]
+    if marker < 0xC0 or marker == 0xFF or _u16(data, pos + 4, ">") < 2:
+        return None
+    return {"marker": f"0x{marker:02x}"}
+
+
+def _gif(data, pos: int) -> Details:
+    width, height = struct.unpack_from("<HH", data, pos + 6)
+    if not width or not height:
+        return None
+    return {"width": width, "height": height}
+
+
+def _bmp(data, pos: int) -> Details:
+    size, reserved, pixel_offset, dib_size = struct.unpack_from("<IIII", data, pos + 2)
+    if reserved or dib_size not in (12, 40, 52, 56, 64, 108, 124):
+        return None
+    if dib_size == 12:
+        width, height, planes, bits = struct.unpack_from("<HHHH", data, pos + 18)
+    else:
+        width, height, planes, bits = struct.unpack_from("<iiHH", data, pos + 18)
+    if planes != 1 or bits not in (1, 2, 4, 8, 16, 24, 32) or not width or not height:
+        return None
+    if not 14 + dib_size <= pixel_offset <= size:
+        return None
+    return {"width": abs(width), "height": abs(height), "bits": bits, "size": size}
+
+
+def _tiff(order: str, big: bool = False) -> Validator:
+    def validate(data, pos: int) -> Details:
+        if big:
+            if _u16(data, pos + 4, order) != 8:
+                return None
+            ifd = struct.unpack_from(order + "Q", data, pos + 8)[0]
+            return {"ifd_offset": ifd} if ifd >= 16 else None
+        ifd = _u32(data, pos + 4, order)
+        if ifd < 8 or pos + ifd + 2 > len(data) or not 0 < _u16(data, pos + ifd, order) <= 1000:
+            return None
+        return {"ifd_offset": ifd}
+
+    return validate
+
+
+def _ico(data, pos: int) -> Details:
+    count = _u16(data, pos + 4)
+    if not 0 < count <= 64:
+        return None
+    width, height, _, reserved, planes, bits, size, offset = struct.unpack_from("<BBBBHHII", data, pos + 6)
+    if reserved or planes > 1 or bits not in (0, 1, 4, 8, 16, 24, 32):
+        return None
+    if not size or offset < 6 + 16 * count:
+        return None
+    return {"images": count, "width": width or 256, "height": height or 256}
+
+
+def _cur(data, pos: int) -> Details:
+    count = _u16(data, pos + 4)
+    if not 0 < count <= 64 or data[pos + 9]:
+        return None
+    size, offset = struct.unpack_from("<II", data, pos + 14)
+    if not size or offset < 6 + 16 * count:
+        return None
+    return {"images": count}
+
+
+def _psd(data, pos: int) -> Details:
+    version = _u16(data, pos + 4, ">")
+    if version not in (1, 2) or any(data[pos + 6 : pos + 12]) or not 0 < _u16(data, pos + 12, ">") <= 56:
+        return None
+    return {"version": version}
+
+
+def _printable_tag(raw: bytes) -> bool:
+    return len(raw) == 4 and all(0x20 <= c < 0x7F for c in raw)
+
+
+def _riff(data, pos: int) -> Details:
+    form = bytes(data[pos + 8 : pos + 12])
+    if not _printable_tag(form):
+        return None
+    return {"format": form.decode("ascii").strip(), "size": _u32(data, pos + 4) + 8}
+
+
+def _iff(data, pos: int) -> Details:
+    form = bytes(data[pos + 8 : pos + 12])
+    if not _printable_tag(form):
+        return None
+    return {"format": form.decode("ascii").strip(), "size": _u32(data, pos + 4, ">") + 8}
+
+
+def _isobmff(data, pos: int) -> Details:
+    box_size = _u32(data, pos, ">")
+    brand = bytes(data[pos + 8 : pos + 12])
+    if not 8 <= box_size <= 512 or box_size % 4 or not _printable_tag(brand):
+        return None
+    return {"brand": brand.decode("ascii").strip()}
+
+
+def _ogg(data, pos: int) -> Details:
+    if data[pos + 4] != 0 or data[pos + 5] > 7:
+        return None
+    return {}
+
+
+def _flac(data, pos: int) -> Details:
+    if data[pos + 4] & 0x7F != 0 or bytes(data[pos + 5 : pos + 8]) != b"\x00\x00\x22":
+        return None
+    return {}
+
+
+def _id3(data, pos: int) -> Details:
+    major, revision, flags = data[pos + 3], data[pos + 4], data[pos + 5]
+    size_bytes = bytes(data[pos + 6 : pos + 10])
+    if major not in (2, 3, 4) or revision == 0xFF or flags & 0x0F or any(b & 0x80 for b in size_bytes):
+        return None
+    size = 0
+    for b in size_bytes:
+        size = (size << 7) | b
+    return {"version": f"2.{major}", "size": size + 10}
+
+
+def _swf(data, pos: int) -> Details:
+    version = data[pos + 3]
+    length = _u32(data, pos + 4)
+    if not 1 <= version <= 50 or length < 8:
+        return None
+    return {"version": version, "size": length}
+
+
+PDF_VERSION = re.compile(rb"\d\.\d")
+
+
+def _pdf(data, pos: int) -> Details:
+    version = bytes(data[pos + 5 : pos + 8])
+    if not PDF_VERSION.fullmatch(version):
+        return None
+    return {"version": version.decode("ascii")}
+
+
+ELF_TYPES = {0: "none", 1: "relocatable", 2: "executable", 3: "shared", 4: "core"}
+
+
+def _elf(data, pos: int) -> Details:
+    elf_class, endian, version = data[pos + 4], data[pos + 5], data[pos + 6]
+    if elf_class not in (1, 2) or endian not in (1, 2) or version != 1:
+        return None
+    order = "<" if endian == 1 else ">"
+    elf_type = _u16(data, pos + 16, order)
+    if elf_type not in ELF_TYPES:
+        return None
+    return {
+        "bits": 32 * elf_class,
+        "endian": "little" if endian == 1 else "big",
+        "object": ELF_TYPES[elf_type],
+        "machine": _u16(data, pos + 18, order),
+    }
+
+
+def _pe(data, pos: int) -> Details:
+    header = _u32(data, pos + 0x3C)
+    if not 0x40 <= header <= 0x1000:
+        return None
+    if bytes(data[pos + header : pos + header + 4]) == b"PE\x00\x00":
+        return {"format": "PE", "machine": f"0x{_u16(data, pos + header + 4):04x}"}
+    if bytes(data[pos + header : pos + header + 2]) in (b"NE", b"LE", b"LX"):
+        return {"format": bytes(data[pos + header : pos + header + 2]).decode("ascii")}
+    return None
+
+
+def _cafebabe(data, pos: int) -> Details:
+    value = _u32(data, pos + 4, ">")
+    if 0 < value < 40:
+        return {"format": "mach-o fat binary", "architectures": value}
+    major = value & 0xFFFF
+    if 45 <= major <= 80:
+        return {"format": "java class", "major_version": major}
+    return None
+
+
+def _sqlite(data, pos: int) -> Details:
+    page_size = _u16(data, pos + 16, ">")
+    if page_size != 1 and (page_size < 512 or page_size & (page_size - 1)):
+        return None
+    if data[pos + 18] not in (1, 2) or data[pos + 19] not in (1, 2):
+        return None
+    return {"page_size": 65536 if page_size == 1 else page_size}
+
+
+def _pcap(order: str) -> Validator:
+    def validate(data, pos: int) -> Details:
+        major, minor = _u16(data, pos + 4, order), _u16(data, pos + 6, order)
+        if major != 2 or minor > 4:
+            return None
+        return {"version": f"{major}.{minor}", "link_type": _u32(data, pos + 20, order)}
+
+    return validate
+
+
+def _pcapng(data, pos: int) -> Details:
+    if bytes(data[pos + 8 : pos + 12]) not in (b"\x4d\x3c\x2b\x1a", b"\x1a\x2b\x3c\x4d"):
+        return None
+    return {}
+
+
+def _git_pack(data, pos: int) -> Details:
+    version = _u32(data, pos + 4, ">")
+    if version not in (2, 3):
+        return None
+    return {"version": version, "objects": _u32(data, pos + 8, ">")}
+
+
+def _mbr(data, pos: int) -> Details:
+    partitions = 0
+    for entry in range(4):
+        base = pos + 446 + 16 * entry
+        if data[base] not in (0x00, 0x80):
+            return None
+        if data[base + 4]:
+            partitions += 1
+    if not partitions:
+        return None
+    return {"partitions": partitions}
+
+
+def _ext(data, pos: int) -> Details:
+    log_block = _u32(data, pos + 0x418)
+    state = _u16(data, pos + 0x43A)
+    if log_block > 6 or state not in (1, 2, 3, 4):
+        return None
+    return {"block_size": 1024 << log_block, "volume": _text(data, pos + 0x478, pos + 0x488)}
+
+
+def _fat(data, pos: int) -> Details:
+    bytes_per_sector = _u16(data, pos + 11)
+    if bytes_per_sector not in (512, 1024, 2048, 4096) or bytes(data[pos + 510 : pos + 512]) != b"\x55\xaa":
+        return None
+    return {"bytes_per_sector": bytes_per_sector}
+
+
+def _ntfs(data, pos: int) -> Details:
+    if _u16(data, pos + 11) not in (512, 1024, 2048, 4096):
+        return None
+    return {}
+
+
+def _ttf(data, pos: int) -> Details:
+    tables, search_range = _u16(data, pos + 4, ">"), _u16(data, pos + 6, ">")
+    if not 4 <= tables <= 64 or search_range != 16 * (1 << (tables.bit_length() - 1)):
+        return None
+    return {"tables": tables}
+
+
+def _der(data, pos: int) -> Details:
+    length = _u16(data, pos + 2, ">")
+    if bytes(data[pos + 4 : pos + 6]) != b"\x30\x82" or not 4 < _u16(data, pos + 6, ">") < length:
+        return None
+    return {"size": length + 4}
+
+
+def _pem(data, pos: int) -> Details:
+    end = data.find(b"-----", pos + 11, pos + 80)
+    if end == -1:
+        return None
+    label = bytes(data[pos + 11 : end])
+    if not label or not all(0x20 <= c < 0x7F for c in label):
+        return None
+    return {"label": label.decode("ascii")}
+
+
+def _mpeg_ps(data, pos: int) -> Details:
+    marker = data[pos + 4]
+    if marker >> 6 != 0b01 and marker >> 4 != 0b0010:
+        return None
+    return {}
+
+
+def _mpeg_video(data, pos: int) -> Details:
+    width = (data[pos + 4] << 4) | (data[pos + 5] >> 4)
+    height = ((data[pos + 5] & 0x0F) << 8) | data[pos + 6]
+    if not width or not height or not 1 <= data[pos + 7] & 0x0F <= 8:
+        return None
+    return {"width": width, "height": height}
+
+
+def _ascii_digits(offset: int, count: int) -> Validator:
+    def validate(data, pos: int) -> Details:
+        digits = bytes(data[pos + offset : pos + offset + count])
+        if len(digits) != count or not digits.isdigit():
+            return None
+        return {}
+
+    return validate
+
+
+# (type, category, description, magic, magic offset from the start of the file, validator)
+# Magics shorter than four bytes must carry a validator; everything else is also
+# checked by its validator when one is given.
+SIGNATURES: List[Tuple[str, str, str, bytes, int, Optional[Validator]]] = [
+    # Archives
+    ("zip", "archive", "Zip archive data, local file header", b"PK\x03\x04", 0, _zip_local),
+    ("zip-central", "archive", "Zip central directory entry", b"PK\x01\x02", 0, _zip_central),
+    ("zip-end", "archive", "Zip end of central directory", b"PK\x05\x06", 0, _zip_end),
+    ("zip-spanned", "archive", "Zip multi-volume archive data", b"PK\x07\x08PK\x03\x04", 0, None),
+    ("rar", "archive", "RAR archive data, v4", b"Rar!\x1a\x07\x00", 0, None),
+    ("rar5", "archive", "RAR archive data, v5", b"Rar!\x1a\x07\x01\x00", 0, None),
+    ("7z", "archive", "7-zip archive data", b"7z\xbc\xaf\x27\x1c", 0, None),
+    ("cab", "archive", "Microsoft Cabinet archive data", b"MSCF\x00\x00\x00\x00", 0, None),
+    ("installshield-cab", "archive", "InstallShield Cabinet archive data", b"ISc(", 0, None),
+    ("tar", "archive", "POSIX tar archive", b"ustar", 257, _tar),
+    ("ar", "archive", "ar archive / Debian package", b"!<arch>\n", 0, None),
+    ("cpio", "archive", "cpio archive, new ASCII", b"070701", 0, _ascii_digits(6, 2)),
+    ("cpio", "archive", "cpio archive, new ASCII with CRC", b"070702", 0, _ascii_digits(6, 2)),
+    ("cpio", "archive", "cpio archive, old ASCII", b"070707", 0, _ascii_digits(6, 2)),
+    ("lha", "archive", "LHa archive data", b"-lh", 2, _lha),
+    ("lharc", "archive", "LHarc archive data", b"-lz", 2, _lha),
+    ("arj", "archive", "ARJ archive data", b"\x60\xea", 0, _arj),
+    ("zoo", "archive", "Zoo archive data", b"ZOO ", 0, None),
+    ("ace", "archive", "ACE archive data", b"**ACE**", 7, None),
+    ("stuffit", "archive", "StuffIt archive data", b"StuffIt ", 0, None),
+    ("stuffit5", "archive", "StuffIt 5 archive data", b"SIT!\x00", 0, None),
+    ("xar", "archive", "xar archive", b"xar!\x00\x1c", 0, None),
+    ("rpm", "archive", "RPM package", b"\xed\xab\xee\xdb", 0, None),
+    ("apk-signing", "archive", "APK signing block", b"APK Sig Block 42", 0, None),
+    ("android-backup", "archive", "Android backup", b"ANDROID BACKUP\n", 0, None),
+    ("wim", "archive", "Windows imaging (WIM) image", b"MSWIM\x00\x00\x00", 0, None),
+    # Compressed streams
+    ("gzip", "compressed", "gzip compressed data", b"\x1f\x8b\x08", 0, _gzip),
+    ("zlib", "compressed", "zlib compressed data", b"\x78\x01", 0, _zlib),
+    ("zlib", "compressed", "zlib compressed data", b"\x78\x5e", 0, _zlib),
+    ("zlib", "compressed", "zlib compressed data", b"\x78\x9c", 0, _zlib),
+    ("zlib", "compressed", "zlib compressed data", b"\x78\xda", 0, _zlib),
+    ("bzip2", "compressed", "bzip2 compressed data", b"BZh", 0, _bzip2),
+    ("xz", "compressed", "XZ compressed data", b"\xfd7zXZ\x00", 0, None),
+    ("lzma", "compressed", "LZMA compressed data", b"\x5d\x00\x00", 0, _lzma),
+    ("zstd", "compressed", "Zstandard compressed data", b"\x28\xb5\x2f\xfd", 0, None),
+    ("zstd-skippable", "compressed", "Zstandard skippable frame", b"\x50\x2a\x4d\x18", 0, None),
+    ("lz4", "compressed", "LZ4 compressed data", b"\x04\x22\x4d\x18", 0, None),
+    ("lz4-legacy", "compressed", "LZ4 compressed data, legacy", b"\x02\x21\x4c\x18", 0, None),
+    ("lzip", "compressed", "lzip compressed data", b"LZIP\x01", 0, None),
+    ("lzop", "compressed", "lzop compressed data", b"\x89LZO\x00\r\n\x1a\n", 0, None),
+    ("compress", "compressed", "compress'd data (.Z)", b"\x1f\x9d", 0, _compress_z),
+    ("snappy", "compressed", "Snappy framed data", b"\xff\x06\x00\x00sNaPpY", 0, None),
+    ("brotli-framed", "compressed", "Brotli framed data", b"\xce\xb2\xcf\x81", 0, None),
+    ("squashfs", "filesystem", "Squashfs filesystem, little endian", b"hsqs", 0, None),
+    ("squashfs", "filesystem", "Squashfs filesystem, big endian", b"sqsh", 0, None),
+    # Images
+    ("png", "image", "PNG image data", b"\x89PNG\r\n\x1a\n", 0, _png),
+    ("jpeg", "image", "JPEG image data", b"\xff\xd8\xff", 0, _jpeg),
+    ("gif", "image", "GIF image data, version 87a", b"GIF87a", 0, _gif),
+    ("gif", "image", "GIF image data, version 89a", b"GIF89a", 0, _gif),
+    ("bmp", "image", "PC bitmap", b"BM", 0, _bmp),
+    ("tiff", "image", "TIFF image data, little-endian", b"II*\x00", 0, _tiff("<")),
+    ("tiff", "image", "TIFF image data, big-endian", b"MM\x00*", 0, _tiff(">")),
+    ("bigtiff", "image", "BigTIFF image data, little-endian", b"II+\x00", 0, _tiff("<", big=True)),
+    ("bigtiff", "image", "BigTIFF image data, big-endian", b"MM\x00+", 0, _tiff(">", big=True)),
+    ("ico", "image", "MS Windows icon resource", b"\x00\x00\x01\x00", 0, _ico),
+    ("cur", "image", "MS Windows cursor resource", b"\x00\x00\x02\x00", 0, _cur),
+    ("psd", "image", "Adobe Photoshop image", b"8BPS", 0, _psd),
+    ("jp2", "image", "JPEG 2000 image", b"\x00\x00\x00\x0cjP  \r\n\x87\n", 0, None),
+    ("j2k", "image", "JPEG 2000 codestream", b"\xff\x4f\xff\x51", 0, None),
+    ("jxl", "image", "JPEG XL image", b"\x00\x00\x00\x0cJXL \r\n\x87\n", 0, None),
+    ("jpeg-xr", "image", "JPEG XR image", b"II\xbc\x01", 0, None),
+    ("qoi", "image", "QOI image", b"qoif", 0, None),
+    ("openexr", "image", "OpenEXR image", b"\x76\x2f\x31\x01", 0, None),
+    ("flif", "image", "FLIF image", b"FLIF", 0, None),
+    ("xcf", "image", "GIMP XCF image", b"gimp xcf ", 0, None),
+    ("dds", "image", "DirectDraw Surface", b"DDS \x7c\x00\x00\x00", 0, None),
+    ("ktx", "image", "Khronos texture", b"\xabKTX 11\xbb\r\n\x1a\n", 0, None),
+    ("ktx2", "image", "Khronos texture 2", b"\xabKTX 20\xbb\r\n\x1a\n", 0, None),
+    ("farbfeld", "image", "farbfeld image", b"farbfeld", 0, None),
+    ("icns", "image", "Apple icon image", b"icns", 0, None),
+    ("bpg", "image", "BPG image", b"BPG\xfb", 0, None),
+    ("svg", "image", "SVG image", b"<svg", 0, None),
+    ("fits", "image", "FITS image", b"SIMPLE  =", 0, None),
+    ("dicom", "image", "DICOM medical image", b"DICM", 128, None),
+    ("cineon", "image", "Cineon image", b"\x80\x2a\x5f\xd7", 0, None),
+    ("dpx", "image", "DPX image", b"SDPX", 0, None),
+    ("dpx", "image", "DPX image", b"XPDS", 0, None),
+    ("wmf", "image", "Windows metafile", b"\xd7\xcd\xc6\x9a", 0, None),
+    ("emf", "image", "Windows enhanced metafile", b" EMF", 40, None),
+    ("icc", "image", "ICC color profile", b"acsp", 36, None),
+    ("xmp", "image", "XMP metadata packet", b"<x:xmpmeta", 0, None),
+    ("xmp", "image", "XMP packet header", b"<?xpacket begin=", 0, None),
+    # Audio / video
+    ("riff", "media", "RIFF container (WAV, AVI, WebP, ...)", b"RIFF", 0, _riff),
+    ("rifx", "media", "RIFF container, big-endian", b"RIFX", 0, _iff),
+    ("iff", "media", "IFF container (AIFF, ILBM, 8SVX, ...)", b"FORM", 0, _iff),
+    ("isobmff", "media", "ISO base media file (MP4, MOV, HEIF, AVIF, ...)", b"ftyp", 4, _isobmff),
+    ("ogg", "media", "Ogg data", b"OggS", 0, _ogg),
+    ("flac", "media", "FLAC audio", b"fLaC", 0, _flac),
+    ("id3", "media", "Audio file with ID3v2 tag", b"ID3", 0, _id3),
+    ("midi", "media", "Standard MIDI data", b"MThd\x00\x00\x00\x06", 0, None),
+    ("matroska", "media", "Matroska / WebM data", b"\x1a\x45\xdf\xa3", 0, None),
+    ("flv", "media", "Flash video", b"FLV\x01", 0, None),
+    ("asf", "media", "Microsoft ASF (WMV/WMA)", b"\x30\x26\xb2\x75\x8e\x66\xcf\x11", 0, None),
+    ("au", "media", "Sun/NeXT audio data", b".snd\x00\x00\x00", 0, None),
+    ("mpeg-ps", "media", "MPEG program stream", b"\x00\x00\x01\xba", 0, _mpeg_ps),
+    ("mpeg-video", "media", "MPEG video sequence", b"\x00\x00\x01\xb3", 0, _mpeg_video),
+    ("amr", "media", "AMR audio", b"#!AMR", 0, None),
+    ("caf", "media", "Core Audio file", b"caff\x00\x01", 0, None),
+    ("ape", "media", "Monkey's Audio", b"MAC \x96\x0f", 0, None),
+    ("wavpack", "media", "WavPack audio", b"wvpk", 0, None),
+    ("musepack", "media", "Musepack audio", b"MPCK", 0, None),
+    ("realmedia", "media", "RealMedia file", b".RMF\x00\x00\x00", 0, None),
+    ("voc", "media", "Creative Voice file", b"Creative Voice File\x1a", 0, None),
+    ("swf", "media", "Macromedia Flash, uncompressed", b"FWS", 0, _swf),
+    ("swf", "media", "Macromedia Flash, zlib compressed", b"CWS", 0, _swf),
+    ("swf", "media", "Macromedia Flash, LZMA compressed", b"ZWS", 0, _swf),
+    ("mod", "media", "ProTracker module", b"M.K.", 1080, None),
+    ("xm", "media", "FastTracker II module", b"Extended Module: ", 0, None),
+    ("s3m", "media", "ScreamTracker 3 module", b"SCRM", 44, None),
+    ("it", "media", "Impulse Tracker module", b"IMPM", 0, None),
+    # Documents
+    ("pdf", "document", "PDF document", b"%PDF-", 0, _pdf),
+    ("pdf-eof", "document", "PDF end-of-file marker", b"%%EOF", 0, None),
+    ("postscript", "document", "PostScript document", b"%!PS", 0, None),
+    ("rtf", "document", "Rich Text Format document", b"{\\rtf1", 0, None),
+    ("ole2", "document", "OLE2 compound document (DOC, XLS, MSI, ...)", b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", 0, None),
+    ("djvu", "document", "DjVu document", b"AT&TFORM", 0, None),
+    ("xml", "document", "XML document", b"<?xml ", 0, None),
+    ("html", "document", "HTML document", b"<!DOCTYPE html", 0, None),
+    ("html", "document", "HTML document", b"<!doctype html", 0, None),
+    ("html", "document", "HTML document", b"<html", 0, None),
+    ("chm", "document", "Microsoft compiled HTML help", b"ITSF\x03\x00\x00\x00", 0, None),
+    ("mobi", "document", "Mobipocket e-book", b"BOOKMOBI", 60, None),
+    ("lnk", "document", "MS Windows shortcut", b"\x4c\x00\x00\x00\x01\x14\x02\x00", 0, None),
+    ("registry", "document", "MS Windows registry hive", b"regf", 0, None),
+    ("evt", "document", "MS Windows event log", b"\x30\x00\x00\x00LfLe", 0, None),
+    ("evtx", "document", "MS Windows XML event log", b"ElfFile\x00", 0, None),
+    ("pst", "document", "Outlook personal folders", b"!BDN", 0, None),
+    ("bplist", "document", "Apple binary property list", b"bplist00", 0, None),
+    ("torrent", "document", "BitTorrent metainfo", b"d8:announce", 0, None),
+    ("ics", "document", "iCalendar data", b"BEGIN:VCALENDAR", 0, None),
+    ("vcard", "document", "vCard data", b"BEGIN:VCARD", 0, None),
+    ("mbox", "document", "Unix mailbox", b"From - ", 0, None),
+    ("wordperfect", "document", "WordPerfect document", b"\xffWPC", 0, None),
+    ("lotus", "document", "Lotus 1-2-3 spreadsheet", b"\x00\x00\x02\x00\x06\x04\x06\x00", 0, None),
+    # Executables
+    ("elf", "executable", "ELF executable", b"\x7fELF", 0, _elf),
+    ("mz", "executable", "MS-DOS / Windows executable", b"MZ", 0, _pe),
+    ("mach-o", "executable", "Mach-O executable, 32-bit big-endian", b"\xfe\xed\xfa\xce", 0, None),
+    ("mach-o", "executable", "Mach-O executable, 64-bit big-endian", b"\xfe\xed\xfa\xcf", 0, None),
+    ("mach-o", "executable", "Mach-O executable, 32-bit little-endian", b"\xce\xfa\xed\xfe", 0, None),
+    ("mach-o", "executable", "Mach-O executable, 64-bit little-endian", b"\xcf\xfa\xed\xfe", 0, None),
+    ("cafebabe", "executable", "Java class file / Mach-O fat binary", b"\xca\xfe\xba\xbe", 0, _cafebabe),
+    ("dex", "executable", "Android Dalvik executable", b"dex\n0", 0, _ascii_digits(5, 2)),
+    ("odex", "executable", "Android optimized Dalvik executable", b"dey\n0", 0, _ascii_digits(5, 2)),
+    ("wasm", "executable", "WebAssembly binary", b"\x00asm\x01\x00\x00\x00", 0, None),
+    ("lua", "executable", "Lua bytecode", b"\x1bLua", 0, None),
+    ("java-serialized", "executable", "Java serialized object", b"\xac\xed\x00\x05", 0, None),
+    ("pyz", "executable", "Python zipapp", b"#!/usr/bin/env python", 0, None),
+    ("bflt", "executable", "uClinux bFLT executable", b"bFLT", 0, None),
+    ("uimage", "executable", "U-Boot image", b"\x27\x05\x19\x56", 0, None),
+    ("dtb", "executable", "Flattened device tree", b"\xd0\x0d\xfe\xed", 0, None),
+    # Databases
+    ("sqlite", "database", "SQLite 3.x database", b"SQLite format 3\x00", 0, _sqlite),
+    ("access", "database", "Microsoft Access database", b"\x00\x01\x00\x00Standard Jet DB", 0, None),
+    ("access", "database", "Microsoft Access 2007 database", b"\x00\x01\x00\x00Standard ACE DB", 0, None),
+    ("berkeley-db", "database", "Berkeley DB (btree)", b"\x62\x31\x05\x00", 12, None),
+    ("berkeley-db", "database", "Berkeley DB (hash)", b"\x61\x15\x06\x00", 12, None),
+    ("leveldb-log", "database", "LevelDB table", b"\x57\xfb\x80\x8b\x24\x75\x47\xdb", 0, None),
+    ("realm", "database", "Realm database", b"T-DB", 16, None),
+    # Keys, certificates and encrypted containers
+    ("keepass", "crypto", "KeePass 2.x database", b"\x03\xd9\xa2\x9a\x67\xfb\x4b\xb5", 0, None),
+    ("keepass1", "crypto", "KeePass 1.x database", b"\x03\xd9\xa2\x9a\x65\xfb\x4b\xb5", 0, None),
+    ("passwordsafe", "crypto", "Password Safe v3 database", b"PWS3", 0, None),
+    ("pem", "crypto", "PEM-encoded object", b"-----BEGIN ", 0, _pem),
+    ("pgp-armor", "crypto", "PGP armored data", b"-----BEGIN PGP ", 0, None),
+    ("openssh-key", "crypto", "OpenSSH private key", b"openssh-key-v1\x00", 0, None),
+    ("ssh-pubkey", "crypto", "OpenSSH RSA public key", b"ssh-rsa AAAA", 0, None),
+    ("ssh-pubkey", "crypto", "OpenSSH Ed25519 public key", b"ssh-ed25519 AAAA", 0, None),
+    ("ssh-pubkey", "crypto", "OpenSSH ECDSA public key", b"ecdsa-sha2-nistp", 0, None),
+    ("putty-key", "crypto", "PuTTY private key", b"PuTTY-User-Key-File-", 0, None),
+    ("der", "crypto", "DER-encoded certificate or key", b"\x30\x82", 0, _der),
+    ("luks", "crypto", "LUKS encrypted volume", b"LUKS\xba\xbe", 0, None),
+    ("openssl-salted", "crypto", "OpenSSL enc'd data with salt", b"Salted__", 0, None),
+    ("age", "crypto", "age encrypted file", b"age-encryption.org/v1", 0, None),
+    ("ansible-vault", "crypto", "Ansible Vault encrypted data", b"$ANSIBLE_VAULT", 0, None),
+    ("gpg-keybox", "crypto", "GnuPG keybox", b"KBXf", 8, None),
+    ("bitlocker", "crypto", "BitLocker encrypted volume", b"-FVE-FS-", 3, None),
+    # Filesystems, disk images and captures
+    ("iso9660", "filesystem", "ISO 9660 CD-ROM filesystem", b"CD001", 0x8001, _iso9660),
+    ("ext", "filesystem", "Linux ext2/3/4 filesystem", b"\x53\xef", 0x438, _ext),
+    ("fat", "filesystem", "FAT12 filesystem", b"FAT12   ", 54, _fat),
+    ("fat", "filesystem", "FAT16 filesystem", b"FAT16   ", 54, _fat),
+    ("fat", "filesystem", "FAT32 filesystem", b"FAT32   ", 82, _fat),
+    ("ntfs", "filesystem", "NTFS filesystem", b"NTFS    ", 3, _ntfs),
+    ("exfat", "filesystem", "exFAT filesystem", b"EXFAT   ", 3, None),
+    ("mbr", "filesystem", "DOS/MBR boot sector", b"\x55\xaa", 510, _mbr),
+    ("gpt", "filesystem", "GPT partition table", b"EFI PART", 0, None),
+    ("cramfs", "filesystem", "CramFS filesystem", b"\x45\x3d\xcd\x28", 0, None),
+    ("romfs", "filesystem", "romfs filesystem", b"-rom1fs-", 0, None),
+    ("jffs2", "filesystem", "JFFS2 filesystem", b"\x85\x19\x03\x20", 0, None),
+    ("ubi", "filesystem", "UBI image", b"UBI#", 0, None),
+    ("ubifs", "filesystem", "UBIFS image", b"\x31\x18\x10\x06", 0, None),
+    ("f2fs", "filesystem", "F2FS filesystem", b"\x10\x20\xf5\xf2", 0x400, None),
+    ("btrfs", "filesystem", "Btrfs filesystem", b"_BHRfS_M", 0x10040, None),
+    ("xfs", "filesystem", "XFS filesystem", b"XFSB", 0, None),
+    ("hfs+", "filesystem", "HFS+ filesystem", b"H+\x00\x04", 0x400, None),
+    ("apfs", "filesystem", "APFS container", b"NXSB", 32, None),
+    ("qcow", "filesystem", "QEMU QCOW image", b"QFI\xfb", 0, None),
+    ("vmdk", "filesystem", "VMware disk image", b"KDMV", 0, None),
+    ("vhd", "filesystem", "Microsoft VHD image", b"conectix", 0, None),
+    ("vhdx", "filesystem", "Microsoft VHDX image", b"vhdxfile", 0, None),
+    ("vdi", "filesystem", "VirtualBox disk image", b"<<< Oracle VM VirtualBox Disk Image >>>", 0, None),
+    ("dmg", "filesystem", "Apple disk image trailer", b"koly\x00\x00\x00\x04", 0, None),
+    ("pcap", "capture", "pcap capture file, little-endian", b"\xd4\xc3\xb2\xa1", 0, _pcap("<")),
+    ("pcap", "capture", "pcap capture file, big-endian", b"\xa1\xb2\xc3\xd4", 0, _pcap(">")),
+    ("pcap", "capture", "pcap capture file, nanosecond little-endian", b"\x4d\x3c\xb2\xa1", 0, _pcap("<")),
+    ("pcapng", "capture", "pcapng capture file", b"\x0a\x0d\x0d\x0a", 0, _pcapng),
+    ("git-pack", "capture", "Git pack file", b"PACK", 0, _git_pack),
+    ("git-index", "capture", "Git index file", b"DIRC\x00\x00\x00", 0, None),
+    ("git-bundle", "capture", "Git bundle", b"# v2 git bundle\n", 0, None),
+    ("core", "capture", "Windows minidump", b"MDMP\x93\xa7", 0, None),
+    ("hprof", "capture", "Java heap dump", b"JAVA PROFILE 1.0.", 0, None),
+    # Fonts
+    ("ttf", "font", "TrueType font", b"\x00\x01\x00\x00\x00", 0, _ttf),
+    ("otf", "font", "OpenType font", b"OTTO\x00", 0, _ttf),
+    ("ttc", "font", "TrueType font collection", b"ttcf\x00", 0, None),
+    ("woff", "font", "WOFF font", b"wOFF", 0, None),
+    ("woff2", "font", "WOFF2 font", b"wOF2", 0, None),
+    # Textually encoded payloads
+    ("base64-png", "encoded", "Base64-encoded PNG", b"iVBORw0KGgo", 0, None),
+    ("base64-jpeg", "encoded", "Base64-encoded JPEG", b"/9j/4", 0, None),
+    ("base64-gif", "encoded", "Base64-encoded GIF", b"R0lGOD", 0, None),
+    ("base64-zip", "encoded", "Base64-encoded Zip", b"UEsDB", 0, None),
+    ("base64-gzip", "encoded", "Base64-encoded gzip", b"H4sI", 0, None),
+    ("base64-pdf", "encoded", "Base64-encoded PDF", b"JVBERi0", 0, None),
+    ("base64-elf", "encoded", "Base64-encoded ELF", b"f0VMR", 0, None),
+    ("base64-pe", "encoded", "Base64-encoded Windows executable", b"TVqQAAMAAAAEAAAA", 0, None),
+    ("base64-rar", "encoded", "Base64-encoded RAR", b"UmFyIRoH", 0, None),
+    ("base64-7z", "encoded", "Base64-encoded 7-zip", b"N3q8ryc", 0, None),
+    ("base64-bzip2", "encoded", "Base64-encoded bzip2", b"QlpoO", 0, None),
+    ("base64-sqlite", "encoded", "Base64-encoded SQLite", b"U1FMaXRlIGZvcm1hdCAz", 0, None),
+    ("hex-png", "encoded", "Hex-encoded PNG", b"89504e470d0a1a0a", 0, None),
+    ("hex-png", "encoded", "Hex-encoded PNG", b"89504E470D0A1A0A", 0, None),
+    ("hex-jpeg", "encoded", "Hex-encoded JPEG", b"ffd8ffe0", 0, None),
+    ("hex-jpeg", "encoded", "Hex-encoded JPEG", b"FFD8FFE0", 0, None),
+    ("hex-zip", "encoded", "Hex-encoded Zip", b"504b0304", 0, None),
+    ("hex-zip", "encoded", "Hex-encoded Zip", b"504B0304", 0, None),
+    ("hex-gzip", "encoded", "Hex-encoded gzip", b"1f8b08", 0, None),
+    ("hex-gzip", "encoded", "Hex-encoded gzip", b"1F8B08", 0, None),
+    ("hex-pdf", "encoded", "Hex-encoded PDF", b"255044462d", 0, None),
+    ("hex-elf", "encoded", "Hex-encoded ELF", b"7f454c46", 0, None),
+    ("hex-elf", "encoded", "Hex-encoded ELF", b"7F454C46", 0, None),
+    ("uuencode", "encoded", "uuencoded data", b"begin 644 ", 0, None),
+    ("uuencode", "encoded", "uuencoded data", b"begin 666 ", 0, None),
+    ("intel-hex", "encoded", "Intel HEX data", b":10000000", 0, None),
+    ("srec", "encoded", "Motorola S-record data", b"S00600004844521B", 0, None),
+]
+
+
+_TERMINAL = -1
+
+
+def _build_trie(signatures) -> Dict[int, Any]:
+    root: Dict[int, Any] = {}
+    for index, (_, _, _, magic, _, _) in enumerate(signatures):
+        node = root
+        for byte in magic:
+            node = node.setdefault(byte, {})
+        node.setdefault(_TERMINAL, []).append(index)
+    return root
+
+
+def _prefix_tables(signatures) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Every magic is at least two bytes long. The first two bytes select a row,
+    # the third and fourth bytes step through small per-row tables, so candidate
+    # filtering is a handful of vectorised lookups however many magics there are.
+    # The last row of each table is a sentinel that never matches.
+    pair_magics: Dict[int, List[bytes]] = {}
+    for _, _, _, magic, _, _ in signatures:
+        pair_magics.setdefault(magic[0] << 8 | magic[1], []).append(magic)
+
+    pair_rows = np.full(1 << 16, len(pair_magics), dtype=np.int16)
+    complete = np.zeros(len(pair_magics) + 1, dtype=bool)
+    triple_rows = np.full((len(pair_magics) + 1, 256), -1, dtype=np.int32)
+    fourths: List[np.ndarray] = []
+    for row, (pair, magics) in enumerate(sorted(pair_magics.items())):
+        pair_rows[pair] = row
+        for magic in magics:
+            if len(magic) == 2:
+                complete[row] = True
+                continue
+            if triple_rows[row, magic[2]] < 0:
+                triple_rows[row, magic[2]] = len(fourths)
+                fourths.append(np.zeros(256, dtype=bool))
+            fourth = fourths[triple_rows[row, magic[2]]]
+            if len(magic) == 3:
+                fourth[:] = True
+            else:
+                fourth[magic[3]] = True
+    fourths.append(np.zeros(256, dtype=bool))
+    triple_rows[triple_rows < 0] = len(fourths) - 1
+    return pair_rows, complete, triple_rows.ravel(), np.concatenate(fourths)
+
+
+_TRIE = _build_trie(SIGNATURES)
+_PAIR_ROWS, _COMPLETE_ROWS, _TRIPLE_ROWS, _FOURTHS = _prefix_tables(SIGNATURES)
+_PAIR_SENTINEL = len(_COMPLETE_ROWS) - 1
+
+
+def _candidates(data) -> Iterator[int]:
+    view = np.frombuffer(data, dtype=np.uint8)
+    total = len(view)
+    for start in range(0, max(total - 1, 0), CHUNK_BYTES):
+        stop = min(start + CHUNK_BYTES, total - 1)
+        count = stop - start
+        window = view[start : stop + 3]
+        if len(window) < count + 3:
+            window = np.concatenate([window, np.zeros(count + 3 - len(window), dtype=np.uint8)])
+        wide = window.astype(np.uint16)
+        rows = _PAIR_ROWS[wide[:count] << 8 | wide[1 : count + 1]]
+        hits = np.flatnonzero(rows != _PAIR_SENTINEL)
+        if not len(hits):
+            continue
+        rows = rows[hits].astype(np.intp)
+        triples = _TRIPLE_ROWS[rows << 8 | window[hits + 2]]
+        keep = _COMPLETE_ROWS[rows] | _FOURTHS[triples << 8 | window[hits + 3]]
+        for hit in (hits[keep] + start).tolist():
+            yield hit
+
+
+def _matches(data, start: int):
+    node = _TRIE
+    end = len(data)
+    pos = start
+    while pos < end:
+        node = node.get(data[pos])
+        if node is None:
+            return
+        for index in node.get(_TERMINAL, ()):
+            yield SIGNATURES[index]
+        pos += 1
+
+
+def scan(
+    data,
+    max_findings: int = MAX_FINDINGS,
+    kinds: Optional[Collection[str]] = None,
+    max_candidates: int = MAX_CANDIDATES,
+) -> Dict[str, Any]:
+    findings: List[Dict[str, Any]] = []
+    counts: Dict[str, int] = {}
+    rejected: Dict[str, int] = {}
+    truncated = False
+    candidates = 0
+
+    for hit in _candidates(data):
+        candidates += 1
+        if candidates > max_candidates:
+            truncated = True
+            break
+
+        for kind, category, description, _, anchor, validator in _matches(data, hit):
+            offset = hit - anchor
+            if offset < 0 or (kinds is not None and kind not in kinds):
+                continue
+            details: Details = {}
+            if validator is not None:
+                try:
+                    details = validator(data, offset)
+                except (struct.error, IndexError, ValueError):
+                    details = None
+            if details is None:
+                rejected[kind] = rejected.get(kind, 0) + 1
+                continue
+
+            counts[kind] = counts.get(kind, 0) + 1
+            if len(findings) < max_findings:
+                findings.append(
+                    {
+                        "type": kind,
+                        "category": category,
+                        "offset": offset,
+                        "description": description,
+                        "details": details,
+                    }
+                )
+            else:
+                truncated = True
+
+    findings.sort(key=lambda item: (item["offset"], item["type"]))
+    return {
+        "findings": findings,
+        "counts": counts,
+        "rejected": rejected,
+        "signatures": len(SIGNATURES),
+        "truncated": truncated,
+    }
+
+
+def analyze(file_path: str, buffer: Optional[FileBuffer] = None) -> Dict[str, Any]:
+    if buffer is None:
+        with FileBuffer(file_path) as own:
+            return analyze(file_path, buffer=own)
+    try:
+        data = buffer.data
+    except Exception as exc:
+        return {"error": str(exc)}
+
+    return scan(data)
@@ -1,10 +1,233 @@
+import hashlib
+import itertools
 import os
-from typing import Dict, Any
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
 
-from master_stego.utils.subprocess_utils import run_command
+from master_stego import STEGHIDE_CRACK_TIMEOUT_SECONDS, STEGHIDE_CRACK_WORKERS
+from master_stego.analysis import formats
+from master_stego.utils import tools
+from master_stego.utils.subprocess_utils import run_command, slot_pool
 
 
-def analyze(file_path: str, session_dir: str, passphrase: str = "") -> Dict[str, Any]:
+VERSION = "3"
+FORMATS = ("jpeg", "bmp", "wav", "au")
+TOOLS = ("steghide",)
+COST = "expensive"
+
+BUNDLED_WORDLIST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "wordlists", "common.txt")
+EXTRACTED_NAME = "steghide_extracted"
+# Where an uploaded wordlist is stored in the session; not listed as an extracted file.
+WORDLIST_NAME = ".wordlist"
+CANDIDATE_TIMEOUT_SECONDS = 30
+PROGRESS_INTERVAL_SECONDS = 0.5
+# Candidates handed to one shell loop; steghide itself still starts once per
+# candidate, but the slot, spill files and Python-side spawn are paid per batch.
+CANDIDATE_BATCH = 32
+# Prints "-" for every wrong candidate and "+<index>" for the one that works.
+BATCH_SCRIPT = """
+i=0
+while IFS= read -r p; do
+    if steghide extract -sf "$1" -p "$p" -xf "$3" -f -q </dev/null 2>/dev/null; then
+        echo "+$i"
+        exit 0
+    fi
+    echo -
+    i=$((i + 1))
+done < "$2"
+"""
+
+FOUND_RE = re.compile(r'Found passphrase: "(.*)"')
+
+
+def wordlist_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def supported_cover(file_path: str) -> bool:
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(formats.HEAD_BYTES)
+    except OSError:
+        return False
+    return formats.sniff(head) in FORMATS
+
+
+def _candidates(path: str, skip: str) -> Iterator[str]:
+    with open(path, "rb") as f:
+        for line in f:
+            candidate = os.fsdecode(line.rstrip(b"\r\n"))
+            if candidate and candidate != skip:
+                yield candidate
+
+
+def _count_lines(path: str) -> int:
+    count = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            count += chunk.count(b"\n")
+            last = chunk[-1:]
+    return count + (last != b"\n")
+
+
+def _crack_slots():
+    # Cracking keeps its workers busy for minutes; it gets its own machine-wide
+    # pool so the shared tool slots stay free for every other analysis.
+    return slot_pool("crack", STEGHIDE_CRACK_WORKERS)
+
+
+def _crack_stegseek(file_path: str, session_dir: str, wordlist: str, workers: int, timeout: float) -> Dict[str, Any]:
+    started = time.monotonic()
+    proc = run_command(
+        [
+            "stegseek", "--crack", "-sf", file_path, "-wl", wordlist,
+            "-xf", EXTRACTED_NAME, "-t", str(workers), "-f",
+        ],
+        cwd=session_dir,
+        timeout=timeout,
+        slots=_crack_slots(),
+    )
+    elapsed = time.monotonic() - started
+    match = FOUND_RE.search(proc["stdout"] + proc["stderr"])
+    found = match is not None and os.path.exists(os.path.join(session_dir, EXTRACTED_NAME))
+    return {
+        "engine": "stegseek",
+        "tried": None,
+        "passphrase": match.group(1) if found else None,
+        "elapsed": round(elapsed, 3),
+        "rate": None,
+        "stopped": "found" if found else ("timeout" if proc["returncode"] is None else "exhausted"),
+    }
+
+
+def _crack_steghide(
+    file_path: str,
+    session_dir: str,
+    wordlist: str,
+    skip: str,
+    total: int,
+    workers: int,
+    timeout: float,
+    progress: Optional[Callable[[Dict[str, Any]], None]],
+) -> Dict[str, Any]:
+    candidates = _candidates(wordlist, skip)
+    lock = threading.Lock()
+    stop = threading.Event()
+    started = time.monotonic()
+    deadline = started + timeout
+    state: Dict[str, Any] = {"tried": 0, "passphrase": None, "stopped": "exhausted", "reported": started}
+
+    def snapshot() -> Dict[str, Any]:
+        elapsed = time.monotonic() - started
+        return {
+            "engine": "steghide",
+            "tried": state["tried"],
+            "total": total,
+            "passphrase": state["passphrase"],
+            "elapsed": round(elapsed, 3),
+            "rate": round(state["tried"] / elapsed, 1) if elapsed > 0 else None,
+            "stopped": state["stopped"],
+        }
+
+    def worker(index: int) -> None:
+        out_name = f".steghide-crack-{index}"
+        out_path = os.path.join(session_dir, out_name)
+        list_path = out_path + ".list"
+        try:
+            while not stop.is_set():
+                with lock:
+                    batch = list(itertools.islice(candidates, CANDIDATE_BATCH))
+                if not batch:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with lock:
+                        state["stopped"] = "timeout"
+                    stop.set()
+                    return
+                with open(list_path, "wb") as f:
+                    f.write(b"".join(os.fsencode(candidate) + b"\n" for candidate in batch))
+                proc = run_command(
+                    ["sh", "-c", BATCH_SCRIPT, "sh", file_path, list_path, out_name],
+                    cwd=session_dir,
+                    timeout=min(remaining, CANDIDATE_TIMEOUT_SECONDS * len(batch)),
+                    slots=_crack_slots(),
+                )
+                marks = proc["stdout"].split()
+                hit = next((int(mark[1:]) for mark in marks if mark.startswith("+")), None)
+                report = None
+                with lock:
+                    state["tried"] += marks.count("-") + (hit is not None)
+                    if hit is not None and os.path.exists(out_path) and state["passphrase"] is None:
+                        state["passphrase"] = batch[hit]
+                        state["stopped"] = "found"
+                        os.replace(out_path, os.path.join(session_dir, EXTRACTED_NAME))
+                        stop.set()
+                    elif proc["returncode"] is None and time.monotonic() >= deadline:
+                        state["stopped"] = "timeout"
+                        stop.set()
+                    now = time.monotonic()
+                    if progress is not None and now - state["reported"] >= PROGRESS_INTERVAL_SECONDS:
+                        state["reported"] = now
+                        report = snapshot()
+                if report is not None:
+                    progress(report)
+        finally:
+            for path in (out_path, list_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    threads = [
+        threading.Thread(target=worker, args=(index,), name=f"steghide-crack-{index}", daemon=True)
+        for index in range(max(1, workers))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return snapshot()
+
+
+def crack(
+    file_path: str,
+    session_dir: str,
+    wordlist: str,
+    skip: str = "",
+    workers: int = STEGHIDE_CRACK_WORKERS,
+    timeout: float = STEGHIDE_CRACK_TIMEOUT_SECONDS,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    if not supported_cover(file_path):
+        return {"skipped": True, "reason": "steghide only embeds in JPEG, BMP, WAV and AU files"}
+
+    total = _count_lines(wordlist)
+    if tools.available("stegseek"):
+        # stegseek checks candidates in-process against the embedded header, at
+        # millions per second; spawning steghide per candidate cannot get close.
+        result = _crack_stegseek(file_path, session_dir, wordlist, workers, timeout)
+    else:
+        result = _crack_steghide(file_path, session_dir, wordlist, skip, total, workers, timeout, progress)
+    result["wordlist"] = os.path.basename(wordlist)
+    result["total"] = total
+    return result
+
+
+def analyze(
+    file_path: str,
+    session_dir: str,
+    passphrase: str = "",
+    wordlist: Optional[str] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
     result: Dict[str, Any] = {"available": True, "info": None, "extract": None}
 
     effective_pass = passphrase or ""
@@ -26,7 +249,7 @@ def analyze(file_path: str, session_dir: str, passphrase: str = "") -> Dict[str,
         "stderr": info_result["stderr"],
     }
 
-    out_name = "steghide_extracted"
+    out_name = EXTRACTED_NAME
     out_path = os.path.join(session_dir, out_name)
     extract_result = run_command(
         ["steghide", "extract", "-sf", file_path, "-p", effective_pass, "-xf", out_name],
@@ -42,4 +265,32 @@ def analyze(file_path: str, session_dir: str, passphrase: str = "") -> Dict[str,
         extract_info["extracted_file"] = out_name
     result["extract"] = extract_info
 
+    if wordlist is None:
+        return result
+    if "extracted_file" in extract_info:
+        result["crack"] = {"skipped": True, "reason": "the given passphrase already extracts data"}
+        return result
+
+    if progress is not None:
+        progress({**result, "crack": {"running": True, "tried": 0, "total": None}})
+    crack_result = crack(
+        file_path,
+        session_dir,
+        wordlist,
+        skip=effective_pass,
+        progress=None if progress is None else lambda state: progress({**result, "crack": {"running": True, **state}}),
+    )
+    result["crack"] = crack_result
+    if crack_result.get("passphrase") is not None:
+        result["extract"] = {
+            "returncode": 0,
+            "stdout": "",
+            "stderr": "",
+            "passphrase": crack_result["passphrase"],
+            "extracted_file": out_name,
+        }
+    if crack_result.get("stopped") == "timeout":
+        # A later run with more time (or less load) may get further.
+        result["partial"] = True
+
     return result
@@ -1,36 +1,136 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, Optional, Tuple
 
-from master_stego.utils.subprocess_utils import run_command
+import numpy as np
 
+from master_stego.utils.file_buffer import FileBuffer
 
-def analyze(file_path: str) -> Dict[str, Any]:
-    ascii_strings = _run_strings(file_path, ["strings", "-a"])
-    utf16_strings = _run_strings(file_path, ["strings", "-a", "-el"])
 
-    return {
-        "ascii": ascii_strings,
-        "utf16": utf16_strings,
-    }
+VERSION = "2"
+COST = "moderate"
+MIN_LENGTH = 4
+SAMPLE_LIMIT = 500
+CHUNK_BYTES = 8 << 20
 
+SECTIONS = ("ascii", "utf16", "utf16be")
+ENCODINGS = {"ascii": "ascii", "utf16": "utf-16-le", "utf16be": "utf-16-be"}
 
-def _run_strings(file_path: str, base_cmd: List[str]) -> Dict[str, Any]:
-    cmd = base_cmd + [file_path]
-    cmd_result = run_command(cmd, timeout=60)
-    output_lines: List[str] = []
+STRING_BYTES = np.zeros(256, dtype=bool)
+STRING_BYTES[0x20:0x7F] = True
+STRING_BYTES[0x09] = True
 
-    if cmd_result["stdout"]:
-        for line in cmd_result["stdout"].splitlines():
-            if line.strip():
-                output_lines.append(line.strip())
+CONTENT_BYTES = STRING_BYTES.copy()
+CONTENT_BYTES[[0x20, 0x09]] = False
 
-    stderr = cmd_result["stderr"].strip() if cmd_result["stderr"] else ""
-    available = not (stderr == "command not found" or cmd_result["returncode"] is None)
+SEPARATOR_BYTES = ~STRING_BYTES
+SEPARATOR_BYTES[0x00] = False
 
-    return {
-        "cmd": cmd,
-        "returncode": cmd_result["returncode"],
-        "stderr": stderr,
-        "available": available,
-        "count": len(output_lines),
-        "sample": output_lines[:500],
-    }
+
+def analyze(
+    file_path: str,
+    min_length: int = MIN_LENGTH,
+    sample_limit: int = SAMPLE_LIMIT,
+    buffer: Optional[FileBuffer] = None,
+) -> Dict[str, Any]:
+    if buffer is not None:
+        return extract(buffer.data, min_length=min_length, sample_limit=sample_limit)
+    with FileBuffer(file_path) as own:
+        return extract(own.data, min_length=min_length, sample_limit=sample_limit)
+
+
+def extract(data, min_length: int = MIN_LENGTH, sample_limit: int = SAMPLE_LIMIT) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for name in SECTIONS:
+        result[name] = {
+            "available": True,
+            "min_length": min_length,
+            "count": 0,
+            "sample": [],
+            "offsets": [],
+            "truncated": False,
+        }
+
+    buf = np.frombuffer(data, dtype=np.uint8) if len(data) else np.empty(0, dtype=np.uint8)
+    for start, end in _chunks(buf):
+        for name, starts, ends in _runs(buf[start:end], min_length):
+            section = result[name]
+            section["count"] += len(starts)
+            room = sample_limit - len(section["sample"])
+            if len(starts) > room:
+                section["truncated"] = True
+            for run_start, run_end in zip(starts[:max(room, 0)].tolist(), ends[:max(room, 0)].tolist()):
+                raw = bytes(data[start + run_start : start + run_end])
+                section["sample"].append(raw.decode(ENCODINGS[name]).strip())
+                section["offsets"].append(start + run_start)
+
+    return result
+
+
+def _chunks(buf: np.ndarray) -> Iterator[Tuple[int, int]]:
+    start = 0
+    total = len(buf)
+    while start < total:
+        end = start + CHUNK_BYTES
+        while end < total:
+            window = buf[end : end + CHUNK_BYTES]
+            separators = np.flatnonzero(SEPARATOR_BYTES[window])
+            if len(separators):
+                end += int(separators[0])
+                break
+            end += len(window)
+        end = min(end, total)
+        yield start, end
+        start = end
+
+
+def _runs(chunk: np.ndarray, min_length: int):
+    printable = STRING_BYTES[chunk]
+    content = CONTENT_BYTES[chunk]
+    zero = chunk == 0
+
+    starts, ends = _mask_runs(printable, content, min_length)
+    yield "ascii", starts, ends
+
+    wide = {}
+    for name, char_offset in (("utf16", 0), ("utf16be", 1)):
+        run_starts = []
+        run_ends = []
+        for align in (0, 1):
+            chars = slice(align + char_offset, None, 2)
+            pads = slice(align + 1 - char_offset, None, 2)
+            count = min(len(printable[chars]), len(zero[pads]))
+            pairs = printable[chars][:count] & zero[pads][:count]
+            s, e = _mask_runs(pairs, content[chars][:count], min_length)
+            run_starts.append(align + 2 * s)
+            run_ends.append(align + 2 * e)
+        s = np.concatenate(run_starts)
+        e = np.concatenate(run_ends)
+        order = np.argsort(s, kind="stable")
+        wide[name] = (s[order], e[order])
+
+    le_starts, le_ends = wide["utf16"]
+    be_starts, be_ends = wide["utf16be"]
+    if len(le_starts) and len(be_starts):
+        idx = np.minimum(np.searchsorted(le_starts, be_starts - 1), len(le_starts) - 1)
+        overlaps = (le_starts[idx] < be_ends) & (le_ends[idx] > be_starts)
+        le_longer = (le_ends[idx] - le_starts[idx]) >= (be_ends - be_starts)
+        drop_le = np.zeros(len(le_starts), dtype=bool)
+        drop_le[idx[overlaps & ~le_longer]] = True
+        be_keep = ~(overlaps & le_longer)
+        le_starts, le_ends = le_starts[~drop_le], le_ends[~drop_le]
+        be_starts, be_ends = be_starts[be_keep], be_ends[be_keep]
+
+    yield "utf16", le_starts, le_ends
+    yield "utf16be", be_starts, be_ends
+
+
+def _mask_runs(mask: np.ndarray, content: np.ndarray, min_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    edges = np.diff(np.concatenate(([False], mask, [False])).view(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = ends - starts >= min_length
+    starts, ends = starts[keep], ends[keep]
+    if len(starts):
+        filled = np.concatenate(([0], np.cumsum(content, dtype=np.int64)))
+        keep = filled[ends] - filled[starts] > 0
+        starts, ends = starts[keep], ends[keep]
+    return starts, ends
@@ -0,0 +1,317 @@
+import math
+import struct
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from master_stego.analysis import formats
+from master_stego.analysis.bitstream import IS_PRINTABLE, bit_stream, entropy, to_printable
+from master_stego.analysis.carver import STRUCTURE_ENDS
+from master_stego.analysis.image_context import ImageContext
+from master_stego.utils.file_buffer import FileBuffer
+
+
+VERSION = "2"
+COST = "moderate"
+# Not DECODES_PIXELS: the trailing-data check applies to any input, so the
+# pixel tests look at ctx.oversize() themselves instead of the whole module
+# being skipped.
+
+# Lossy codecs rewrite every pixel and embed (steghide, outguess) in the DCT
+# domain; palette images embed in the indices. Pixel LSB statistics cannot
+# clear either.
+LOSSY_FORMATS = ("jpeg", "mpo")
+PALETTE_MODES = ("P", "PA", "1")  # "1" has no LSB to speak of either
+
+CHUNK_PIXELS = 1 << 20
+MAX_GRID = 64
+# Per-block estimates from fewer pixels are mostly noise.
+MIN_BLOCK = 64
+MIN_EXPECTED = 5
+SPA_SETS = ("C0", "C127", "D0", "D254", "X", "Y")
+TEXT_HEAD_BYTES = 256
+MIN_TEXT_RUN = 8
+MIN_TEXT_DISTINCT = 4
+TAIL_WINDOW = 64 << 10
+
+CHI_SQUARE_P = 0.95
+BLOCK_RATE = 0.6
+BLOCK_FRACTION = 0.02
+# Both estimators must agree: either one alone drifts by several percent on
+# small or synthetic covers.
+RATE_THRESHOLD = 0.1
+MIN_AGREEING_RATE = 0.05
+MIN_TRAILING_ENTROPY = 0.5
+
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+
+def chi_square_p(hist: np.ndarray) -> np.ndarray:
+    # Westfeld-Pfitzmann: LSB replacement evens out each (2k, 2k+1) histogram
+    # pair, so a p-value near 1 means the pairs are as equal as embedding
+    # makes them. Upper tail via the Wilson-Hilferty approximation.
+    hist = hist.astype(np.float64)
+    even, odd = hist[..., 0::2], hist[..., 1::2]
+    expected = (even + odd) / 2
+    valid = expected >= MIN_EXPECTED
+    terms = np.where(valid, (even - expected) ** 2 / np.where(valid, expected, 1), 0)
+    stat = terms.sum(axis=-1)
+    dof = valid.sum(axis=-1) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.maximum(dof, 1)
+        z = (np.cbrt(stat / k) - (1 - 2 / (9 * k))) / np.sqrt(2 / (9 * k))
+        p = np.asarray(_erfc(z / math.sqrt(2)), dtype=np.float64) / 2
+    return np.where(dof > 0, p, np.nan)
+
+
+def _smaller_root(a: float, b: float, c: float) -> Optional[float]:
+    if a == 0:
+        return -c / b if b != 0 else None
+    disc = b * b - 4 * a * c
+    if disc < 0:
+        return None
+    roots = ((-b + math.sqrt(disc)) / (2 * a), (-b - math.sqrt(disc)) / (2 * a))
+    return min(roots, key=abs)
+
+
+def rs_estimate(counts: np.ndarray, groups: int) -> Optional[float]:
+    # Fridrich's RS analysis. counts[flipped, mask, (regular, singular)] over
+    # groups of 4 pixels, for the image and for the image with
+    # every LSB flipped; mask 0 is +M, mask 1 is -M.
+    if not groups:
+        return None
+    rates = counts / groups
+    d0, dm0 = rates[0, 0, 0] - rates[0, 0, 1], rates[0, 1, 0] - rates[0, 1, 1]
+    d1, dm1 = rates[1, 0, 0] - rates[1, 0, 1], rates[1, 1, 0] - rates[1, 1, 1]
+    z = _smaller_root(2 * (d1 + d0), dm0 - dm1 - d1 - 3 * d0, d0 - dm0)
+    if z is None or z == 0.5:
+        return None
+    return z / (z - 0.5)
+
+
+def spa_estimate(counts: np.ndarray) -> Optional[float]:
+    # Dumitrescu-Wu-Wang sample pair analysis, summed over all trace sets:
+    # counts of horizontally adjacent pairs in each of SPA_SETS.
+    c0, c127, d0, d254, x, y = (float(v) for v in counts)
+    if not c0:
+        return None
+    return _smaller_root((2 * c0 - c127) / 4, -(2 * d0 - d254 + 2 * (y - x)) / 2, y - x)
+
+
+class _PixelStats:
+    def __init__(self, width: int, height: int):
+        self.width, self.height = width, height
+        self.block = max(MIN_BLOCK, -(-max(width, height) // MAX_GRID))
+        self.grid = (-(-height // self.block), -(-width // self.block))
+        self.hist = np.zeros((3, 256), dtype=np.int64)
+        self.row_hist = np.zeros((self.grid[0], 256), dtype=np.int64)
+        self.block_spa = np.zeros((self.grid[0] * self.grid[1], 1 << len(SPA_SETS)), dtype=np.int64)
+        self.rs = np.zeros((3, 2, 2, 2), dtype=np.int64)
+        self.rs_groups = 0
+        self.spa = np.zeros((3, 1 << len(SPA_SETS)), dtype=np.int64)
+        self._block_cols = np.arange(width) // self.block
+
+    def feed(self, top: int, rgb: np.ndarray) -> None:
+        block_rows = (top + np.arange(rgb.shape[0])) // self.block
+        cells = (block_rows[:, None] * self.grid[1] + self._block_cols[None, :-1]).reshape(-1)
+        for c in range(3):
+            values = rgb[:, :, c]
+            self.hist[c] += np.bincount(values.reshape(-1), minlength=256)
+            wide = values.astype(np.int16)
+            self.rs[c] += self._rs(wide)
+            # One bincount per channel: each pair's SPA set memberships as bits,
+            # keyed by the block it starts in.
+            members = self._spa(wide).reshape(-1)
+            self.spa[c] += np.bincount(members, minlength=self.spa.shape[1])
+            self.block_spa += np.bincount(
+                (cells << len(SPA_SETS)) | members, minlength=self.block_spa.size
+            ).reshape(self.block_spa.shape)
+        self.rs_groups += rgb.shape[0] * (rgb.shape[1] // 4)
+
+        for block_row in np.unique(block_rows):
+            self.row_hist[block_row] += np.bincount(rgb[block_rows == block_row].reshape(-1), minlength=256)
+
+    def spa_counts(self, cells: np.ndarray) -> np.ndarray:
+        # Per-set counts from the membership bit patterns.
+        bits = (np.arange(1 << len(SPA_SETS))[:, None] >> np.arange(len(SPA_SETS))) & 1
+        return cells @ bits
+
+    @staticmethod
+    def _rs(values: np.ndarray) -> np.ndarray:
+        # Groups of four along each row with mask (0, 1, 1, 0): only the two
+        # middle pixels are flipped, so the smoothness sums are written out.
+        width = values.shape[1] - values.shape[1] % 4
+        groups = values[:, :width].reshape(values.shape[0], -1, 4)
+        counts = np.zeros((2, 2, 2), dtype=np.int64)
+        for flipped in (0, 1):
+            a, b, c, d = (groups[:, :, i] ^ flipped for i in range(4))
+            smooth = np.abs(b - a) + np.abs(c - b) + np.abs(d - c)
+            for which in (0, 1):
+                if which == 0:
+                    b2, c2 = b ^ 1, c ^ 1
+                else:
+                    b2, c2 = b - 1 + 2 * (b & 1), c - 1 + 2 * (c & 1)
+                changed = np.abs(b2 - a) + np.abs(c2 - b2) + np.abs(d - c2)
+                counts[flipped, which] = (np.count_nonzero(changed > smooth), np.count_nonzero(changed < smooth))
+        return counts
+
+    @staticmethod
+    def _spa(values: np.ndarray) -> np.ndarray:
+        u, v = values[:, :-1], values[:, 1:]
+        diff = np.abs(u - v)
+        halves = np.abs((u >> 1) - (v >> 1))
+        odd = (diff & 1).astype(bool) & (diff <= 253)
+        members = (
+            (halves == 0),
+            (halves == 127),
+            (diff == 0),
+            (diff == 254),
+            odd & (halves == (diff + 1) >> 1),
+            odd & (halves == (diff - 1) >> 1),
+        )
+        packed = np.zeros(u.shape, dtype=np.uint8)
+        for bit, member in enumerate(members):
+            packed |= member.view(np.uint8) << bit
+        return packed
+
+
+def _rounded(value: Optional[float], digits: int = 4) -> Optional[float]:
+    if value is None or not math.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def _pixel_tests(ctx: ImageContext, result: Dict[str, Any], reasons: List[str]) -> None:
+    width, height = ctx.header["width"], ctx.header["height"]
+    stats = _PixelStats(width, height)
+    chunk_rows = max(1, CHUNK_PIXELS // max(width, 1))
+    for top, band in ctx.bands():
+        for start in range(0, band.shape[0], chunk_rows):
+            stats.feed(top + start, band[start : start + chunk_rows, :, :3])
+
+    channel_p = chi_square_p(stats.hist)
+    pooled_p = float(chi_square_p(stats.hist.sum(axis=0)))
+    window_p = chi_square_p(stats.row_hist)
+    # Sequential embedders fill the image from the top: how many leading
+    # block rows have equalized pairs on their own.
+    leading = 0
+    while leading < len(window_p) and window_p[leading] >= CHI_SQUARE_P:
+        leading += 1
+    result["chi_square"] = {
+        "p_value": _rounded(pooled_p),
+        "channels": {name: _rounded(p) for name, p in zip("rgb", channel_p)},
+        "windows": [_rounded(p, 3) for p in window_p],
+        "sequential_fraction": round(min(1.0, leading * stats.block / height), 4) if leading else 0.0,
+    }
+    if pooled_p >= CHI_SQUARE_P:
+        reasons.append(f"chi-square p={pooled_p:.3f} over the whole image")
+    elif leading:
+        reasons.append(f"LSB pairs equalized over the top {result['chi_square']['sequential_fraction']:.0%} of rows")
+
+    channels = {}
+    for idx, name in enumerate("rgb"):
+        channels[name] = {
+            "rs": _rounded(rs_estimate(stats.rs[idx], stats.rs_groups)),
+            "spa": _rounded(spa_estimate(stats.spa_counts(stats.spa[idx]))),
+        }
+    rs = rs_estimate(stats.rs.sum(axis=0), stats.rs_groups * 3)
+    spa = spa_estimate(stats.spa_counts(stats.spa.sum(axis=0)))
+    known = [min(1.0, max(0.0, value)) for value in (rs, spa) if value is not None and math.isfinite(value)]
+    rate = sum(known) / len(known) if known else None
+    result["estimate"] = {"rate": _rounded(rate), "rs": _rounded(rs), "spa": _rounded(spa), "channels": channels}
+    if len(known) == 2 and rate >= RATE_THRESHOLD and min(known) >= MIN_AGREEING_RATE:
+        reasons.append(f"RS/SPA estimate {rate:.1%} of pixels carry a payload")
+
+    # A payload confined to part of the image barely moves the global
+    # estimate; per-block SPA shows where it is.
+    block_rates = [spa_estimate(counts) for counts in stats.spa_counts(stats.block_spa)]
+    grid = [
+        [_rounded(min(1.0, max(0.0, value)), 2) if value is not None else None for value in block_rates[start : start + stats.grid[1]]]
+        for start in range(0, len(block_rates), stats.grid[1])
+    ]
+    hot = sum(1 for value in block_rates if value is not None and value >= BLOCK_RATE)
+    result["heatmap"] = {"block": stats.block, "rows": stats.grid[0], "cols": stats.grid[1], "rates": grid, "hot": hot}
+    if hot >= max(2, BLOCK_FRACTION * len(block_rates)):
+        reasons.append(f"{hot} of {len(block_rates)} blocks have an SPA estimate of {BLOCK_RATE:.0%} or more")
+
+    rows = min(height, -(-TEXT_HEAD_BYTES * 8 // max(width * 3, 1)))
+    head = bit_stream(ctx.region(0, 0, width, rows)[:, :, :3], max_bytes=TEXT_HEAD_BYTES)
+    printable = IS_PRINTABLE[np.frombuffer(head, dtype=np.uint8)]
+    stops = np.flatnonzero(~printable)
+    run = int(stops[0]) if len(stops) else len(head)
+    result["lsb_text"] = {"run": run, "preview": to_printable(head[:run])[:64]}
+    if run >= MIN_TEXT_RUN and len(set(head[:run])) >= MIN_TEXT_DISTINCT:
+        reasons.append(f"RGB LSB stream starts with {run} printable characters")
+
+
+def _tail(data, fmt: Optional[str], reasons: List[str]) -> Dict[str, Any]:
+    size = len(data)
+    end = None
+    if fmt in STRUCTURE_ENDS:
+        try:
+            end = STRUCTURE_ENDS[fmt](data, 0)
+        except (struct.error, IndexError):
+            end = None
+    if end is not None and not 0 < end <= size:
+        end = None
+
+    if end is not None and end < size:
+        window = bytes(data[end : end + TAIL_WINDOW])
+        window_entropy = entropy(window)
+        if window_entropy >= MIN_TRAILING_ENTROPY:
+            reasons.append(f"{size - end} bytes after the end of the {fmt} data (entropy {window_entropy:.2f})")
+    else:
+        window = bytes(data[max(0, size - TAIL_WINDOW) :])
+        window_entropy = entropy(window)
+    return {
+        "format_end": end,
+        "trailing_bytes": size - end if end is not None else None,
+        "entropy": round(window_entropy, 3),
+        "window": len(window),
+    }
+
+
+def analyze(
+    file_path: str,
+    ctx: Optional[ImageContext] = None,
+    buffer: Optional[FileBuffer] = None,
+    detected_format: Optional[str] = None,
+) -> Dict[str, Any]:
+    if ctx is None:
+        with ImageContext(file_path, file_buffer=buffer) as own:
+            return analyze(file_path, ctx=own, detected_format=detected_format)
+    buffer = buffer or ctx.file_buffer
+    result: Dict[str, Any] = {"verdict": None, "reasons": []}
+    reasons: List[str] = result["reasons"]
+
+    try:
+        data = buffer.data
+    except Exception as exc:
+        result["error"] = str(exc)
+        return result
+    if detected_format is None:
+        detected_format = formats.sniff(bytes(data[: formats.HEAD_BYTES]))
+    result["tail"] = _tail(data, detected_format, reasons)
+
+    if detected_format not in formats.IMAGE_FORMATS:
+        result["pixels_skipped"] = "not an image"
+    elif detected_format in LOSSY_FORMATS:
+        result["pixels_skipped"] = "LSB statistics do not apply to lossy formats"
+    elif ctx.oversize() is not None:
+        result["pixels_skipped"] = ctx.oversize()
+    else:
+        try:
+            if ctx.header["mode"] in PALETTE_MODES:
+                result["pixels_skipped"] = "LSB statistics do not apply to palette images"
+            else:
+                _pixel_tests(ctx, result, reasons)
+        except Exception as exc:
+            result["pixels_skipped"] = str(exc)
+
+    if reasons:
+        result["verdict"] = "suspicious"
+    elif "pixels_skipped" not in result:
+        result["verdict"] = "clean"
+    else:
+        result["verdict"] = "inconclusive"
+    return result
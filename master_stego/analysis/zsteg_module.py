@@ -1,28 +1,192 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Pattern, Sequence, Tuple
 
-from master_stego.utils.subprocess_utils import run_command
+import numpy as np
 
+from master_stego import FLAG_FORMATS
+from master_stego.analysis.bitstream import IS_PRINTABLE, entropy, printable_ratio, to_printable
+from master_stego.analysis.flag_detection import FlagMatcher
+from master_stego.analysis.formats import IMAGE_FORMATS
+from master_stego.analysis.image_context import ImageContext
 
-def analyze(file_path: str) -> Dict[str, Any]:
-    cmd_result = run_command(["zsteg", "-a", file_path], timeout=300)
-    stderr = cmd_result["stderr"] or ""
-    available = not (stderr == "command not found" or cmd_result["returncode"] is None)
 
-    cleaned_stderr = stderr
-    if "undefined method `alpha_used?'" in stderr:
-        lines = stderr.splitlines()
-        useful = []
-        for line in lines:
-            s = line.strip()
-            if s.startswith("[?]") or s.startswith("[!]") or "bytes of extra data after image end" in s:
-                useful.append(line)
-        if not useful:
-            useful.append("zsteg encountered an internal error (alpha_used?); Ruby stack trace suppressed.")
-        cleaned_stderr = "\n".join(useful)
+VERSION = "3"
+FORMATS = IMAGE_FORMATS
+COST = "expensive"
+DECODES_PIXELS = True
+
+CHANNEL_SETS = {
+    "r": [0],
+    "g": [1],
+    "b": [2],
+    "a": [3],
+    "rgb": [0, 1, 2],
+    "bgr": [2, 1, 0],
+    "rgba": [0, 1, 2, 3],
+    "abgr": [3, 2, 1, 0],
+}
+BIT_ORDERS = {"lsb": "little", "msb": "big"}
+# zsteg's orders: the first letter is the inner axis; an upper-case X runs
+# right to left and an upper-case Y bottom to top.
+SCAN_ORDERS = ("xy", "xY", "Xy", "XY", "yx", "yX", "Yx", "YX")
+
+PROBE_BYTES = 256
+STREAM_BYTES = 8192
+MIN_TEXT_RUN = 12
+MIN_ENTROPY = 0.5
+PREVIEW_CHARS = 256
+MAX_FULL_STREAMS = 16
+
+FILE_MAGICS = [
+    (b"\x89PNG\r\n\x1a\n", "PNG image data"),
+    (b"\xff\xd8\xff", "JPEG image data"),
+    (b"GIF87a", "GIF image data"),
+    (b"GIF89a", "GIF image data"),
+    (b"PK\x03\x04", "Zip archive data"),
+    (b"\x1f\x8b\x08", "gzip compressed data"),
+    (b"BZh", "bzip2 compressed data"),
+    (b"\xfd7zXZ\x00", "XZ compressed data"),
+    (b"7z\xbc\xaf\x27\x1c", "7-zip archive data"),
+    (b"Rar!\x1a\x07", "RAR archive data"),
+    (b"%PDF-", "PDF document"),
+    (b"\x7fELF", "ELF executable"),
+    (b"OggS", "Ogg data"),
+    (b"RIFF", "RIFF data"),
+]
+
+
+def analyze(
+    file_path: str, ctx: Optional[ImageContext] = None, flag_formats: Optional[Sequence[str]] = None
+) -> Dict[str, Any]:
+    if ctx is None:
+        with ImageContext(file_path) as own:
+            return analyze(file_path, ctx=own, flag_formats=flag_formats)
+    flag_prefix = FlagMatcher(FLAG_FORMATS if flag_formats is None else flag_formats).prefix_pattern
+    has_alpha = ctx.header["has_alpha"]
+
+    channel_sets = [name for name in CHANNEL_SETS if has_alpha or "a" not in name]
+
+    findings: List[Dict[str, Any]] = []
+    scanned = 0
+    for order in SCAN_ORDERS:
+        probe_pixels = _ordered_pixels(ctx, order, PROBE_BYTES * 8)
+        for set_name in channel_sets:
+            indices = CHANNEL_SETS[set_name]
+            probe_values = probe_pixels[: -(-PROBE_BYTES * 8 // len(indices)), indices]
+            for bit in range(8):
+                for bitorder_name, bitorder in BIT_ORDERS.items():
+                    scanned += 1
+                    probe = _pack(probe_values, bit, bitorder, PROBE_BYTES)
+                    verdict = _score(probe, flag_prefix)
+                    if verdict is None:
+                        continue
+
+                    values = _ordered_pixels(ctx, order, -(-STREAM_BYTES * 8 // len(indices)))[:, indices]
+                    stream = _pack(values, bit, bitorder, STREAM_BYTES)
+                    kind, score, detail = _score(stream, flag_prefix) or verdict
+                    findings.append(
+                        {
+                            "name": f"bit{bit},{set_name},{bitorder_name},{order}",
+                            "channels": set_name,
+                            "bit": bit,
+                            "bitorder": bitorder_name,
+                            "order": order,
+                            "kind": kind,
+                            "score": round(score, 3),
+                            "entropy": round(entropy(stream), 3),
+                            "detail": detail,
+                        }
+                    )
+
+    findings.sort(key=lambda f: f["score"], reverse=True)
 
     return {
-        "available": available,
-        "returncode": cmd_result["returncode"],
-        "stdout": cmd_result["stdout"],
-        "stderr": cleaned_stderr,
+        "available": True,
+        "engine": "native",
+        "candidates": scanned,
+        "results": findings,
+        "stdout": "\n".join(_format_line(f) for f in findings),
+        "stderr": "",
     }
+
+
+def streams(ctx: ImageContext, zsteg_result: Dict[str, Any]) -> Iterator[Tuple[str, bytes]]:
+    findings = (zsteg_result or {}).get("results") or []
+    if not findings:
+        return
+    try:
+        total = ctx.header["width"] * ctx.header["height"]
+        if ctx.banded:
+            # Payloads sit at the start of the scan order; read one band's worth.
+            total = min(total, ctx.band_rows * ctx.header["width"])
+    except Exception:
+        return
+    for finding in findings[:MAX_FULL_STREAMS]:
+        try:
+            values = _ordered_pixels(ctx, finding["order"], total)[:, CHANNEL_SETS[finding["channels"]]]
+        except Exception:
+            return
+        stream = _pack(values, finding["bit"], BIT_ORDERS[finding["bitorder"]], values.size // 8)
+        yield f"zsteg.{finding['name']}", stream
+
+
+def _ordered_pixels(ctx: ImageContext, order: str, count: int) -> np.ndarray:
+    # Only the rows (or columns) the scan reaches are read, so a banded image
+    # is cropped rather than converted whole.
+    height, width = ctx.header["height"], ctx.header["width"]
+    x_reversed = "X" in order
+    y_reversed = "Y" in order
+    if order[0] in "yY":
+        cols = min(width, -(-count // max(height, 1)))
+        arr = ctx.region(width - cols, 0, width, height) if x_reversed else ctx.region(0, 0, cols, height)
+    else:
+        rows = min(height, -(-count // max(width, 1)))
+        arr = ctx.region(0, height - rows, width, height) if y_reversed else ctx.region(0, 0, width, rows)
+    if x_reversed:
+        arr = arr[:, ::-1]
+    if y_reversed:
+        arr = arr[::-1]
+    if order[0] in "yY":
+        arr = arr.transpose(1, 0, 2)
+    return arr.reshape(-1, arr.shape[2])[:count]
+
+
+def _pack(values: np.ndarray, bit: int, bitorder: str, max_bytes: int) -> bytes:
+    bits = ((values.reshape(-1) >> bit) & 1)[: max_bytes * 8]
+    bits = bits[: len(bits) - len(bits) % 8]
+    return np.packbits(bits, bitorder=bitorder).tobytes()
+
+
+def _leading_printable(data: bytes) -> int:
+    mask = IS_PRINTABLE[np.frombuffer(data, dtype=np.uint8)]
+    stops = np.flatnonzero(~mask)
+    return int(stops[0]) if len(stops) else len(data)
+
+
+def _score(data: bytes, flag_prefix: Optional[Pattern[bytes]]) -> Optional[Tuple[str, float, str]]:
+    if not data:
+        return None
+
+    for magic, description in FILE_MAGICS:
+        if data.startswith(magic):
+            return "file", 1.0, description
+
+    flag = flag_prefix.search(data) if flag_prefix is not None else None
+    run = _leading_printable(data)
+    if flag is None and run < MIN_TEXT_RUN:
+        return None
+    if flag is None and entropy(data[:run]) < MIN_ENTROPY:
+        return None
+
+    if flag is not None:
+        end = flag.start() + _leading_printable(data[flag.start():])
+        return "flag", 1.0, to_printable(data[flag.start(): end])[:PREVIEW_CHARS]
+
+    score = 0.5 * printable_ratio(data) + 0.5 * min(1.0, run / 64)
+    return "text", score, to_printable(data[:run])[:PREVIEW_CHARS]
+
+
+def _format_line(finding: Dict[str, Any]) -> str:
+    label = finding["name"].ljust(22)
+    if finding["kind"] == "file":
+        return f"{label}.. file: {finding['detail']}"
+    return f"{label}.. {finding['kind']}: \"{finding['detail']}\""
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+from master_stego import BATCH_MAX_BYTES, BATCH_MAX_FILES, BATCH_WORKERS, SCAN_PROFILE
+from master_stego.analysis.pipeline import run_full_analysis
+from master_stego.sessions import session_store
+from master_stego.utils import tools
+
+
+RESULT_FILE = "result.json"
+COPY_CHUNK = 1 << 20
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn, not fork: the web process has live threads (sweeper, SSE
+            # workers, analysis pools) whose locks a forked child could inherit held.
+            _POOL = ProcessPoolExecutor(
+                max_workers=max(1, BATCH_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=tools.probe,
+            )
+        return _POOL
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is broken:
+            _POOL = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def suspicion(result: Dict[str, Any]) -> Tuple[int, List[str]]:
+    score = 0
+    reasons: List[str] = []
+
+    def add(points: int, reason: str) -> None:
+        nonlocal score
+        score += points
+        reasons.append(reason)
+
+    # Hits inside the upload's own structure (a PNG's IDAT zlib streams, a JPEG
+    # thumbnail) are not embedded data. Without a known end of the format only
+    # the file's own magic at offset 0 is discounted.
+    end = ((result.get("triage") or {}).get("tail") or {}).get("format_end")
+    findings = (result.get("signatures") or {}).get("findings") or []
+    start = end if end is not None else 1
+    embedded = [f for f in findings if f["offset"] >= start]
+    if embedded:
+        add(min(30, 10 * len(embedded)), f"{len(embedded)} embedded signature(s)")
+
+    carved = (result.get("binwalk") or {}).get("carved") or []
+    if carved:
+        add(min(20, 5 * len(carved)), f"{len(carved)} carved item(s)")
+
+    extract = (result.get("steghide") or {}).get("extract") or {}
+    if extract.get("extracted_file"):
+        add(40, "steghide extracted data")
+
+    zsteg_hits = (result.get("zsteg") or {}).get("results") or []
+    if zsteg_hits:
+        add(min(30, 10 * len(zsteg_hits)), f"{len(zsteg_hits)} zsteg hit(s)")
+
+    triage = result.get("triage") or {}
+    if triage.get("verdict") == "suspicious":
+        add(5 * len(triage.get("reasons") or []), "triage: " + "; ".join(triage.get("reasons") or []))
+
+    if (result.get("header_footer") or {}).get("valid_footer") is False:
+        add(10, "missing or displaced end-of-image marker")
+
+    chains = (result.get("encodings") or {}).get("chains") or []
+    if chains:
+        add(min(15, 5 * len(chains)), f"{len(chains)} decoded string chain(s)")
+
+    for child in result.get("children") or []:
+        child_result = child.get("result")
+        if child_result:
+            child_score, _ = suspicion(child_result)
+            if child_score:
+                add(child_score // 2, f"extracted {child['path']} scores {child_score}")
+
+    return score, reasons
+
+
+def summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+    flags = result.get("flags") or {}
+    score, reasons = suspicion(result)
+    return {
+        "flags": flags.get("unique") or [],
+        "flag_count": flags.get("count", 0),
+        "suspicion": score,
+        "reasons": reasons,
+        "children": len([c for c in result.get("children") or [] if c.get("result")]),
+        "errors": sorted(key for key, value in result.items() if isinstance(value, dict) and "error" in value),
+    }
+
+
+def _analyze(job: Dict[str, Any]) -> Dict[str, Any]:
+    result = run_full_analysis(**job)
+    with open(os.path.join(job["session_dir"], RESULT_FILE), "w", encoding="utf-8") as f:
+        json.dump(result, f, default=str)
+    return summarize(result)
+
+
+class Batch:
+    def __init__(self, max_files: int = BATCH_MAX_FILES, max_bytes: int = BATCH_MAX_BYTES):
+        self.max_files = max_files
+        self.remaining_bytes = max_bytes
+        self.items: List[Dict[str, Any]] = []
+        self._by_hash: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, stream: BinaryIO) -> None:
+        if name.lower().endswith(".zip") and zipfile.is_zipfile(stream):
+            stream.seek(0)
+            self._add_zip(name, stream)
+        else:
+            stream.seek(0)
+            self._add_file(name, stream)
+
+    def _add_zip(self, name: str, stream: BinaryIO) -> None:
+        try:
+            archive = zipfile.ZipFile(stream)
+        except (zipfile.BadZipFile, OSError) as exc:
+            self.items.append({"name": name, "skipped": f"unreadable zip: {exc}"})
+            return
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                member = f"{name}/{info.filename}"
+                if info.flag_bits & 0x1:
+                    self.items.append({"name": member, "skipped": "encrypted"})
+                    continue
+                try:
+                    with archive.open(info) as member_stream:
+                        self._add_file(member, member_stream)
+                except (zipfile.BadZipFile, NotImplementedError, OSError, EOFError) as exc:
+                    self.items.append({"name": member, "skipped": str(exc)})
+
+    def _add_file(self, name: str, stream: BinaryIO) -> None:
+        item: Dict[str, Any] = {"name": name}
+        self.items.append(item)
+        if len(self._by_hash) >= self.max_files:
+            item["skipped"] = "file limit reached"
+            return
+
+        session_id, session_dir = session_store.create()
+        file_path = os.path.join(session_dir, "input" + os.path.splitext(name.lower())[1])
+        digest = hashlib.sha256()
+        size = 0
+        with open(file_path, "wb") as out:
+            while True:
+                chunk = stream.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.remaining_bytes:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+
+        if size > self.remaining_bytes:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            item["skipped"] = "bytes budget exhausted"
+            return
+        self.remaining_bytes -= size
+        item["size"] = size
+        item["sha256"] = digest.hexdigest()
+
+        first = self._by_hash.get(item["sha256"])
+        if first is not None:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            item["duplicate_of"] = first["name"]
+            return
+        self._by_hash[item["sha256"]] = item
+        item["session_id"] = session_id
+        item["session_dir"] = session_dir
+        item["file_path"] = file_path
+
+    def run(
+        self, steghide_passphrase: str = "", flag_formats: Sequence[str] = (), profile: str = SCAN_PROFILE
+    ) -> Dict[str, Any]:
+        started = time.monotonic()
+        pool = _get_pool()
+        futures = {}
+        for item in self.items:
+            if "session_id" not in item:
+                continue
+            job = {
+                "file_path": item.pop("file_path"),
+                "session_id": item["session_id"],
+                "session_dir": item.pop("session_dir"),
+                "steghide_passphrase": steghide_passphrase,
+                "flag_formats": list(flag_formats),
+                "profile": profile,
+            }
+            futures[pool.submit(_analyze, job)] = item
+
+        # Files still waiting for a pool process must not be swept meanwhile.
+        with session_store.keep_alive(*(item["session_id"] for item in futures.values())):
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    item.update(future.result())
+                except BrokenProcessPool as exc:
+                    _reset_pool(pool)
+                    item["error"] = f"worker process died: {exc}"
+                except Exception as exc:
+                    item["error"] = str(exc)
+                else:
+                    item["result_url"] = f"/api/session/{item['session_id']}/files/{RESULT_FILE}"
+
+        for item in self.items:
+            first = self._by_hash.get(item.get("sha256", ""))
+            if "duplicate_of" in item and first is not None:
+                for key in ("session_id", "result_url", "flags", "flag_count", "suspicion", "reasons", "error"):
+                    if key in first:
+                        item[key] = first[key]
+
+        ranked = sorted(
+            self.items,
+            key=lambda entry: (
+                "skipped" in entry,
+                -len(entry.get("flags") or []),
+                -entry.get("suspicion", 0),
+                entry["name"],
+            ),
+        )
+        return {
+            "count": len(self.items),
+            "analyzed": len(futures),
+            "duplicates": sum(1 for item in self.items if "duplicate_of" in item),
+            "skipped": sum(1 for item in self.items if "skipped" in item),
+            "flags": sorted({flag for item in self.items for flag in item.get("flags") or []}),
+            "workers": max(1, BATCH_WORKERS),
+            "elapsed": round(time.monotonic() - started, 3),
+            "files": ranked,
+        }
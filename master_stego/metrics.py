@@ -0,0 +1,207 @@
+import bisect
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def set_max(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = max(self._values.get(key, value), value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket (non-cumulative) counts, sum, count.
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, totals = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._values.items())
+        for key, (counts, totals) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(totals[0])}"
+            yield f"{self.name}_count{_format_labels(key)} {int(totals[1])}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        PROCESS_PEAK_RSS.set(peak_rss_bytes())
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+REGISTRY = Registry()
+
+ANALYZER_SECONDS = REGISTRY.register(
+    Histogram("master_stego_analyzer_seconds", "Wall time of one analyzer run (cache misses only).")
+)
+ANALYZER_CPU_SECONDS = REGISTRY.register(
+    Histogram("master_stego_analyzer_cpu_seconds", "CPU time of the thread running one analyzer.")
+)
+ANALYZER_ERRORS = REGISTRY.register(
+    Counter("master_stego_analyzer_errors_total", "Analyzer runs that raised and were turned into an error entry.")
+)
+ANALYZER_CACHE_HITS = REGISTRY.register(
+    Counter("master_stego_analyzer_cache_hits_total", "Analyzer results served from the result cache.")
+)
+ANALYZER_PEAK_RSS = REGISTRY.register(
+    Gauge(
+        "master_stego_analyzer_peak_rss_bytes",
+        "Highest process peak RSS seen when an analyzer finished; analyzers share the process, "
+        "so this bounds rather than attributes their memory.",
+    )
+)
+COMMAND_SECONDS = REGISTRY.register(
+    Histogram("master_stego_command_seconds", "Wall time of one external tool invocation.")
+)
+COMMAND_CPU_SECONDS = REGISTRY.register(
+    Histogram("master_stego_command_cpu_seconds", "User plus system CPU time of one external tool invocation.")
+)
+COMMAND_WAIT_SECONDS = REGISTRY.register(
+    Histogram("master_stego_command_wait_seconds", "Time an external tool invocation waited for a free tool slot.")
+)
+COMMAND_TIMEOUTS = REGISTRY.register(
+    Counter("master_stego_command_timeouts_total", "External tool invocations killed at their timeout or that never got a tool slot.")
+)
+COMMAND_FAILURES = REGISTRY.register(
+    Counter("master_stego_command_failures_total", "External tool invocations that were missing or exited non-zero.")
+)
+ANALYSES_IN_FLIGHT = REGISTRY.register(
+    Gauge("master_stego_analyses_in_flight", "Upload analyses currently running in this process.")
+)
+ANALYSIS_SECONDS = REGISTRY.register(
+    Histogram("master_stego_analysis_seconds", "Wall time of a full upload analysis, extracted children included.")
+)
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram("master_stego_http_request_seconds", "HTTP request latency by route, method and status.")
+)
+PROCESS_PEAK_RSS = REGISTRY.register(Gauge("master_stego_process_peak_rss_bytes", "Peak RSS of this process."))
+
+
+# Called with (module, wall seconds, cpu seconds) after every analyzer run, for
+# tools such as the benchmark harness that need raw samples rather than buckets.
+ANALYZER_OBSERVERS: List[Callable[[str, float, float], None]] = []
+
+
+@contextmanager
+def track_analyzer(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - started
+        cpu = time.thread_time() - cpu_started
+        ANALYZER_SECONDS.observe(wall, module=name)
+        ANALYZER_CPU_SECONDS.observe(cpu, module=name)
+        ANALYZER_PEAK_RSS.set_max(peak_rss_bytes(), module=name)
+        for observer in ANALYZER_OBSERVERS:
+            observer(name, wall, cpu)
+
+
+@contextmanager
+def track_analysis() -> Iterator[None]:
+    started = time.perf_counter()
+    ANALYSES_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        ANALYSES_IN_FLIGHT.dec()
+        ANALYSIS_SECONDS.observe(time.perf_counter() - started)
@@ -0,0 +1,88 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Set
+
+from master_stego import RENDER_CACHE_MAX_BYTES, RENDER_IMAGE_CACHE_MAX_BYTES
+from master_stego.analysis import bitplanes, color_channels
+from master_stego.analysis.image_context import ImageContext
+from master_stego.utils.lru import LRUCache
+
+
+_images = LRUCache(RENDER_IMAGE_CACHE_MAX_BYTES, sizeof=lambda ctx: ctx.nbytes())
+_encoded = LRUCache(RENDER_CACHE_MAX_BYTES, sizeof=len)
+# Sessions whose analysis still uses the cached context's full decode.
+_analyzing: Set[str] = set()
+_analyzing_lock = threading.Lock()
+
+
+def session_input(session_dir: str) -> Optional[str]:
+    try:
+        entries = sorted(os.listdir(session_dir))
+    except OSError:
+        return None
+    for entry in entries:
+        path = os.path.join(session_dir, entry)
+        if os.path.splitext(entry)[0] == "input" and os.path.isfile(path):
+            return path
+    return None
+
+
+def context(session_id: str, file_path: str) -> ImageContext:
+    return _images.get_or_create(session_id, lambda: ImageContext(file_path))
+
+
+@contextmanager
+def analysis_context(session_id: str, file_path: str) -> Iterator[ImageContext]:
+    # The pipeline shares its context with later renders; once it is done the
+    # context is trimmed to what renders need and its size accounted again.
+    ctx = context(session_id, file_path)
+    with _analyzing_lock:
+        _analyzing.add(session_id)
+    try:
+        yield ctx
+    finally:
+        with _analyzing_lock:
+            _analyzing.discard(session_id)
+        _settle(session_id, ctx)
+
+
+def _settle(session_id: str, ctx: ImageContext) -> None:
+    with _analyzing_lock:
+        if session_id in _analyzing:
+            return
+    ctx.release()
+    if _images.get(session_id) is ctx:
+        _images.put(session_id, ctx)
+
+
+def _session_context(session_id: str, session_dir: str) -> ImageContext:
+    cached = _images.get(session_id)
+    if cached is not None:
+        return cached
+    file_path = session_input(session_dir)
+    if file_path is None:
+        raise FileNotFoundError("session has no input file")
+    return context(session_id, file_path)
+
+
+def _render(session_id: str, session_dir: str, render: Callable[[ImageContext], bytes]) -> bytes:
+    ctx = _session_context(session_id, session_dir)
+    try:
+        return render(ctx)
+    finally:
+        _settle(session_id, ctx)
+
+
+def render_bitplane(session_id: str, session_dir: str, channel: str, bit: int) -> bytes:
+    return _encoded.get_or_create(
+        ("bitplane", session_id, channel, bit),
+        lambda: _render(session_id, session_dir, lambda ctx: bitplanes.render_plane(ctx, channel, bit)),
+    )
+
+
+def render_channel(session_id: str, session_dir: str, channel: str) -> bytes:
+    return _encoded.get_or_create(
+        ("channel", session_id, channel),
+        lambda: _render(session_id, session_dir, lambda ctx: color_channels.render_channel(ctx, channel)),
+    )
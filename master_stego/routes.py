@@ -1,15 +1,32 @@
-import uuid
 import os
 import json
+import queue
+import threading
+import time
 import urllib.request
 import urllib.error
-from flask import Blueprint, render_template, request, jsonify, send_from_directory, abort
+from flask import Blueprint, Response, g, render_template, request, jsonify, send_from_directory, abort
 
-from master_stego import TMP_DIR
+from master_stego.analysis import registry
 from master_stego.analysis.pipeline import run_full_analysis
+from master_stego.analysis.steghide_module import BUNDLED_WORDLIST, WORDLIST_NAME
+from master_stego import SCAN_PROFILE, metrics, renders
+from master_stego.batch import Batch
+from master_stego.analysis.flag_detection import parse_formats
+from master_stego.analysis.image_context import CHANNEL_NAMES
+from master_stego.jobs import JobQueue
+from master_stego.sessions import session_store
 
 
 _GEMINI_MODEL_NAME = None
+_JOB_QUEUE = None
+
+
+def _get_job_queue():
+    global _JOB_QUEUE
+    if _JOB_QUEUE is None:
+        _JOB_QUEUE = JobQueue()
+    return _JOB_QUEUE
 
 
 def _get_gemini_model(api_key):
@@ -141,9 +158,41 @@ def _call_gemini(api_key, analysis, message):
         return None, f"Unexpected Gemini response format: {exc}"
 
 
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _png_response(data):
+    return Response(data, mimetype="image/png", headers={"Cache-Control": "private, max-age=3600"})
+
+
 def register_routes(app):
     bp = Blueprint("master_stego", __name__)
 
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            metrics.HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                route=request.url_rule.rule if request.url_rule else "unmatched",
+                method=request.method,
+                status=str(response.status_code),
+            )
+        return response
+
+    @bp.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+    @bp.route("/api/analyzers", methods=["GET"])
+    def analyzers():
+        return jsonify(registry.describe())
+
     @bp.route("/", methods=["GET"])
     def index():
         return render_template("index.html")
@@ -152,51 +201,223 @@ def register_routes(app):
     def favicon():
         return send_from_directory(app.root_path, "fav.png", mimetype="image/png")
 
-    @bp.route("/api/analyze", methods=["POST"])
-    def analyze():
+    def read_profile():
+        profile = (request.args.get("profile") or request.form.get("profile") or SCAN_PROFILE).strip().lower()
+        if profile not in registry.PROFILES:
+            return profile, (
+                jsonify({"error": f"Unknown profile {profile!r}; expected one of {', '.join(registry.PROFILES)}"}),
+                400,
+            )
+        return profile, None
+
+    def save_upload():
         if "file" not in request.files:
-            return jsonify({"error": "No file uploaded"}), 400
+            return None, (jsonify({"error": "No file uploaded"}), 400)
 
         uploaded = request.files["file"]
         if uploaded.filename == "":
-            return jsonify({"error": "Empty filename"}), 400
+            return None, (jsonify({"error": "Empty filename"}), 400)
+
+        profile, error = read_profile()
+        if error:
+            return None, error
 
         ext = os.path.splitext(uploaded.filename.lower())[1]
-        session_id = uuid.uuid4().hex
-        session_dir = os.path.join(TMP_DIR, session_id)
-        os.makedirs(session_dir, exist_ok=True)
+        session_id, session_dir = session_store.create()
 
         filename = "input" + ext
         file_path = os.path.join(session_dir, filename)
         uploaded.save(file_path)
 
         steghide_passphrase = (request.form.get("steghide_passphrase") or "").strip()
+        flag_formats = parse_formats((request.form.get("flag_formats") or "").split(","))
+
+        steghide_wordlist = None
+        wordlist = request.files.get("wordlist")
+        if wordlist is not None and wordlist.filename:
+            steghide_wordlist = os.path.join(session_dir, WORDLIST_NAME)
+            wordlist.save(steghide_wordlist)
+        elif (request.form.get("steghide_crack") or "").strip().lower() in ("1", "true", "on", "bundled"):
+            steghide_wordlist = BUNDLED_WORDLIST
+
+        return {
+            "file_path": file_path,
+            "session_id": session_id,
+            "session_dir": session_dir,
+            "steghide_passphrase": steghide_passphrase,
+            "flag_formats": flag_formats,
+            "steghide_wordlist": steghide_wordlist,
+            "profile": profile,
+        }, None
 
-        result = run_full_analysis(
-            file_path=file_path,
-            session_id=session_id,
-            session_dir=session_dir,
-            steghide_passphrase=steghide_passphrase,
-        )
+    @bp.route("/api/analyze", methods=["POST"])
+    def analyze():
+        job, error = save_upload()
+        if error:
+            return error
+
+        mode = (request.args.get("mode") or request.form.get("mode") or "").strip().lower()
+        if mode == "async":
+            job_id = _get_job_queue().enqueue(job)
+            return (
+                jsonify(
+                    {
+                        "job_id": job_id,
+                        "session_id": job["session_id"],
+                        "status": "queued",
+                        "status_url": f"/api/jobs/{job_id}",
+                        "result_url": f"/api/jobs/{job_id}/result",
+                    }
+                ),
+                202,
+            )
+
+        with renders.analysis_context(job["session_id"], job["file_path"]) as ctx:
+            result = run_full_analysis(**job, ctx=ctx)
+        session_store.touch(job["session_id"])
 
         return jsonify(result)
 
+    @bp.route("/api/analyze/batch", methods=["POST"])
+    def analyze_batch():
+        uploads = [f for f in request.files.getlist("files") + request.files.getlist("file") if f.filename]
+        if not uploads:
+            return jsonify({"error": "No file uploaded"}), 400
+        profile, error = read_profile()
+        if error:
+            return error
+
+        batch = Batch()
+        for uploaded in uploads:
+            batch.add(uploaded.filename, uploaded.stream)
+
+        report = batch.run(
+            steghide_passphrase=(request.form.get("steghide_passphrase") or "").strip(),
+            flag_formats=parse_formats((request.form.get("flag_formats") or "").split(",")),
+            profile=profile,
+        )
+        return jsonify(report)
+
+    @bp.route("/api/jobs/<job_id>", methods=["GET"])
+    def job_status(job_id):
+        if not job_id.isalnum():
+            abort(404)
+
+        job = _get_job_queue().get(job_id)
+        if job is None:
+            abort(404)
+
+        return jsonify(job)
+
+    @bp.route("/api/jobs/<job_id>/result", methods=["GET"])
+    def job_result(job_id):
+        if not job_id.isalnum():
+            abort(404)
+
+        job = _get_job_queue().get(job_id, include_result=True)
+        if job is None:
+            abort(404)
+
+        if job["status"] == "done":
+            return jsonify(job["result"])
+        if job["status"] == "failed":
+            return jsonify({"error": job["error"] or "Analysis failed", "job_id": job_id}), 500
+
+        job.pop("result", None)
+        return jsonify(job), 202
+
+    @bp.route("/api/analyze/stream", methods=["POST"])
+    def analyze_stream():
+        job, error = save_upload()
+        if error:
+            return error
+
+        events = queue.Queue()
+
+        def worker():
+            started = time.monotonic()
+            try:
+                with renders.analysis_context(job["session_id"], job["file_path"]) as ctx:
+                    result = run_full_analysis(
+                        **job,
+                        on_result=lambda key, value: events.put(("module", {"key": key, "data": value})),
+                        ctx=ctx,
+                    )
+                errors = sorted(
+                    key for key, value in result.items() if isinstance(value, dict) and "error" in value
+                )
+                events.put(
+                    (
+                        "summary",
+                        {
+                            "session_id": result["session_id"],
+                            "elapsed": round(time.monotonic() - started, 3),
+                            "flag_count": (result.get("flags") or {}).get("count", 0),
+                            "extracted_count": len(result.get("extracted_files") or []),
+                            "errors": errors,
+                            "cache": result.get("cache"),
+                        },
+                    )
+                )
+            except Exception as exc:
+                events.put(("error", {"error": str(exc)}))
+            finally:
+                session_store.touch(job["session_id"])
+                events.put(None)
+
+        threading.Thread(target=worker, name="analysis-stream", daemon=True).start()
+
+        def generate():
+            yield _sse_event("session", {"session_id": job["session_id"]})
+            while True:
+                item = events.get()
+                if item is None:
+                    break
+                yield _sse_event(*item)
+
+        return Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     @bp.route("/api/session/<session_id>/files/<path:filename>", methods=["GET"])
     def download_file(session_id, filename):
-        if not session_id.isalnum():
+        session_dir = session_store.path(session_id)
+        if session_dir is None:
             abort(404)
 
-        session_dir = os.path.join(TMP_DIR, session_id)
-        session_dir = os.path.abspath(session_dir)
-        tmp_dir_abs = os.path.abspath(TMP_DIR)
+        session_store.touch(session_id)
+
+        return send_from_directory(session_dir, filename, as_attachment=True)
 
-        if not session_dir.startswith(tmp_dir_abs):
+    @bp.route("/api/session/<session_id>/bitplane/<channel>/<int:bit>", methods=["GET"])
+    def bitplane_image(session_id, channel, bit):
+        session_dir = session_store.path(session_id)
+        if session_dir is None or channel not in CHANNEL_NAMES or not 0 <= bit < 8:
             abort(404)
 
-        if not os.path.isdir(session_dir):
+        session_store.touch(session_id)
+        try:
+            data = renders.render_bitplane(session_id, session_dir, channel, bit)
+        except Exception:
             abort(404)
 
-        return send_from_directory(session_dir, filename, as_attachment=True)
+        return _png_response(data)
+
+    @bp.route("/api/session/<session_id>/channel/<channel>", methods=["GET"])
+    def channel_image(session_id, channel):
+        session_dir = session_store.path(session_id)
+        if session_dir is None or channel not in CHANNEL_NAMES:
+            abort(404)
+
+        session_store.touch(session_id)
+        try:
+            data = renders.render_channel(session_id, session_dir, channel)
+        except Exception:
+            abort(404)
+
+        return _png_response(data)
 
     @bp.route("/api/chat", methods=["POST"])
     def chat():
@@ -0,0 +1,213 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from master_stego import (
+    TMP_DIR,
+    SESSION_MAX_BYTES,
+    SESSION_TTL_SECONDS,
+    SESSION_GRACE_SECONDS,
+    SESSION_SWEEP_INTERVAL,
+)
+
+
+SESSION_MARKER = ".session"
+SESSION_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+
+class SessionStore:
+    def __init__(
+        self,
+        root: str = TMP_DIR,
+        max_bytes: int = SESSION_MAX_BYTES,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+        grace_seconds: int = SESSION_GRACE_SECONDS,
+    ):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.grace_seconds = grace_seconds
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def create(self, session_id: Optional[str] = None) -> Tuple[str, str]:
+        # An id from new_id() can be handed out first and its directory made later.
+        session_id = session_id or self.new_id()
+        session_dir = os.path.join(self.root, session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        with open(os.path.join(session_dir, SESSION_MARKER), "w", encoding="utf-8") as f:
+            json.dump({"created": time.time()}, f)
+        return session_id, session_dir
+
+    def path(self, session_id: str) -> Optional[str]:
+        if not SESSION_ID_RE.fullmatch(session_id or ""):
+            return None
+        session_dir = os.path.join(self.root, session_id)
+        if not os.path.isdir(session_dir):
+            return None
+        return session_dir
+
+    def touch(self, session_id: str) -> bool:
+        session_dir = self.path(session_id)
+        if session_dir is None:
+            return False
+        marker = os.path.join(session_dir, SESSION_MARKER)
+        try:
+            os.utime(marker)
+        except FileNotFoundError:
+            try:
+                with open(marker, "w", encoding="utf-8") as f:
+                    json.dump({"created": os.stat(session_dir).st_mtime}, f)
+            except OSError:
+                return False
+        except OSError:
+            return False
+        return True
+
+    @contextmanager
+    def keep_alive(self, *session_ids: str) -> Iterator[None]:
+        # An analysis can run far longer than the grace period (cracking,
+        # recursion, a long batch queue); the markers are touched while it does.
+        done = threading.Event()
+
+        def touch_all():
+            for session_id in session_ids:
+                self.touch(session_id)
+
+        def loop():
+            while not done.wait(max(1.0, self.grace_seconds / 3)):
+                touch_all()
+
+        touch_all()
+        thread = threading.Thread(target=loop, name="session-keep-alive", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+            touch_all()
+
+    def info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session_dir = self.path(session_id)
+        if session_dir is None:
+            return None
+        return _session_info(session_id, session_dir)
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        sessions = []
+        try:
+            entries = os.listdir(self.root)
+        except OSError:
+            return sessions
+        for entry in entries:
+            session_dir = os.path.join(self.root, entry)
+            if not SESSION_ID_RE.fullmatch(entry) or not os.path.isdir(session_dir):
+                continue
+            info = _session_info(entry, session_dir)
+            if info is not None:
+                sessions.append(info)
+        return sessions
+
+    def sweep(self, busy: Iterable[str] = ()) -> Dict[str, int]:
+        # Sessions in `busy` (queued or running jobs) are never evicted.
+        now = time.time()
+        busy = set(busy)
+        sessions = sorted(
+            (s for s in self.list_sessions() if s["session_id"] not in busy), key=lambda s: s["last_access"]
+        )
+        evicted = 0
+        freed = 0
+
+        def evict(session):
+            nonlocal evicted, freed
+            shutil.rmtree(os.path.join(self.root, session["session_id"]), ignore_errors=True)
+            evicted += 1
+            freed += session["size"]
+
+        remaining = []
+        for session in sessions:
+            if now - session["last_access"] > max(self.ttl_seconds, self.grace_seconds):
+                evict(session)
+            else:
+                remaining.append(session)
+
+        total = sum(s["size"] for s in remaining)
+        for session in remaining:
+            if total <= self.max_bytes:
+                break
+            if now - session["last_access"] < self.grace_seconds:
+                break
+            evict(session)
+            total -= session["size"]
+
+        return {"evicted": evicted, "freed_bytes": freed, "remaining_bytes": total}
+
+    def start_sweeper(
+        self,
+        interval: float = SESSION_SWEEP_INTERVAL,
+        busy: Optional[Callable[[], Iterable[str]]] = None,
+    ) -> threading.Thread:
+        with self._sweeper_lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return self._sweeper
+
+            def loop():
+                while True:
+                    try:
+                        self.sweep(busy() if busy is not None else ())
+                    except Exception:
+                        pass
+                    time.sleep(interval)
+
+            self._sweeper = threading.Thread(target=loop, name="session-sweeper", daemon=True)
+            self._sweeper.start()
+            return self._sweeper
+
+
+def _session_info(session_id: str, session_dir: str) -> Optional[Dict[str, Any]]:
+    marker = os.path.join(session_dir, SESSION_MARKER)
+    try:
+        stat = os.stat(marker)
+        last_access = stat.st_mtime
+        try:
+            with open(marker, "r", encoding="utf-8") as f:
+                created = float(json.load(f).get("created", last_access))
+        except (OSError, ValueError, AttributeError):
+            created = last_access
+    except FileNotFoundError:
+        try:
+            last_access = created = os.stat(session_dir).st_mtime
+        except OSError:
+            return None
+    except OSError:
+        return None
+
+    size = 0
+    for root, _, files in os.walk(session_dir):
+        for f in files:
+            try:
+                size += os.lstat(os.path.join(root, f)).st_size
+            except OSError:
+                pass
+
+    return {
+        "session_id": session_id,
+        "created": created,
+        "last_access": last_access,
+        "size": size,
+    }
+
+
+session_store = SessionStore()
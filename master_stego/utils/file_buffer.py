@@ -0,0 +1,68 @@
+import hashlib
+import mmap
+import os
+import threading
+from typing import Dict, Optional, Sequence, Union
+
+
+DIGESTS = ("sha256", "md5", "sha1")
+CHUNK_BYTES = 1 << 20
+
+
+class FileBuffer:
+    def __init__(self, file_path: str, algorithms: Sequence[str] = DIGESTS):
+        self.file_path = file_path
+        self.algorithms = tuple(algorithms)
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._digests: Optional[Dict[str, str]] = None
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.file_path)
+
+    @property
+    def data(self) -> Union[mmap.mmap, bytes]:
+        with self._lock:
+            if self._map is not None:
+                return self._map
+            f = open(self.file_path, "rb")
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                f.close()
+                return b""
+            self._file = f
+            return self._map
+
+    def digests(self) -> Dict[str, str]:
+        with self._lock:
+            if self._digests is None:
+                hashers = [hashlib.new(name) for name in self.algorithms]
+                chunk = bytearray(CHUNK_BYTES)
+                view = memoryview(chunk)
+                with open(self.file_path, "rb", buffering=0) as f:
+                    while True:
+                        read = f.readinto(chunk)
+                        if not read:
+                            break
+                        for hasher in hashers:
+                            hasher.update(view[:read])
+                self._digests = {name: hasher.hexdigest() for name, hasher in zip(self.algorithms, hashers)}
+            return dict(self._digests)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> "FileBuffer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    def __init__(self, max_size: int, sizeof: Callable[[Any], int] = lambda value: 1):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # Sizes as measured on put; putting a value again re-measures it.
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._items:
+                del self._items[key]
+                self.size -= self._sizes.pop(key)
+            if size > self.max_size:
+                return
+            self._items[key] = value
+            self._sizes[key] = size
+            self.size += size
+            while self.size > self.max_size:
+                evicted, _ = self._items.popitem(last=False)
+                self.size -= self._sizes.pop(evicted)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._items:
+                del self._items[key]
+                self.size -= self._sizes.pop(key)
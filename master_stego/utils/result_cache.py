@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+
+ARTIFACT_KEYS = ("filename", "extracted_file")
+ARTIFACT_LIST_KEYS = ("extracted_paths",)
+STALE_STAGING_SECONDS = 3600
+SESSION_PLACEHOLDER = "{session_id}"
+SESSION_DIR_PLACEHOLDER = "{session_dir}"
+
+
+def cache_key(sha256: str, analyzer: str, version: str, params: Optional[Dict[str, Any]] = None) -> str:
+    material = json.dumps([sha256, analyzer, version, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def artifact_paths(value: Any) -> Iterator[str]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in ARTIFACT_KEYS and isinstance(item, str):
+                yield item
+            elif key in ARTIFACT_LIST_KEYS and isinstance(item, list):
+                for path in item:
+                    if isinstance(path, str):
+                        yield path
+            else:
+                yield from artifact_paths(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from artifact_paths(item)
+
+
+def is_cacheable(result: Any) -> bool:
+    if not isinstance(result, dict):
+        return False
+    return "error" not in result and result.get("available") is not False and not result.get("partial")
+
+
+def _session_url(session_id: str) -> str:
+    return f"/api/session/{session_id}/"
+
+
+def _json_path(path: str) -> str:
+    # The path as it appears inside a JSON string.
+    return json.dumps(os.path.abspath(path))[1:-1]
+
+
+def _to_placeholders(body: str, session_id: str, session_dir: str) -> str:
+    body = body.replace(_session_url(session_id), _session_url(SESSION_PLACEHOLDER))
+    return body.replace(_json_path(session_dir), SESSION_DIR_PLACEHOLDER)
+
+
+def _from_placeholders(body: str, session_id: str, session_dir: str) -> str:
+    body = body.replace(_session_url(SESSION_PLACEHOLDER), _session_url(session_id))
+    return body.replace(SESSION_DIR_PLACEHOLDER, _json_path(session_dir))
+
+
+class ResultCache:
+    def __init__(self, root: str, max_bytes: int, evict_interval: float = 30.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self._last_evict = 0.0
+        self._evict_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str, session_id: str, session_dir: str) -> Optional[Any]:
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, "result.json"), "r", encoding="utf-8") as f:
+                body = f.read()
+            payload = json.loads(_from_placeholders(body, session_id, session_dir))
+            for rel in payload["artifacts"]:
+                dest = os.path.join(session_dir, rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                shutil.copyfile(os.path.join(entry, "files", rel), dest)
+            os.utime(entry)
+        except (OSError, ValueError, KeyError):
+            return None
+        return payload["result"]
+
+    def put(self, key: str, result: Any, session_id: str, session_dir: str) -> None:
+        entry = self._entry_dir(key)
+        if os.path.isdir(entry):
+            return
+
+        session_root = os.path.abspath(session_dir)
+        artifacts: List[str] = []
+        for rel in dict.fromkeys(artifact_paths(result)):
+            src = os.path.abspath(os.path.join(session_root, rel))
+            if src.startswith(session_root + os.sep) and os.path.isfile(src):
+                artifacts.append(os.path.relpath(src, session_root))
+
+        staging = os.path.join(self.root, ".staging-" + uuid.uuid4().hex)
+        try:
+            size = 0
+            for rel in artifacts:
+                dest = os.path.join(staging, "files", rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                shutil.copyfile(os.path.join(session_root, rel), dest)
+                size += os.path.getsize(dest)
+
+            os.makedirs(staging, exist_ok=True)
+            body = json.dumps({"result": result, "artifacts": artifacts}, default=str)
+            # Absolute paths into the session (tool output, error messages)
+            # are stored relative to whichever session replays the entry.
+            body = _to_placeholders(body, session_id, session_dir)
+            with open(os.path.join(staging, "result.json"), "w", encoding="utf-8") as f:
+                f.write(body)
+            size += len(body)
+            with open(os.path.join(staging, "size"), "w", encoding="ascii") as f:
+                f.write(str(size))
+
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            os.rename(staging, entry)
+        except OSError:
+            pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self._maybe_evict()
+
+    def _maybe_evict(self) -> None:
+        now = time.monotonic()
+        if now - self._last_evict < self.evict_interval:
+            return
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_evict = now
+            self.evict()
+        finally:
+            self._evict_lock.release()
+
+    def evict(self) -> int:
+        entries = []
+        total = 0
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if shard.startswith(".staging-"):
+                try:
+                    if time.time() - os.stat(shard_dir).st_mtime > STALE_STAGING_SECONDS:
+                        shutil.rmtree(shard_dir, ignore_errors=True)
+                except OSError:
+                    pass
+                continue
+            if not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                entry = os.path.join(shard_dir, key)
+                try:
+                    with open(os.path.join(entry, "size"), "r", encoding="ascii") as f:
+                        size = int(f.read())
+                    last_used = os.stat(entry).st_mtime
+                except (OSError, ValueError):
+                    continue
+                entries.append((last_used, size, entry))
+                total += size
+
+        removed = 0
+        entries.sort()
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
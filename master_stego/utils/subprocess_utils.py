@@ -1,36 +1,210 @@
+import fcntl
+import os
+import resource
+import signal
 import subprocess
-from typing import List, Optional, Dict, Any
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Any, Iterator, BinaryIO
 
+from master_stego import (
+    TMP_DIR,
+    TOOL_CPU_SECONDS,
+    TOOL_MAX_CONCURRENCY,
+    TOOL_MAX_MEMORY_BYTES,
+    TOOL_MAX_OUTPUT_BYTES,
+    TOOL_OUTPUT_HEAD_BYTES,
+    TOOL_OUTPUT_TAIL_BYTES,
+)
+from master_stego import metrics
 
-def run_command(cmd: List[str], cwd: Optional[str] = None, timeout: int = 30) -> Dict[str, Any]:
+
+SLOT_DIR = os.path.join(TMP_DIR, ".tool-slots")
+SLOT_POLL_SECONDS = 0.05
+TERM_GRACE_SECONDS = 1.0
+
+
+class ToolSlots:
+    # One lock file per slot, taken with flock: the limit holds across threads,
+    # gunicorn workers, batch pool processes and job workers on this machine, and
+    # the kernel drops a slot when its holder dies.
+    def __init__(self, directory: str = SLOT_DIR, count: int = TOOL_MAX_CONCURRENCY):
+        self.directory = directory
+        self.count = max(1, count)
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def acquire(self, timeout: float) -> Iterator[bool]:
+        deadline = time.monotonic() + timeout
+        while True:
+            for index in range(self.count):
+                fd = os.open(os.path.join(self.directory, f"slot-{index}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue
+                try:
+                    yield True
+                finally:
+                    os.close(fd)
+                return
+            if time.monotonic() >= deadline:
+                yield False
+                return
+            time.sleep(SLOT_POLL_SECONDS)
+
+
+_slots: Optional[ToolSlots] = None
+_pools: Dict[str, ToolSlots] = {}
+_slots_lock = threading.Lock()
+
+
+def _get_slots() -> ToolSlots:
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = ToolSlots()
+        return _slots
+
+
+def slot_pool(name: str, count: int) -> ToolSlots:
+    # A separate machine-wide pool, for long-running work (passphrase cracking)
+    # that must not hold the slots every other analysis waits for.
+    with _slots_lock:
+        if name not in _pools:
+            _pools[name] = ToolSlots(os.path.join(SLOT_DIR, name), count)
+        return _pools[name]
+
+
+def _apply_limits(pid: int) -> None:
+    # Set from the parent with prlimit rather than in preexec_fn, which is not
+    # safe to run in a process with threads. The window between exec and this
+    # call is a few hundred microseconds of the tool's startup.
+    limits = (
+        (resource.RLIMIT_CPU, TOOL_CPU_SECONDS),
+        (resource.RLIMIT_AS, TOOL_MAX_MEMORY_BYTES),
+        (resource.RLIMIT_FSIZE, TOOL_MAX_OUTPUT_BYTES),
+    )
+    for limit, value in limits:
+        if value <= 0:
+            continue
+        try:
+            resource.prlimit(pid, limit, (value, value))
+        except (AttributeError, OSError, ValueError):
+            pass
+
+
+def _kill_group(pgid: int, sig: int) -> None:
     try:
-        completed = subprocess.run(
-            cmd,
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=timeout,
-            check=False,
-        )
-        return {
-            "cmd": cmd,
-            "returncode": completed.returncode,
-            "stdout": completed.stdout,
-            "stderr": completed.stderr,
-        }
-    except subprocess.TimeoutExpired as exc:
-        return {
-            "cmd": cmd,
-            "returncode": None,
-            "stdout": exc.stdout or "",
-            "stderr": (exc.stderr or "") + "\n[timeout]",
-        }
-    except FileNotFoundError:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _read_bounded(spill: BinaryIO) -> str:
+    size = spill.seek(0, os.SEEK_END)
+    spill.seek(0)
+    if size <= TOOL_OUTPUT_HEAD_BYTES + TOOL_OUTPUT_TAIL_BYTES:
+        return spill.read().decode("utf-8", "replace")
+    head = spill.read(TOOL_OUTPUT_HEAD_BYTES)
+    spill.seek(size - TOOL_OUTPUT_TAIL_BYTES)
+    tail = spill.read()
+    omitted = size - len(head) - len(tail)
+    return (
+        head.decode("utf-8", "replace")
+        + f"\n[... {omitted} bytes omitted ...]\n"
+        + tail.decode("utf-8", "replace")
+    )
+
+
+def run_command(
+    cmd: List[str], cwd: Optional[str] = None, timeout: float = 30, slots: Optional[ToolSlots] = None
+) -> Dict[str, Any]:
+    # `timeout` covers waiting for a slot and running the tool together.
+    tool = os.path.basename(cmd[0]) if cmd else ""
+    queued = time.perf_counter()
+    with (slots or _get_slots()).acquire(timeout) as acquired:
+        waited = time.perf_counter() - queued
+        metrics.COMMAND_WAIT_SECONDS.observe(waited, tool=tool)
+        if not acquired or waited >= timeout:
+            metrics.COMMAND_TIMEOUTS.inc(tool=tool)
+            return {
+                "cmd": cmd,
+                "returncode": None,
+                "stdout": "",
+                "stderr": "[timeout waiting for a free tool slot]",
+            }
+        return _run(cmd, cwd, timeout - waited, tool)
+
+
+def _run(cmd: List[str], cwd: Optional[str], timeout: float, tool: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    # Output goes straight from the tool to unlinked files on disk, never
+    # through a pipe into this process; only a head and tail are read back.
+    with tempfile.TemporaryFile(dir=TMP_DIR) as out, tempfile.TemporaryFile(dir=TMP_DIR) as err:
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                cwd=cwd,
+                stdin=subprocess.DEVNULL,
+                stdout=out,
+                stderr=err,
+                start_new_session=True,
+            )
+        except FileNotFoundError:
+            metrics.COMMAND_FAILURES.inc(tool=tool, reason="not_found")
+            return {
+                "cmd": cmd,
+                "returncode": None,
+                "stdout": "",
+                "stderr": "command not found",
+            }
+        _apply_limits(proc.pid)
+
+        timed_out = threading.Event()
+        reaped = threading.Event()
+
+        def expire():
+            timed_out.set()
+            _kill_group(proc.pid, signal.SIGTERM)
+            if not reaped.wait(TERM_GRACE_SECONDS):
+                _kill_group(proc.pid, signal.SIGKILL)
+
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            # wait4 instead of Popen.wait: it also returns the child's rusage.
+            _, status, usage = os.wait4(proc.pid, 0)
+        finally:
+            reaped.set()
+            timer.cancel()
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # Helpers the tool forked (and did not wait for) share its process group.
+        _kill_group(proc.pid, signal.SIGKILL)
+
+        metrics.COMMAND_SECONDS.observe(time.perf_counter() - started, tool=tool)
+        metrics.COMMAND_CPU_SECONDS.observe(usage.ru_utime + usage.ru_stime, tool=tool)
+
+        stdout = _read_bounded(out)
+        stderr = _read_bounded(err)
+
+    if timed_out.is_set():
+        metrics.COMMAND_TIMEOUTS.inc(tool=tool)
         return {
             "cmd": cmd,
             "returncode": None,
-            "stdout": "",
-            "stderr": "command not found",
+            "stdout": stdout,
+            "stderr": stderr + "\n[timeout]",
         }
-
+    if proc.returncode != 0:
+        metrics.COMMAND_FAILURES.inc(tool=tool, reason="exit")
+    return {
+        "cmd": cmd,
+        "returncode": proc.returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+    }
@@ -0,0 +1,54 @@
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from master_stego.utils.subprocess_utils import run_command
+
+
+# Arguments that make each tool print its version; tools without one are only
+# looked up on PATH, never started.
+VERSION_ARGS = {
+    "exiftool": ["-ver"],
+    "steghide": ["--version"],
+    "stegseek": ["--version"],
+    "outguess": None,
+    "openstego": None,
+}
+PROBE_TIMEOUT_SECONDS = 10
+
+_probed: Optional[Dict[str, Dict[str, Any]]] = None
+_probe_lock = threading.Lock()
+
+
+def _probe_one(tool: str, version_args: Optional[List[str]]) -> Dict[str, Any]:
+    path = shutil.which(tool)
+    if path is None:
+        return {"available": False, "path": None, "version": None}
+    version = None
+    if version_args is not None:
+        proc = run_command([path] + version_args, timeout=PROBE_TIMEOUT_SECONDS)
+        lines = (proc["stdout"] or proc["stderr"]).strip().splitlines()
+        version = lines[0].strip() if lines else None
+    return {"available": True, "path": path, "version": version}
+
+
+def probe(refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+    # Called once when a web, job or batch worker process starts; analyzers then
+    # read the cached answer instead of spawning a process to find out.
+    global _probed
+    with _probe_lock:
+        if _probed is None or refresh:
+            _probed = {tool: _probe_one(tool, args) for tool, args in VERSION_ARGS.items()}
+        return _probed
+
+
+def available(tool: str) -> bool:
+    return probe().get(tool, {}).get("available", False)
+
+
+def version(tool: str) -> Optional[str]:
+    return probe().get(tool, {}).get("version")
+
+
+def missing(tools: Sequence[str]) -> List[str]:
+    return [tool for tool in tools if not available(tool)]
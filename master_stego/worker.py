@@ -0,0 +1,112 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+
+from master_stego.jobs import JobQueue
+from master_stego.sessions import session_store
+from master_stego.analysis.pipeline import run_full_analysis
+from master_stego.utils import tools
+
+
+PURGE_INTERVAL_SECONDS = 300
+
+
+def run_worker(
+    queue: JobQueue,
+    poll_interval: float = 1.0,
+    once: bool = False,
+    stop_event: Optional[threading.Event] = None,
+) -> int:
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    tools.probe()
+    stop_event = stop_event or threading.Event()
+    processed = 0
+    last_purge = 0.0
+
+    while not stop_event.is_set():
+        if time.monotonic() - last_purge >= PURGE_INTERVAL_SECONDS:
+            last_purge = time.monotonic()
+            try:
+                queue.purge()
+            except Exception:
+                pass
+
+        job = queue.claim(worker_id)
+        if job is None:
+            if once:
+                break
+            stop_event.wait(poll_interval)
+            continue
+
+        session_id = job["payload"].get("session_id")
+        session_store.touch(session_id)
+        finished = threading.Event()
+
+        def keep_alive(job_id=job["id"]):
+            while not finished.wait(max(1.0, queue.lease_seconds / 3)):
+                if not queue.heartbeat(job_id, worker_id):
+                    break
+
+        heartbeat = threading.Thread(target=keep_alive, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            result = run_full_analysis(**job["payload"])
+        except Exception as exc:
+            queue.fail(job["id"], worker_id, str(exc))
+        else:
+            queue.complete(job["id"], worker_id, result)
+        finally:
+            finished.set()
+            heartbeat.join()
+            session_store.touch(session_id)
+        processed += 1
+
+    return processed
+
+
+def _worker_process(db_path: str, poll_interval: float) -> None:
+    try:
+        run_worker(JobQueue(db_path), poll_interval=poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Process queued Master Stego analysis jobs.")
+    parser.add_argument("--db", default=None, help="job database path (default: MASTER_STEGO_JOBS_DB)")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes to run")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds to wait when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="drain the queue once and exit")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db) if args.db else JobQueue()
+
+    if args.once or args.processes <= 1:
+        try:
+            run_worker(queue, poll_interval=args.poll_interval, once=args.once)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(queue.path, args.poll_interval), daemon=False)
+        for _ in range(args.processes)
+    ]
+    for proc in processes:
+        proc.start()
+    try:
+        for proc in processes:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in processes:
+            proc.join(timeout=5)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
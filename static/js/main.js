@@ -1,6 +1,10 @@
 const form = document.getElementById("analyze-form");
 const fileInput = document.getElementById("image-input");
 const steghidePassInput = document.getElementById("steghide-passphrase");
+const steghideCrackInput = document.getElementById("steghide-crack");
+const steghideWordlistInput = document.getElementById("steghide-wordlist");
+const flagFormatsInput = document.getElementById("flag-formats");
+const scanProfileInput = document.getElementById("scan-profile");
 const resetButton = document.getElementById("reset-button");
 const statusText = document.getElementById("status-text");
 const loadingOverlay = document.getElementById("loading-overlay");
@@ -20,7 +24,9 @@ const fileInfoPanel = document.getElementById("file-info-panel");
 const exifPanel = document.getElementById("exif-panel");
 const stringsPanel = document.getElementById("strings-panel");
 const headerFooterPanel = document.getElementById("header-footer-panel");
+const signaturesPanel = document.getElementById("signatures-panel");
 const binwalkPanel = document.getElementById("binwalk-panel");
+const triagePanel = document.getElementById("triage-panel");
 const channelsPanel = document.getElementById("channels-panel");
 const enhancementsPanel = document.getElementById("enhancements-panel");
 const bitplanesPanel = document.getElementById("bitplanes-panel");
@@ -28,6 +34,7 @@ const lsbPanel = document.getElementById("lsb-panel");
 const zstegPanel = document.getElementById("zsteg-panel");
 const steghidePanel = document.getElementById("steghide-panel");
 const encodingsPanel = document.getElementById("encodings-panel");
+const childrenPanel = document.getElementById("children-panel");
 
 let lastResult = null;
 
@@ -87,16 +94,25 @@ function resetUI() {
     if (steghidePassInput) {
         steghidePassInput.value = "";
     }
+    if (steghideCrackInput) {
+        steghideCrackInput.checked = false;
+    }
+    if (steghideWordlistInput) {
+        steghideWordlistInput.value = "";
+    }
     setStatus("Idle.");
 
     fileInfoPanel.textContent = "";
     exifPanel.textContent = "";
     headerFooterPanel.textContent = "";
+    signaturesPanel.textContent = "";
     binwalkPanel.textContent = "";
+    triagePanel.textContent = "";
     lsbPanel.textContent = "";
     zstegPanel.textContent = "";
     steghidePanel.textContent = "";
     encodingsPanel.textContent = "";
+    childrenPanel.textContent = "";
 
     stringsPanel.innerHTML = "";
     channelsPanel.innerHTML = "";
@@ -145,7 +161,7 @@ function renderFlags(flagsResult) {
         div.className = "bg-gray-800 border border-emerald-600/50 rounded px-2 py-1";
         div.innerHTML = `
             <div class="text-xs font-mono text-emerald-300">${f.flag}</div>
-            <div class="text-[10px] text-gray-400 mt-1">${f.source}</div>
+            <div class="text-[10px] text-gray-400 mt-1">${f.source}${typeof f.offset === "number" ? ` @ 0x${f.offset.toString(16)}` : ""}</div>
         `;
         flagsContainer.appendChild(div);
     });
@@ -257,14 +273,35 @@ function renderJson(panel, data) {
 }
 
 
+function summarizeChildren(children) {
+    return (children || []).map((child) => {
+        const summary = {
+            path: child.path,
+            source: child.source,
+            size: child.size,
+            sha256: child.sha256,
+        };
+        if (child.skipped) {
+            summary.skipped = child.skipped;
+            return summary;
+        }
+        const childResult = child.result || {};
+        summary.session_id = child.session_id;
+        summary.signatures = (childResult.signatures || {}).counts;
+        summary.flags = ((childResult.flags || {}).flags || []).map((entry) => entry.flag);
+        summary.files = (childResult.extracted_files || []).map((entry) => entry.url);
+        summary.children = summarizeChildren(childResult.children);
+        return summary;
+    });
+}
+
+
 function renderStringsPanel(stringsResult, flagsResult) {
     stringsPanel.innerHTML = "";
-    const ascii = stringsResult.ascii || {};
-    const utf16 = stringsResult.utf16 || {};
-
     const sections = [
-        { title: "ASCII", data: ascii },
-        { title: "UTF-16", data: utf16 },
+        { title: "ASCII", data: stringsResult.ascii || {} },
+        { title: "UTF-16LE", data: stringsResult.utf16 || {} },
+        { title: "UTF-16BE", data: stringsResult.utf16be || {} },
     ];
 
     sections.forEach(({ title, data }) => {
@@ -274,7 +311,7 @@ function renderStringsPanel(stringsResult, flagsResult) {
         header.className = "flex justify-between items-center mb-1";
         header.innerHTML = `
             <span class="font-semibold text-emerald-400">${title}</span>
-            <span class="text-[10px] text-gray-500">${data.count || 0} strings (sample)</span>
+            <span class="text-[10px] text-gray-500">${data.count || 0} strings${data.truncated ? ` (first ${(data.sample || []).length} shown)` : ""}</span>
         `;
         wrapper.appendChild(header);
 
@@ -297,6 +334,10 @@ function renderLsbPanel(lsbResult, flagsResult) {
         lsbPanel.textContent = "No LSB data.";
         return;
     }
+    if (lsbResult.skipped) {
+        lsbPanel.textContent = "LSB skipped: " + (lsbResult.reason || "not applicable");
+        return;
+    }
     if (lsbResult.error) {
         lsbPanel.textContent = "LSB error: " + lsbResult.error;
         return;
@@ -357,7 +398,7 @@ function renderZstegPanel(zstegResult, flagsResult) {
         return;
     }
     if (zstegResult.skipped) {
-        zstegPanel.textContent = "Zsteg is working for only .png Images";
+        zstegPanel.textContent = "zsteg skipped: " + (zstegResult.reason || "not applicable");
         return;
     }
     if (zstegResult.error) {
@@ -378,8 +419,8 @@ function renderZstegPanel(zstegResult, flagsResult) {
     const stdoutHeader = document.createElement("div");
     stdoutHeader.className = "flex justify-between items-center mb-1";
     stdoutHeader.innerHTML = `
-        <span class="font-semibold text-emerald-400">zsteg -a output</span>
-        <span class="text-[10px] text-gray-500">return code: ${zstegResult.returncode}</span>
+        <span class="font-semibold text-emerald-400">zsteg -a scan</span>
+        <span class="text-[10px] text-gray-500">${zstegResult.candidates || 0} candidates, ${(zstegResult.results || []).length} hits</span>
     `;
     stdoutBlock.appendChild(stdoutHeader);
     const stdoutPre = document.createElement("pre");
@@ -410,6 +451,92 @@ function renderZstegPanel(zstegResult, flagsResult) {
 }
 
 
+function renderTriagePanel(triageResult) {
+    triagePanel.innerHTML = "";
+    if (!triageResult) {
+        triagePanel.textContent = "No triage data.";
+        return;
+    }
+    if (triageResult.skipped) {
+        triagePanel.textContent = "Triage skipped: " + (triageResult.reason || "not applicable");
+        return;
+    }
+    if (triageResult.error) {
+        triagePanel.textContent = "Triage error: " + triageResult.error;
+        return;
+    }
+
+    const verdictColors = {
+        clean: "text-emerald-400",
+        suspicious: "text-red-400",
+        inconclusive: "text-yellow-400",
+    };
+    const summary = document.createElement("div");
+    summary.className = "border border-gray-800 rounded p-2 space-y-1";
+    const header = document.createElement("div");
+    header.className = "flex justify-between items-center";
+    const verdict = document.createElement("span");
+    verdict.className = "font-semibold uppercase " + (verdictColors[triageResult.verdict] || "text-gray-300");
+    verdict.textContent = triageResult.verdict || "unknown";
+    const rate = document.createElement("span");
+    rate.className = "text-[10px] text-gray-500";
+    const estimate = triageResult.estimate || {};
+    rate.textContent =
+        estimate.rate != null ? `estimated embedding rate ${(estimate.rate * 100).toFixed(1)}%` : "no embedding estimate";
+    header.appendChild(verdict);
+    header.appendChild(rate);
+    summary.appendChild(header);
+
+    const reasons = triageResult.reasons || [];
+    const notes = reasons.length ? reasons : [triageResult.pixels_skipped || "nothing suspicious"];
+    notes.forEach((text) => {
+        const line = document.createElement("div");
+        line.className = "text-[11px] text-gray-300";
+        line.textContent = text;
+        summary.appendChild(line);
+    });
+    triagePanel.appendChild(summary);
+
+    const heatmap = triageResult.heatmap;
+    if (heatmap && heatmap.rates && heatmap.rates.length) {
+        const block = document.createElement("div");
+        block.className = "border border-gray-800 rounded p-2";
+        const caption = document.createElement("div");
+        caption.className = "mb-1 text-[10px] text-gray-400";
+        caption.textContent = `Per-block SPA embedding estimate (${heatmap.block}px blocks, ${heatmap.hot} hot)`;
+        block.appendChild(caption);
+
+        // One canvas pixel per block, scaled up without smoothing.
+        const canvas = document.createElement("canvas");
+        canvas.width = heatmap.cols;
+        canvas.height = heatmap.rows;
+        canvas.className = "w-full max-h-64 object-contain bg-black";
+        canvas.style.imageRendering = "pixelated";
+        const context = canvas.getContext("2d");
+        const pixels = context.createImageData(heatmap.cols, heatmap.rows);
+        heatmap.rates.forEach((row, y) => {
+            row.forEach((value, x) => {
+                const offset = (y * heatmap.cols + x) * 4;
+                if (value == null) {
+                    pixels.data.set([40, 40, 40, 255], offset);
+                } else {
+                    pixels.data.set([Math.round(255 * value), Math.round(80 * (1 - value)), 40, 255], offset);
+                }
+            });
+        });
+        context.putImageData(pixels, 0, 0);
+        block.appendChild(canvas);
+        triagePanel.appendChild(block);
+    }
+
+    const details = document.createElement("pre");
+    details.className = "text-green-400 whitespace-pre-wrap break-all text-[11px] max-w-full overflow-x-auto";
+    const { heatmap: _heatmap, ...rest } = triageResult;
+    details.textContent = JSON.stringify(rest, null, 2);
+    triagePanel.appendChild(details);
+}
+
+
 function renderBinwalkPanel(binwalkResult, extractedFiles, flagsResult) {
     binwalkPanel.innerHTML = "";
     if (!binwalkResult) {
@@ -490,13 +617,18 @@ function renderBinwalkPanel(binwalkResult, extractedFiles, flagsResult) {
 }
 
 
-function renderImageGrid(container, entries, labelTransform) {
+function renderImageGrid(container, entries, labelTransform, section) {
     container.innerHTML = "";
+    if (section && section.skipped) {
+        container.textContent = "Skipped: " + (section.reason || "not applicable");
+        return;
+    }
     entries.forEach((entry) => {
         const wrapper = document.createElement("div");
         wrapper.className = "bg-gray-800 rounded border border-gray-700 overflow-hidden";
 
         const img = document.createElement("img");
+        img.loading = "lazy";
         img.src = entry.url;
         img.alt = entry.label;
         img.className = "w-full h-32 object-contain bg-black";
@@ -512,40 +644,166 @@ function renderImageGrid(container, entries, labelTransform) {
 }
 
 
+function renderSection(key, result) {
+    const flags = result.flags || {};
+    switch (key) {
+        case "file_info":
+            renderJson(fileInfoPanel, result.file_info);
+            break;
+        case "exif":
+            renderJson(exifPanel, result.exif);
+            break;
+        case "header_footer":
+            renderJson(headerFooterPanel, result.header_footer);
+            break;
+        case "signatures":
+            renderJson(signaturesPanel, result.signatures);
+            break;
+        case "triage":
+            renderTriagePanel(result.triage);
+            break;
+        case "binwalk":
+            renderBinwalkPanel(result.binwalk, result.extracted_files || [], flags);
+            break;
+        case "lsb":
+            renderLsbPanel(result.lsb, flags);
+            break;
+        case "zsteg":
+            renderZstegPanel(result.zsteg, flags);
+            break;
+        case "steghide":
+            renderJson(steghidePanel, result.steghide);
+            if (result.steghide && result.steghide.crack && result.steghide.crack.running) {
+                const crack = result.steghide.crack;
+                setStatus(
+                    `Cracking steghide passphrase: ${crack.tried} / ${crack.total ?? "?"} tried` +
+                        (crack.rate ? ` (${crack.rate}/s)` : "")
+                );
+            }
+            break;
+        case "encodings":
+            renderJson(encodingsPanel, result.encodings);
+            break;
+        case "children":
+            renderJson(childrenPanel, summarizeChildren(result.children));
+            break;
+        case "strings":
+            renderStringsPanel(result.strings || {}, flags);
+            break;
+        case "color_channels": {
+            const channelEntries = [];
+            Object.entries((result.color_channels || {}).channels || {}).forEach(([name, info]) => {
+                channelEntries.push({ label: name.toUpperCase(), url: info.url });
+            });
+            renderImageGrid(channelsPanel, channelEntries, (label) => `${label} channel`, result.color_channels);
+            break;
+        }
+        case "enhancements": {
+            const enhEntries = [];
+            Object.entries((result.enhancements || {}).images || {}).forEach(([name, info]) => {
+                enhEntries.push({ label: name, url: info.url });
+            });
+            renderImageGrid(enhancementsPanel, enhEntries, (label) => label, result.enhancements);
+            break;
+        }
+        case "bitplanes": {
+            const bitEntries = [];
+            Object.entries((result.bitplanes || {}).planes || {}).forEach(([channel, bits]) => {
+                Object.entries(bits).forEach(([bit, info]) => {
+                    bitEntries.push({ label: `${channel.toUpperCase()} bit ${bit}`, url: info.url });
+                });
+            });
+            renderImageGrid(bitplanesPanel, bitEntries, (label) => label, result.bitplanes);
+            break;
+        }
+        case "flags":
+            renderFlags(flags);
+            ["strings", "lsb", "zsteg", "binwalk"].forEach((name) => {
+                if (result[name]) {
+                    renderSection(name, result);
+                }
+            });
+            break;
+        case "extracted_files":
+            if (result.binwalk) {
+                renderSection("binwalk", result);
+            }
+            break;
+        default:
+            break;
+    }
+}
+
+
 function populatePanels(result) {
     lastResult = result;
-    renderJson(fileInfoPanel, result.file_info);
-    renderJson(exifPanel, result.exif);
-    renderJson(headerFooterPanel, result.header_footer);
-    renderBinwalkPanel(result.binwalk, result.extracted_files || [], result.flags);
-    renderLsbPanel(result.lsb, result.flags);
-    renderZstegPanel(result.zsteg, result.flags);
-    renderJson(steghidePanel, result.steghide);
-    renderJson(encodingsPanel, result.encodings);
-
-    renderStringsPanel(result.strings, result.flags);
-
-    const channelEntries = [];
-    Object.entries(result.color_channels.channels || {}).forEach(([name, info]) => {
-        channelEntries.push({ label: name.toUpperCase(), url: info.url });
-    });
-    renderImageGrid(channelsPanel, channelEntries, (label) => `${label} channel`);
+    Object.keys(result).forEach((key) => renderSection(key, result));
+}
 
-    const enhEntries = [];
-    Object.entries(result.enhancements.images || {}).forEach(([name, info]) => {
-        enhEntries.push({ label: name, url: info.url });
-    });
-    renderImageGrid(enhancementsPanel, enhEntries, (label) => label);
 
-    const bitEntries = [];
-    Object.entries(result.bitplanes.planes || {}).forEach(([channel, bits]) => {
-        Object.entries(bits).forEach(([bit, info]) => {
-            bitEntries.push({ label: `${channel.toUpperCase()} bit ${bit}`, url: info.url });
-        });
+function parseSseFrame(frame) {
+    let event = "message";
+    const dataLines = [];
+    frame.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith("data:")) {
+            dataLines.push(line.slice(5).trimStart());
+        }
     });
-    renderImageGrid(bitplanesPanel, bitEntries, (label) => label);
+    if (!dataLines.length) {
+        return null;
+    }
+    return { event, data: JSON.parse(dataLines.join("\n")) };
+}
+
+
+async function streamAnalysis(response) {
+    const partial = {};
+    let received = 0;
+    let failure = null;
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    const handle = ({ event, data }) => {
+        if (event === "session") {
+            partial.session_id = data.session_id;
+        } else if (event === "module") {
+            partial[data.key] = data.data;
+            received += 1;
+            hideLoader();
+            renderSection(data.key, partial);
+            setStatus(`Running full analysis pipeline... ${received} sections received (latest: ${data.key}).`);
+        } else if (event === "summary") {
+            const seconds = data.elapsed != null ? ` in ${data.elapsed}s` : "";
+            setStatus(`Analysis complete${seconds}.`);
+        } else if (event === "error") {
+            failure = data.error || "Analysis failed.";
+        }
+    };
 
-    renderFlags(result.flags);
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+            const parsed = parseSseFrame(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            if (parsed) {
+                handle(parsed);
+            }
+            boundary = buffer.indexOf("\n\n");
+        }
+    }
+
+    lastResult = partial;
+    if (failure) {
+        setStatus(`Error: ${failure}`);
+    }
 }
 
 
@@ -559,15 +817,26 @@ form.addEventListener("submit", async (event) => {
     const formData = new FormData();
     formData.append("file", fileInput.files[0]);
 
+    if (flagFormatsInput && flagFormatsInput.value) {
+        formData.append("flag_formats", flagFormatsInput.value);
+    }
     if (steghidePassInput && steghidePassInput.value) {
         formData.append("steghide_passphrase", steghidePassInput.value);
     }
+    if (scanProfileInput) {
+        formData.append("profile", scanProfileInput.value);
+    }
+    if (steghideWordlistInput && steghideWordlistInput.files.length) {
+        formData.append("wordlist", steghideWordlistInput.files[0]);
+    } else if (steghideCrackInput && steghideCrackInput.checked) {
+        formData.append("steghide_crack", "bundled");
+    }
 
     setStatus("Running full analysis pipeline...");
     showLoader();
 
     try {
-        const response = await fetch("/api/analyze", {
+        const response = await fetch("/api/analyze/stream", {
             method: "POST",
             body: formData,
         });
@@ -579,10 +848,19 @@ form.addEventListener("submit", async (event) => {
             return;
         }
 
-        const result = await response.json();
-        populatePanels(result);
         switchTab("file-info");
-        setStatus("Analysis complete.");
+        if (response.body && response.body.getReader) {
+            await streamAnalysis(response);
+        } else {
+            const result = {};
+            (await response.text()).split("\n\n").map(parseSseFrame).filter(Boolean).forEach((frame) => {
+                if (frame.event === "module") {
+                    result[frame.data.key] = frame.data.data;
+                }
+            });
+            populatePanels(result);
+            setStatus("Analysis complete.");
+        }
     } catch (err) {
         setStatus("Request failed.");
         console.error(err);